@@ -59,6 +59,15 @@ class Alu:
             "OR"   : self._or,
             "SHFT" : self._shft
         }
+    def copy(self):
+        """
+        Return a new ALU with the same current operation and flags.
+        """
+        other = Alu()
+        other._op = self._op
+        other._flags = self._flags
+        return other
+
     def set_op(self, op):
         """
         Public-facing setter. Added 2025-11-09. Students will need to add this
@@ -65,20 +65,21 @@ def _mem_operand(token):
     return base, offset & 0x3F
 
 
-def assemble(lines):
+def _first_pass(lines):
     """
-    Assemble a list of source lines into 16-bit instruction words.
+    Record labels and strip comments. Returns `(labels, cleaned)` where
+    `labels` maps names to addresses and `cleaned` is a list of
+    `(line_number, line)` for non-blank lines (numbered from 1).
     """
-    # Pass 1: record labels and strip comments
     labels = {}
     pc = 0
     cleaned = []
 
-    for raw in lines:
+    for number, raw in enumerate(lines, 1):
         line = _strip(raw)
         if not line:
             continue
-        cleaned.append(line)
+        cleaned.append((number, line))
         if _is_label(line):
             name = line[:-1]
             if name in labels:
@@ -86,12 +87,36 @@ def assemble(lines):
             labels[name] = pc
         else:
             pc += 1
+    return labels, cleaned
+
+
+def symbols(lines):
+    """
+    Return `(labels, line_map)` for a list of source lines: `labels` maps
+    label names to addresses, and `line_map` maps each instruction address
+    to its source line number (counting from 1). Used by the coverage and
+    profiling tools to report in terms of the `.asm` source.
+    """
+    labels, cleaned = _first_pass(lines)
+    line_map = {}
+    for number, line in cleaned:
+        if not _is_label(line):
+            line_map[len(line_map)] = number
+    return labels, line_map
+
+
+def assemble(lines):
+    """
+    Assemble a list of source lines into 16-bit instruction words.
+    """
+    # Pass 1: record labels and strip comments
+    labels, cleaned = _first_pass(lines)
 
     # Pass 2: encode instructions
     program = []
     pc = 0
 
-    for line in cleaned:
+    for _, line in cleaned:
         if _is_label(line) or not line:
             continue
 
@@ -11,7 +11,7 @@ Clayton Cafiero <cbcafier@uvm.edu>
 
 import pytest  # pip install pytest
 
-from assembler import _imm, _is_label, _mem_operand, _reg, _strip, assemble
+from assembler import _imm, _is_label, _mem_operand, _reg, _strip, assemble, symbols
 
 
 def test_strip():
@@ -256,5 +256,12 @@ def test_duplicate_label_raises():
         assemble(["LOOP:", "LOOP:", "HALT"])
 
 
+def test_symbols():
+    src = ["; header", "START:", "  LOADI R1, #1", "", "LOOP:", "B LOOP ; spin"]
+    labels, line_map = symbols(src)
+    assert labels == {"START": 0, "LOOP": 1}
+    assert line_map == {0: 3, 1: 6}
+
+
 if __name__ == "__main__":
     pytest.main()
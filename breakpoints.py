@@ -0,0 +1,191 @@
+"""
+Breakpoints and watchpoints for the Catamount Processing Unit.
+
+Three kinds of stop are supported, each optionally guarded by a condition:
+
+    - PC breakpoints: stop *before* executing the instruction at an address.
+      Condition: `condition(cpu) -> bool`.
+    - Data memory watchpoints on an address or range, for reads and/or
+      writes made by LOAD and STORE: stop *after* the accessing instruction.
+      Condition: `condition(cpu, addr, value) -> bool`.
+    - Register watchpoints: stop after an instruction changes a register.
+      Condition: `condition(cpu, old, new) -> bool`.
+
+PC and memory watchpoints are kept in 64K-entry bitmaps (one byte per
+address), so checking an address is a single index. When nothing is armed
+`Cpu.run()` uses its plain loop and pays nothing; memory watchpoints use
+`Memory.add_hook()`, which is likewise free when no hook is installed.
+
+Usage:
+
+    cpu.breakpoints.add(0x0010)
+    cpu.breakpoints.watch(0x0040, 0x0050, read=True, write=True)
+    cpu.breakpoints.watch_register(3, lambda cpu, old, new: new < 0)
+    stop = cpu.run()   # stop.reason, stop.pc, stop.info
+
+CS 2210 Computer Organization
+"""
+
+ADDRESS_SPACE = 0x10000
+
+
+class Breakpoints:
+    """
+    Breakpoint and watchpoint engine attached to one `Cpu`.
+    """
+
+    def __init__(self, cpu):
+        self._cpu = cpu
+        self._bits = {
+            "pc": bytearray(ADDRESS_SPACE),
+            "read": bytearray(ADDRESS_SPACE),
+            "write": bytearray(ADDRESS_SPACE),
+        }
+        self._counts = {"pc": 0, "read": 0, "write": 0}
+        self._conditions = {"pc": {}, "read": {}, "write": {}}
+        self._registers = {}  # register index -> condition (or None)
+        self._pending = None  # (reason, info) from a memory hook
+        self._resume = None  # (pc, cycles) of the breakpoint we stopped at
+
+    @property
+    def armed(self):
+        """True if any breakpoint or watchpoint is set."""
+        c = self._counts
+        return bool(c["pc"] or c["read"] or c["write"] or self._registers)
+
+    def _set(self, kind, start, stop, condition, on):
+        bits = self._bits[kind]
+        conditions = self._conditions[kind]
+        was_armed = self._counts[kind] > 0
+        for addr in range(start, stop):
+            if bits[addr] != on:
+                bits[addr] = on
+                self._counts[kind] += 1 if on else -1
+            if on and condition is not None:
+                conditions[addr] = condition
+            else:
+                conditions.pop(addr, None)
+        if kind != "pc" and was_armed != (self._counts[kind] > 0):
+            hook = self._on_read if kind == "read" else self._on_write
+            if was_armed:
+                self._cpu._d_mem.remove_hook(kind, hook)
+            else:
+                self._cpu._d_mem.add_hook(kind, hook)
+
+    @staticmethod
+    def _range(start, stop):
+        stop = start + 1 if stop is None else stop
+        if start < 0 or stop > ADDRESS_SPACE or stop <= start:
+            raise ValueError(f"Bad address range {start:#06x}..{stop:#06x}.")
+        return start, stop
+
+    def add(self, pc, condition=None):
+        """
+        Stop before executing the instruction at `pc`.
+        """
+        self._set("pc", *self._range(pc, None), condition, 1)
+
+    def remove(self, pc):
+        self._set("pc", *self._range(pc, None), None, 0)
+
+    def watch(self, start, stop=None, *, read=False, write=True, condition=None):
+        """
+        Watch data memory address `start`, or addresses `start` up to (not
+        including) `stop`, for reads and/or writes.
+        """
+        start, stop = self._range(start, stop)
+        if read:
+            self._set("read", start, stop, condition, 1)
+        if write:
+            self._set("write", start, stop, condition, 1)
+
+    def unwatch(self, start, stop=None, *, read=True, write=True):
+        start, stop = self._range(start, stop)
+        if read:
+            self._set("read", start, stop, None, 0)
+        if write:
+            self._set("write", start, stop, None, 0)
+
+    def watch_register(self, r, condition=None):
+        """
+        Stop after any instruction that changes register `r`.
+        """
+        self._cpu._regs._check_index(r)
+        self._registers[r] = condition
+
+    def unwatch_register(self, r):
+        self._registers.pop(r, None)
+
+    def clear(self):
+        """
+        Remove every breakpoint and watchpoint.
+        """
+        d_mem = self._cpu._d_mem
+        if self._counts["read"]:
+            d_mem.remove_hook("read", self._on_read)
+        if self._counts["write"]:
+            d_mem.remove_hook("write", self._on_write)
+        for kind, bits in self._bits.items():
+            bits[:] = bytes(ADDRESS_SPACE)
+            self._counts[kind] = 0
+            self._conditions[kind].clear()
+        self._registers.clear()
+
+    def _on_access(self, kind, addr, value):
+        if 0 <= addr < ADDRESS_SPACE and self._bits[kind][addr]:
+            condition = self._conditions[kind].get(addr)
+            if condition is None or condition(self._cpu, addr, value):
+                self._pending = ("watch-" + kind, {"address": addr, "value": value})
+
+    def _on_read(self, addr, value):
+        self._on_access("read", addr, value)
+
+    def _on_write(self, addr, value):
+        self._on_access("write", addr, value)
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with breakpoint checks, for `Cpu._stepper()`. The
+        returned function returns `False` (after asking the CPU to stop)
+        when a breakpoint or watchpoint fires, otherwise the result of
+        `step()`.
+        """
+        pc_bits = self._bits["pc"]
+        pc_conditions = self._conditions["pc"]
+        watched = self._registers
+        registers = cpu._regs.registers
+
+        def guarded_step():
+            pc = cpu._pc
+            if pc_bits[pc & 0xFFFF] and self._resume != (pc, cpu._cycles):
+                condition = pc_conditions.get(pc)
+                if condition is None or condition(cpu):
+                    # Remember where we stopped, so resuming steps over it.
+                    self._resume = (pc, cpu._cycles)
+                    cpu._request_stop("breakpoint", address=pc)
+                    return False
+            self._resume = None
+
+            if watched:
+                before = [(r, registers[r].value) for r in watched]
+            self._pending = None
+            result = step()
+
+            if self._pending is not None:
+                reason, info = self._pending
+                self._pending = None
+                cpu._request_stop(reason, **info)
+                return False
+            if watched:
+                for r, old in before:
+                    new = registers[r].value
+                    if new != old:
+                        condition = watched[r]
+                        if condition is None or condition(cpu, old, new):
+                            cpu._request_stop(
+                                "watch-register", register=r, old=old, new=new
+                            )
+                            return False
+            return result
+
+        return guarded_step
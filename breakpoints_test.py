@@ -0,0 +1,103 @@
+"""
+Tests for breakpoints and watchpoints.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+
+PROG = assemble(
+    [
+        "LOADI R1, #3",  # 0
+        "LOADI R2, #1",  # 1
+        "LOOP:",
+        "ADDI R0, R1, #8",  # 2
+        "STORE R1, [R0]",  # 3
+        "LOAD R3, [R0]",  # 4
+        "SUB R1, R1, R2",  # 5
+        "BNE LOOP",  # 6
+        "HALT",  # 7
+    ]
+)
+
+
+def test_unarmed_run_uses_plain_tick():
+    c = make_cpu(PROG)
+    assert c._stepper() == c.tick  # OK to access in tests
+    c.breakpoints.add(3)
+    assert c._stepper() != c.tick
+    c.breakpoints.remove(3)
+    assert not c.breakpoints.armed
+    assert c._stepper() == c.tick
+    assert c.run().reason == "halt"
+
+
+def test_breakpoint_stops_before_instruction_and_resumes():
+    c = make_cpu(PROG)
+    c.breakpoints.add(5)
+    stops = []
+    while True:
+        stop = c.run()
+        if stop.reason == "halt":
+            break
+        assert stop.reason == "breakpoint"
+        assert c.pc == 5
+        stops.append(c.get_reg(1))
+    assert stops == [3, 2, 1]  # SUB not yet executed at each stop
+
+
+def test_conditional_breakpoint():
+    c = make_cpu(PROG)
+    c.breakpoints.add(5, condition=lambda cpu: cpu.get_reg(1) == 1)
+    stop = c.run()
+    assert stop.reason == "breakpoint"
+    assert c.get_reg(1) == 1
+    assert c.run().reason == "halt"
+
+
+def test_write_watchpoint_range():
+    c = make_cpu(PROG)
+    c.breakpoints.watch(0x09, 0x0B)  # R1 + 8 for R1 in (1, 2)
+    stop = c.run()
+    assert stop.reason == "watch-write"
+    assert stop.info == {"address": 0x0A, "value": 2}
+    assert stop.pc == 4  # stopped after the STORE
+    assert c.run().info["address"] == 0x09
+    assert c.run().reason == "halt"
+
+
+def test_read_watchpoint_with_condition():
+    c = make_cpu(PROG)
+    c.breakpoints.watch(
+        0x00, 0x20, read=True, write=False, condition=lambda cpu, a, v: v == 1
+    )
+    stop = c.run()
+    assert stop.reason == "watch-read"
+    assert stop.info == {"address": 0x09, "value": 1}
+
+
+def test_register_watchpoint():
+    c = make_cpu(PROG)
+    c.breakpoints.watch_register(3)
+    stop = c.run()
+    assert stop.reason == "watch-register"
+    assert stop.info == {"register": 3, "old": 0, "new": 3}
+
+
+def test_clear_removes_memory_hooks():
+    c = make_cpu(PROG)
+    c.breakpoints.watch(0x10, read=True)
+    assert "read" in vars(c._d_mem)  # OK to access in tests
+    c.breakpoints.clear()
+    assert not c.breakpoints.armed
+    assert "read" not in vars(c._d_mem)
+    assert "write" not in vars(c._d_mem)
+
+
+def test_bad_watch_range():
+    c = make_cpu(PROG)
+    with pytest.raises(ValueError):
+        c.breakpoints.watch(0xFFFF, 0x10001)
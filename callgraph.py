@@ -0,0 +1,212 @@
+"""
+Call-graph profiler for guest programs.
+
+A `CallGraphProfiler` is a run monitor (see `Cpu.attach()`) that keeps a
+shadow call stack, pushing a frame on every CALL and popping one on every
+RET. For each subroutine (by entry address) it accumulates:
+
+    calls       times it was called
+    inclusive   instructions retired while it was on the stack, counted
+                once for recursive calls
+    exclusive   instructions retired in its own body (the CALL counts to
+                the caller, the RET to the callee)
+    max_depth   deepest call stack depth at which it was entered
+
+The code running when profiling starts is the root frame. Results are
+resolved to labels from the assembler's label table, and are available as
+a sorted text report or as collapsed stacks ("main;F;G 42" lines), the
+input format of flame graph tools:
+
+    prof = CallGraphProfiler()
+    cpu.attach(prof)
+    cpu.run()
+    print(prof.report(labels))
+    prof.write_collapsed("out.folded", labels)
+
+CS 2210 Computer Organization
+"""
+
+from dataclasses import dataclass
+
+from instruction_set import ISA
+from pcprofile import label_resolver
+
+_CALL = ISA["CALL"]["opcode"]
+_RET = ISA["RET"]["opcode"]
+
+
+@dataclass
+class CallStats:
+    """
+    Totals for one subroutine, as returned by `CallGraphProfiler.stats()`.
+    """
+
+    entry: int
+    name: str
+    calls: int = 0
+    inclusive: int = 0
+    exclusive: int = 0
+    max_depth: int = 0
+
+
+class _Frame:
+    __slots__ = ("entry", "start", "children", "path")
+
+    def __init__(self, entry, start, path):
+        self.entry = entry
+        self.start = start  # cycle count when the frame was entered
+        self.children = 0  # instructions retired in callees
+        self.path = path  # tuple of entry addresses from the root
+
+
+class CallGraphProfiler:
+    """
+    Shadow-stack profiler driven by CALL and RET.
+    """
+
+    def __init__(self):
+        self._cpu = None
+        self._stack = []
+        self._calls = {}  # entry -> calls
+        self._inclusive = {}  # entry -> instructions
+        self._exclusive = {}  # entry -> instructions
+        self._max_depth = {}  # entry -> depth
+        self._paths = {}  # path -> exclusive instructions
+        self._active = {}  # entry -> frames on the stack (for recursion)
+
+    def _start(self, cpu):
+        self._cpu = cpu
+        root = _Frame(cpu.pc, cpu.cycles, (cpu.pc,))
+        self._stack = [root]
+        self._active = {cpu.pc: 1}
+        self._calls.setdefault(cpu.pc, 0)
+        self._max_depth.setdefault(cpu.pc, 0)
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with call tracking, for `Cpu._stepper()`.
+        """
+        if self._cpu is not cpu:
+            self._start(cpu)
+        stack = self._stack
+        calls = self._calls
+        max_depth = self._max_depth
+        active = self._active
+
+        def profiled_step():
+            if not step():
+                return False
+            op = cpu._decoded.opcode
+            if op == _CALL:
+                target = cpu._pc
+                frame = _Frame(target, cpu._cycles, stack[-1].path + (target,))
+                stack.append(frame)
+                calls[target] = calls.get(target, 0) + 1
+                depth = len(stack) - 1
+                if depth > max_depth.get(target, 0):
+                    max_depth[target] = depth
+                active[target] = active.get(target, 0) + 1
+            elif op == _RET and len(stack) > 1:
+                self._close(stack.pop(), cpu._cycles)
+            return True
+
+        return profiled_step
+
+    def _close(self, frame, now, totals=None):
+        """Account for `frame` ending at cycle `now`."""
+        elapsed = now - frame.start
+        entry = frame.entry
+        inclusive, exclusive, paths = totals or (
+            self._inclusive,
+            self._exclusive,
+            self._paths,
+        )
+        active = self._active
+        active[entry] -= 1
+        if not active[entry]:  # outermost activation of a recursive routine
+            inclusive[entry] = inclusive.get(entry, 0) + elapsed
+        own = elapsed - frame.children
+        exclusive[entry] = exclusive.get(entry, 0) + own
+        paths[frame.path] = paths.get(frame.path, 0) + own
+        if self._stack and totals is None:
+            self._stack[-1].children += elapsed
+
+    def _totals(self):
+        """
+        Return `(inclusive, exclusive, paths)` including frames that are
+        still open, without disturbing them.
+        """
+        inclusive = dict(self._inclusive)
+        exclusive = dict(self._exclusive)
+        paths = dict(self._paths)
+        if self._cpu is None:
+            return inclusive, exclusive, paths
+        now = self._cpu.cycles
+        saved = dict(self._active)
+        children = 0
+        for frame in reversed(self._stack):
+            elapsed = now - frame.start
+            pending = _Frame(frame.entry, frame.start, frame.path)
+            pending.children = frame.children + children
+            self._close(pending, now, (inclusive, exclusive, paths))
+            children = elapsed
+        self._active = saved
+        return inclusive, exclusive, paths
+
+    def stats(self, labels=None):
+        """
+        Return a list of `CallStats`, highest inclusive count first.
+        """
+        resolve = label_resolver(labels or {})
+        inclusive, exclusive, _ = self._totals()
+        result = []
+        for entry in self._calls:
+            name, offset = resolve(entry)
+            if name is None or offset:
+                name = f"{entry:#06x}"
+            result.append(
+                CallStats(
+                    entry,
+                    name,
+                    self._calls[entry],
+                    inclusive.get(entry, 0),
+                    exclusive.get(entry, 0),
+                    self._max_depth.get(entry, 0),
+                )
+            )
+        result.sort(key=lambda s: (-s.inclusive, s.entry))
+        return result
+
+    def report(self, labels=None):
+        """
+        Return a text table of `stats()`.
+        """
+        rows = [
+            f"{'inclusive':>10} {'exclusive':>10} {'calls':>7} {'depth':>5}  routine"
+        ]
+        for s in self.stats(labels):
+            rows.append(
+                f"{s.inclusive:>10} {s.exclusive:>10} {s.calls:>7} "
+                f"{s.max_depth:>5}  {s.name}"
+            )
+        return "\n".join(rows)
+
+    def collapsed(self, labels=None):
+        """
+        Return collapsed stack lines ("root;F;G count"), one per distinct
+        call path, sorted.
+        """
+        names = {s.entry: s.name for s in self.stats(labels)}
+        _, _, paths = self._totals()
+        lines = [
+            f"{';'.join(names[e] for e in path)} {count}"
+            for path, count in paths.items()
+            if count
+        ]
+        lines.sort()
+        return lines
+
+    def write_collapsed(self, path, labels=None):
+        with open(path, "w") as f:
+            for line in self.collapsed(labels):
+                f.write(line + "\n")
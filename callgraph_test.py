@@ -0,0 +1,80 @@
+"""
+Tests for the call-graph profiler.
+
+CS 2210 Computer Organization
+"""
+
+from assembler import assemble, symbols
+from callgraph import CallGraphProfiler
+from cpu import make_cpu
+
+SRC = [
+    "MAIN:",
+    "    CALL A",  # 0
+    "    CALL B",  # 1
+    "    HALT",  # 2
+    "A:",
+    "    CALL B",  # 3
+    "    RET",  # 4
+    "B:",
+    "    LOADI R1, #1",  # 5
+    "    RET",  # 6
+]
+
+
+def _profile():
+    c = make_cpu(assemble(SRC))
+    prof = CallGraphProfiler()
+    c.attach(prof)
+    c.run()
+    return c, prof
+
+
+def test_inclusive_exclusive_and_calls():
+    c, prof = _profile()
+    labels, _ = symbols(SRC)
+    stats = {s.name: s for s in prof.stats(labels)}
+    assert stats["MAIN"].inclusive == c.cycles == 9
+    assert stats["MAIN"].exclusive == 3  # CALL, CALL, HALT
+    assert stats["A"].calls == 1
+    assert (stats["A"].inclusive, stats["A"].exclusive) == (4, 2)
+    assert stats["B"].calls == 2
+    assert (stats["B"].inclusive, stats["B"].exclusive) == (4, 4)
+    assert stats["B"].max_depth == 2
+    assert [s.name for s in prof.stats(labels)] == ["MAIN", "A", "B"]
+    assert sum(s.exclusive for s in stats.values()) == c.cycles
+
+
+def test_collapsed_stacks(tmp_path):
+    _, prof = _profile()
+    labels, _ = symbols(SRC)
+    assert prof.collapsed(labels) == ["MAIN 3", "MAIN;A 2", "MAIN;A;B 2", "MAIN;B 2"]
+    path = tmp_path / "out.folded"
+    prof.write_collapsed(path, labels)
+    assert path.read_text().splitlines()[1] == "MAIN;A 2"
+    assert prof.report(labels).splitlines()[1].split() == ["9", "3", "0", "0", "MAIN"]
+
+
+def test_recursion_counted_once_inclusive():
+    src = [
+        "    LOADI R1, #3",
+        "    LOADI R2, #1",
+        "    CALL R",
+        "    HALT",
+        "R:",
+        "    SUB R1, R1, R2",
+        "    BEQ DONE",
+        "    CALL R",
+        "DONE:",
+        "    RET",
+    ]
+    c = make_cpu(assemble(src))
+    prof = CallGraphProfiler()
+    c.attach(prof)
+    c.run()
+    labels, _ = symbols(src)
+    r = next(s for s in prof.stats(labels) if s.name == "R")
+    assert r.calls == 3
+    assert r.max_depth == 3
+    assert r.inclusive == c.cycles - 4  # all but LOADI, LOADI, CALL, HALT
+    assert r.exclusive == r.inclusive
@@ -0,0 +1,175 @@
+"""
+Periodic on-disk checkpointing for long simulations.
+
+A `Checkpointer` passed to `Cpu.run()` writes a checkpoint every `every`
+instructions and/or every `interval` seconds, plus one when the run ends.
+Checkpoints come in chains: a full snapshot followed by deltas holding only
+the data memory cells written since the previous checkpoint, so the cost of
+a checkpoint is proportional to what was dirtied rather than to the size of
+memory. Every `full_every` checkpoints a new chain is started, and chains
+older than the previous one are deleted.
+
+Each checkpoint is one zlib-compressed file, written to a temporary name and
+then atomically renamed into place, so a crash mid-write never damages
+existing checkpoints. `resume()` rebuilds the state from the newest complete
+chain.
+
+CS 2210 Computer Organization
+"""
+
+import os
+import struct
+import time
+import zlib
+
+CHECKPOINT_MAGIC = b"CKPT"
+# magic, sequence number, sequence number of the chain's full checkpoint
+_HEADER = struct.Struct("<4sQQ")
+_PREFIX = "checkpoint-"
+_SUFFIX = ".ckpt"
+# When checkpointing by time only, how many instructions between clock reads.
+CLOCK_STRIDE = 4096
+
+
+def _path(directory, seq):
+    return os.path.join(directory, f"{_PREFIX}{seq:08d}{_SUFFIX}")
+
+
+def _read(path):
+    """Return `(seq, base_seq, snapshot_blob)` for checkpoint file `path`."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, seq, base = _HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a checkpoint.")
+    return seq, base, zlib.decompress(data[_HEADER.size :])
+
+
+def list_checkpoints(directory):
+    """
+    Return a sorted list of `(seq, path)` for checkpoint files in `directory`.
+    """
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith(_PREFIX) and name.endswith(_SUFFIX):
+            seq = name[len(_PREFIX) : -len(_SUFFIX)]
+            if seq.isdigit():
+                found.append((int(seq), os.path.join(directory, name)))
+    found.sort()
+    return found
+
+
+class Checkpointer:
+    """
+    Writes rotating checkpoints of a `Cpu` to `directory` while it runs
+    (`cpu.run(checkpointer=...)`).
+    """
+
+    def __init__(self, directory, every=None, interval=None, full_every=16, level=1):
+        if every is None and interval is None:
+            raise ValueError("Need `every` (instructions) or `interval` (seconds).")
+        self.directory = directory
+        self.every = every
+        self.interval = interval
+        self.full_every = full_every
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+        existing = list_checkpoints(directory)
+        self._seq = existing[-1][0] + 1 if existing else 0
+        self._base = None  # seq of current chain's full checkpoint
+        self._prev_base = None
+        self._in_chain = 0
+        self.written = 0
+
+    def checkpoint(self, cpu):
+        """
+        Write one checkpoint of `cpu` now. Returns its path.
+        """
+        full = self._base is None or self._in_chain >= self.full_every
+        blob = cpu.snapshot(delta=not full)
+        cpu.clear_dirty()
+        seq = self._seq
+        if full:
+            self._prev_base, self._base = self._base, seq
+            self._in_chain = 0
+        path = _path(self.directory, seq)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(CHECKPOINT_MAGIC, seq, self._base))
+            f.write(zlib.compress(blob, self.level))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._seq += 1
+        self._in_chain += 1
+        self.written += 1
+        if full and self._prev_base is not None:
+            self._rotate()
+        return path
+
+    def _rotate(self):
+        """Delete checkpoints from chains older than the previous one."""
+        for seq, path in list_checkpoints(self.directory):
+            if seq < self._prev_base:
+                os.remove(path)
+
+    @property
+    def stride(self):
+        """
+        Most instructions `Cpu.run()` should execute between polls.
+        """
+        stride = self.every if self.every is not None else CLOCK_STRIDE
+        if self.interval is not None:
+            stride = min(stride, CLOCK_STRIDE)
+        return stride
+
+    def start(self, cpu):
+        """
+        Called by `Cpu.run()` before running.
+        """
+        self._next_at = cpu.cycles + self.every if self.every is not None else None
+        self._deadline = (
+            time.monotonic() + self.interval if self.interval is not None else None
+        )
+
+    def poll(self, cpu):
+        """
+        Called by `Cpu.run()` every `stride` instructions or so. Writes a
+        checkpoint if one is due.
+        """
+        due = self._next_at is not None and cpu.cycles >= self._next_at
+        if not due and self._deadline is not None:
+            due = time.monotonic() >= self._deadline
+        if due:
+            self.checkpoint(cpu)
+            if self._next_at is not None:
+                self._next_at = cpu.cycles + self.every
+            if self._deadline is not None:
+                self._deadline = time.monotonic() + self.interval
+
+
+def resume(path, cpu):
+    """
+    Restore `cpu` from checkpoints and return it. `path` is either a
+    checkpoint directory (the newest checkpoint is used) or one checkpoint
+    file. `cpu` must already hold the program the checkpoints were taken
+    from.
+    """
+    if os.path.isdir(path):
+        available = list_checkpoints(path)
+        if not available:
+            raise FileNotFoundError(f"No checkpoints in {path}.")
+        directory = path
+        target = available[-1][0]
+    else:
+        directory = os.path.dirname(path) or "."
+        target = _read(path)[0]
+        available = list_checkpoints(directory)
+    by_seq = dict(available)
+    _, base, _ = _read(by_seq[target])
+    for seq in range(base, target + 1):
+        if seq not in by_seq:
+            raise FileNotFoundError(f"Checkpoint {seq} missing from chain.")
+        cpu.restore(_read(by_seq[seq])[2])
+    cpu.clear_dirty()
+    return cpu
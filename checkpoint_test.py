@@ -0,0 +1,110 @@
+"""
+Tests for periodic checkpointing and resume.
+
+CS 2210 Computer Organization
+"""
+
+import os
+
+import pytest
+
+from assembler import assemble
+from checkpoint import Checkpointer, list_checkpoints, resume
+from cpu import make_cpu
+from stack import StackUnderflowError
+
+# Counts R1 down from 40, storing each value at address R1.
+PROG = assemble(
+    [
+        "LOADI R1, #40",
+        "LOADI R2, #1",
+        "LOOP:",
+        "ADDI R0, R1, #0",
+        "STORE R1, [R0]",
+        "SUB R1, R1, R2",
+        "BNE LOOP",
+        "HALT",
+    ]
+)
+
+
+def _reference():
+    c = make_cpu(PROG)
+    c.run()
+    return c
+
+
+def test_checkpoints_written_and_rotated(tmp_path):
+    c = make_cpu(PROG)
+    cp = Checkpointer(tmp_path, every=10, full_every=3)
+    assert c.run(checkpointer=cp).reason == "halt"
+    assert c.cycles == _reference().cycles
+    assert cp.written == c.cycles // 10 + 1
+    seqs = [seq for seq, _ in list_checkpoints(tmp_path)]
+    # Only the current chain and the one before it are kept.
+    assert len(seqs) <= 6
+    assert seqs == list(range(seqs[0], cp.written))
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_resume_latest_matches_uninterrupted_run(tmp_path):
+    c = make_cpu(PROG)
+    c.run(checkpointer=Checkpointer(tmp_path, every=7, full_every=4))
+    restored = resume(tmp_path, make_cpu(PROG))
+    assert restored.snapshot() == _reference().snapshot()
+
+
+@pytest.mark.parametrize("stop_after", [5, 23, 64])
+def test_resume_mid_run_is_bit_exact(tmp_path, stop_after):
+    c = make_cpu(PROG)
+    cp = Checkpointer(tmp_path, every=1, full_every=8)
+    for _ in range(stop_after):
+        c.tick()
+        cp.checkpoint(c)
+    expected = c.snapshot()
+
+    # "Crash", then resume in a fresh process-equivalent and finish.
+    other = resume(tmp_path, make_cpu(PROG))
+    assert other.snapshot() == expected
+    other.run(checkpointer=Checkpointer(tmp_path, every=1000))
+    assert other.snapshot() == _reference().snapshot()
+
+
+def test_resume_from_specific_file(tmp_path):
+    c = make_cpu(PROG)
+    cp = Checkpointer(tmp_path, every=1000)
+    paths = []
+    for _ in range(3):
+        c.tick()
+        paths.append(cp.checkpoint(c))
+    after_two = make_cpu(PROG)
+    after_two.tick()
+    after_two.tick()
+    assert resume(paths[1], make_cpu(PROG)).snapshot() == after_two.snapshot()
+
+
+def test_checkpointer_needs_a_trigger(tmp_path):
+    with pytest.raises(ValueError):
+        Checkpointer(tmp_path)
+
+
+def test_time_based_checkpoints(tmp_path):
+    c = make_cpu(PROG)
+    cp = Checkpointer(tmp_path, interval=0)
+    c.run(checkpointer=cp)
+    assert cp.written >= 1
+    assert resume(tmp_path, make_cpu(PROG)).snapshot() == _reference().snapshot()
+
+
+def test_no_checkpoint_of_a_faulting_instruction(tmp_path):
+    prog = assemble(["LOADI R2, #7", "RET", "LOADI R3, #9", "HALT"])
+    c = make_cpu(prog)
+    with pytest.raises(StackUnderflowError):
+        c.run(checkpointer=Checkpointer(tmp_path, every=1))
+    # The newest checkpoint is from before the RET, so resuming faults again
+    # rather than carrying on past it.
+    other = resume(tmp_path, make_cpu(prog))
+    assert (other.pc, other.cycles) == (1, 1)
+    with pytest.raises(StackUnderflowError):
+        other.run()
+    assert other.get_reg(3) == 0
@@ -9,9 +9,11 @@ WORD_SIZE = 16  # 16 bits = 2 bytes
 WORD_MASK = (1 << WORD_SIZE) - 1  # 16 ones
 STACK_BASE = 0xFF00
 STACK_TOP = 0xFFFF
+MMIO_BASE = 0xFEF0  # memory-mapped counters, just below the stack (see mmio.py)
 
 if __name__ == "__main__":
     print(f"WORD_SIZE: {WORD_SIZE} (decimal)")
     print(f"WORD_MASK: {WORD_MASK:04X} (hex)")
     print(f"STACK_BASE: {STACK_BASE:04X} (hex)")
     print(f"STACK_TOP: {STACK_TOP:04X} (hex)")
+    print(f"MMIO_BASE: {MMIO_BASE:04X} (hex)")
@@ -0,0 +1,181 @@
+"""
+Hardware-style performance counters for the Catamount Processing Unit.
+
+`cpu.counters` (created and attached on first use, so CPUs that never ask
+pay nothing) counts instructions retired by `Cpu.run()` in a flat array
+indexed by opcode, plus a second array of taken control transfers by
+opcode. That is one increment per instruction, and one more per taken
+transfer. Everything else is derived from those two arrays when read:
+
+    instructions        instructions retired
+    opcode.<MNEM>       instructions retired, per opcode
+    branches.taken      B, BEQ and BNE that jumped
+    branches.not_taken  BEQ and BNE that fell through
+    loads, stores       data memory accesses by LOAD and STORE
+    pushes, pops        stack accesses by CALL and RET
+    alu.<OP>            ALU operations by type (ADDI and STORE use ADD)
+
+Counters can be read with `as_dict()` or `as_array()` (in `NAMES` order),
+cleared with `reset()`, and exported in Prometheus text exposition format
+with `to_prometheus()` or `write_prometheus()`, the latter suitable for a
+node exporter's textfile collector.
+
+CS 2210 Computer Organization
+"""
+
+import os
+from array import array
+
+from instruction_set import ISA
+
+_OPCODES = {info["opcode"]: mnem for mnem, info in ISA.items()}
+_OP = {mnem: info["opcode"] for mnem, info in ISA.items()}
+_ALU = {
+    "ADD": ("ADD", "ADDI", "STORE"),
+    "SUB": ("SUB",),
+    "AND": ("AND",),
+    "OR": ("OR",),
+    "SHFT": ("SHFT",),
+}
+
+NAMES = (
+    ("instructions",)
+    + tuple(f"opcode.{_OPCODES[op]}" for op in sorted(_OPCODES))
+    + ("branches.taken", "branches.not_taken", "loads", "stores", "pushes", "pops")
+    + tuple(f"alu.{op}" for op in _ALU)
+)
+
+
+class PerfCounters:
+    """
+    Performance counters; a run monitor (see `Cpu.attach()`).
+    """
+
+    def __init__(self):
+        self.retired = array("Q", bytes(8 * 16))  # by opcode
+        self.taken = array("Q", bytes(8 * 16))  # taken transfers, by opcode
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with counting, for `Cpu._stepper()`.
+        """
+        retired = self.retired
+        taken = self.taken
+
+        def counted_step():
+            pc = cpu._pc
+            if not step():
+                return False
+            op = cpu._decoded.opcode
+            retired[op] += 1
+            if cpu._pc != pc + 1:
+                taken[op] += 1
+            return True
+
+        return counted_step
+
+    def reset(self):
+        for i in range(16):
+            self.retired[i] = 0
+            self.taken[i] = 0
+
+    def as_dict(self):
+        """
+        Return `{name: count}` for every counter in `NAMES`.
+        """
+        retired, taken = self.retired, self.taken
+        counts = {"instructions": sum(retired)}
+        for op in sorted(_OPCODES):
+            counts[f"opcode.{_OPCODES[op]}"] = retired[op]
+        conditional = (_OP["BEQ"], _OP["BNE"])
+        jumped = sum(taken[op] for op in conditional)
+        counts["branches.taken"] = taken[_OP["B"]] + jumped
+        counts["branches.not_taken"] = sum(retired[op] for op in conditional) - jumped
+        counts["loads"] = retired[_OP["LOAD"]]
+        counts["stores"] = retired[_OP["STORE"]]
+        counts["pushes"] = retired[_OP["CALL"]]
+        counts["pops"] = retired[_OP["RET"]]
+        for alu_op, mnems in _ALU.items():
+            counts[f"alu.{alu_op}"] = sum(retired[_OP[m]] for m in mnems)
+        return counts
+
+    def as_array(self):
+        """
+        Return the counters as an `array('Q')` in `NAMES` order.
+        """
+        counts = self.as_dict()
+        return array("Q", [counts[name] for name in NAMES])
+
+    def to_prometheus(self, prefix="cpu", labels=None):
+        """
+        Return the counters in Prometheus text exposition format. `labels`
+        is an optional dict of labels added to every sample.
+        """
+        counts = self.as_dict()
+        extra = "".join(f'{k}="{v}",' for k, v in (labels or {}).items())
+
+        def sample(name, value, **label):
+            pairs = extra + "".join(f'{k}="{v}",' for k, v in label.items())
+            suffix = "{" + pairs.rstrip(",") + "}" if pairs else ""
+            return f"{prefix}_{name}_total{suffix} {value}"
+
+        def family(name, help_text, samples):
+            return [
+                f"# HELP {prefix}_{name}_total {help_text}",
+                f"# TYPE {prefix}_{name}_total counter",
+                *samples,
+            ]
+
+        lines = family(
+            "instructions",
+            "Instructions retired.",
+            [sample("instructions", counts["instructions"])],
+        )
+        lines += family(
+            "opcode",
+            "Instructions retired by opcode.",
+            [
+                sample("opcode", counts[f"opcode.{m}"], opcode=m)
+                for m in (_OPCODES[op] for op in sorted(_OPCODES))
+            ],
+        )
+        lines += family(
+            "branches",
+            "Branches by outcome.",
+            [
+                sample("branches", counts[f"branches.{o}"], outcome=o)
+                for o in ("taken", "not_taken")
+            ],
+        )
+        lines += family(
+            "memory_accesses",
+            "Data memory accesses by LOAD and STORE.",
+            [
+                sample("memory_accesses", counts["loads"], kind="load"),
+                sample("memory_accesses", counts["stores"], kind="store"),
+            ],
+        )
+        lines += family(
+            "stack_accesses",
+            "Stack accesses by CALL and RET.",
+            [
+                sample("stack_accesses", counts["pushes"], kind="push"),
+                sample("stack_accesses", counts["pops"], kind="pop"),
+            ],
+        )
+        lines += family(
+            "alu_ops",
+            "ALU operations by type.",
+            [sample("alu_ops", counts[f"alu.{op}"], op=op) for op in _ALU],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix="cpu", labels=None):
+        """
+        Write `to_prometheus()` to `path`, atomically (a scraper never sees
+        a partial file).
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus(prefix, labels))
+        os.replace(tmp, path)
@@ -0,0 +1,60 @@
+"""
+Tests for performance counters.
+
+CS 2210 Computer Organization
+"""
+
+from assembler import assemble
+from counters import NAMES
+from cpu import make_cpu
+
+PROG = assemble(
+    [
+        "LOADI R1, #2",
+        "LOADI R2, #1",
+        "LOOP:",
+        "STORE R1, [R0]",
+        "LOAD R3, [R0]",
+        "CALL F",
+        "SUB R1, R1, R2",
+        "BNE LOOP",
+        "HALT",
+        "F:",
+        "RET",
+    ]
+)
+
+
+def test_counts_after_run():
+    c = make_cpu(PROG)
+    assert c._monitors == []  # OK to access in tests
+    counters = c.counters
+    c.run()
+    counts = counters.as_dict()
+    assert counts["instructions"] == c.cycles == 15
+    assert counts["opcode.LOADI"] == 2
+    assert counts["opcode.HALT"] == 1
+    assert counts["branches.taken"] == 1
+    assert counts["branches.not_taken"] == 1
+    assert counts["loads"] == counts["stores"] == 2
+    assert counts["pushes"] == counts["pops"] == c.stack.pushes == 2
+    assert counts["alu.ADD"] == 2  # STORE uses the ALU
+    assert counts["alu.SUB"] == 2
+    assert list(counters.as_array()) == [counts[name] for name in NAMES]
+    counters.reset()
+    assert counters.as_dict()["instructions"] == 0
+
+
+def test_prometheus_export(tmp_path):
+    c = make_cpu(PROG)
+    c.counters
+    c.run()
+    text = c.counters.to_prometheus(labels={"program": "demo"})
+    assert "# TYPE cpu_instructions_total counter\n" in text
+    assert 'cpu_instructions_total{program="demo"} 15\n' in text
+    assert 'cpu_opcode_total{program="demo",opcode="CALL"} 2\n' in text
+    assert 'cpu_branches_total{program="demo",outcome="not_taken"} 1\n' in text
+    path = tmp_path / "cpu.prom"
+    c.counters.write_prometheus(path)
+    assert "cpu_alu_ops_total{op=\"SUB\"} 2" in path.read_text()
+    assert not (tmp_path / "cpu.prom.tmp").exists()
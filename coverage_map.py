@@ -0,0 +1,170 @@
+"""
+Instruction and branch coverage for guest programs.
+
+A `Coverage` collector is a run monitor (see `Cpu.attach()`). It marks
+every executed instruction address in a 64K-entry bytearray and, for
+conditional branches (BEQ, BNE), records which directions were seen in a
+second one: bit 0 for taken, bit 1 for not taken. Each step costs one store,
+plus a second for conditional branches, so it is cheap enough to leave on.
+
+One collector can be attached to many CPUs in turn (forks, fresh CPUs for
+each test input) to accumulate coverage across a batch of runs, and
+collectors can be combined with `merge()`. Results are reported per source
+line using the line map from `assembler.symbols()`:
+
+    labels, line_map = symbols(src)
+    cov = Coverage()
+    for inputs in test_inputs:
+        cpu = make_cpu(prog)
+        ...
+        cpu.attach(cov)
+        cpu.run()
+    print("\\n".join(cov.annotate(src, line_map)))
+
+CS 2210 Computer Organization
+"""
+
+from instruction_set import ISA
+
+ADDRESS_SPACE = 0x10000
+TAKEN = 0b01
+NOT_TAKEN = 0b10
+_CONDITIONAL = {ISA["BEQ"]["opcode"], ISA["BNE"]["opcode"]}
+
+
+class Coverage:
+    """
+    Accumulates executed addresses and conditional branch directions.
+    """
+
+    def __init__(self):
+        self.executed = bytearray(ADDRESS_SPACE)
+        self.branches = bytearray(ADDRESS_SPACE)  # TAKEN | NOT_TAKEN bits
+        self.conditional = bytearray(ADDRESS_SPACE)  # 1 at BEQ/BNE addresses
+        self._scanned = None  # (instruction memory, generation) last scanned
+
+    def _scan(self, i_mem):
+        """Mark the conditional branches in `i_mem`'s program."""
+        scanned = self._scanned
+        if scanned and scanned[0] is i_mem and scanned[1] == i_mem.generation:
+            return  # forks share instruction memory, which is read-only
+        self._scanned = (i_mem, i_mem.generation)
+        conditional = self.conditional
+        conditional[:] = bytes(ADDRESS_SPACE)
+        for addr, word in i_mem._populated().items():
+            if word >> 12 in _CONDITIONAL:
+                conditional[addr] = 1
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with coverage recording, for `Cpu._stepper()`.
+        """
+        self._scan(cpu._i_mem)
+        executed = self.executed
+        branches = self.branches
+        conditional = self.conditional
+
+        def covered_step():
+            pc = cpu._pc
+            if not step():
+                return False
+            executed[pc] = 1
+            if conditional[pc]:
+                branches[pc] |= NOT_TAKEN if cpu._pc == pc + 1 else TAKEN
+            return True
+
+        return covered_step
+
+    def merge(self, other):
+        """
+        Add the coverage recorded by `other` to this collector.
+        """
+        for mine, theirs in (
+            (self.executed, other.executed),
+            (self.branches, other.branches),
+            (self.conditional, other.conditional),
+        ):
+            merged = int.from_bytes(mine, "little") | int.from_bytes(theirs, "little")
+            mine[:] = merged.to_bytes(ADDRESS_SPACE, "little")
+
+    def reset(self):
+        """
+        Forget everything recorded so far.
+        """
+        self.executed[:] = bytes(ADDRESS_SPACE)
+        self.branches[:] = bytes(ADDRESS_SPACE)
+
+    def addresses(self):
+        """
+        Sorted list of executed instruction addresses.
+        """
+        executed = self.executed
+        addrs = []
+        addr = executed.find(1)
+        while addr != -1:
+            addrs.append(addr)
+            addr = executed.find(1, addr + 1)
+        return addrs
+
+    def total(self):
+        """
+        Number of addresses executed plus branch directions seen. Grows
+        exactly when a run covers something new.
+        """
+        b = self.branches
+        directions = (
+            b.count(TAKEN) + b.count(NOT_TAKEN) + 2 * b.count(TAKEN | NOT_TAKEN)
+        )
+        return self.executed.count(1) + directions
+
+    def by_line(self, line_map):
+        """
+        Return `{line: (executed, taken, not_taken)}` for every source line
+        in `line_map` (from `assembler.symbols()`). `taken` and `not_taken`
+        are `None` for lines that aren't conditional branches.
+        """
+        result = {}
+        for addr, line in line_map.items():
+            if self.conditional[addr]:
+                seen = self.branches[addr]
+                result[line] = (
+                    bool(self.executed[addr]),
+                    bool(seen & TAKEN),
+                    bool(seen & NOT_TAKEN),
+                )
+            else:
+                result[line] = (bool(self.executed[addr]), None, None)
+        return result
+
+    def summary(self, line_map):
+        """
+        Return `(lines executed, lines, branch directions seen, branch
+        directions)` for the program described by `line_map`.
+        """
+        lines = self.by_line(line_map).values()
+        hit = sum(1 for executed, _, _ in lines if executed)
+        directions = [d for _, t, n in lines if t is not None for d in (t, n)]
+        return hit, len(lines), sum(directions), len(directions)
+
+    def annotate(self, source, line_map):
+        """
+        Yield the lines of `source` prefixed with coverage marks: "-" for
+        lines without code, "#####" for code never executed, "ok" for
+        executed code; conditional branches also show which directions
+        were never seen.
+        """
+        status = self.by_line(line_map)
+        for number, text in enumerate(source, 1):
+            text = text.rstrip("\n")
+            if number not in status:
+                yield f"{'-':>6} | {text}"
+                continue
+            executed, taken, not_taken = status[number]
+            mark = "ok" if executed else "#####"
+            missing = []
+            if taken is False:
+                missing.append("never taken")
+            if not_taken is False:
+                missing.append("always taken")
+            note = f"  [{', '.join(missing)}]" if executed and missing else ""
+            yield f"{mark:>6} | {text}{note}"
@@ -0,0 +1,84 @@
+"""
+Tests for instruction and branch coverage.
+
+CS 2210 Computer Organization
+"""
+
+from assembler import assemble, symbols
+from coverage_map import TAKEN, Coverage
+from cpu import make_cpu
+
+SRC = [
+    "; count down from R1",  # 1
+    "    LOADI R2, #1",  # 2
+    "LOOP:",  # 3
+    "    SUB R1, R1, R2",  # 4
+    "    BNE LOOP",  # 5
+    "    BEQ DONE",  # 6
+    "    HALT",  # 7
+    "DONE:",  # 8
+    "    HALT",  # 9
+]
+
+
+def _run(cov, r1):
+    c = make_cpu(assemble(SRC))
+    c._regs.execute(rd=1, data=r1, write_enable=True)  # OK to access in tests
+    c.attach(cov)
+    assert c.run().reason == "halt"
+
+
+def test_lines_and_branch_directions():
+    _, line_map = symbols(SRC)
+    cov = Coverage()
+    _run(cov, 1)
+    status = cov.by_line(line_map)
+    assert status[4] == (True, None, None)
+    assert status[5] == (True, False, True)  # BNE fell through only
+    assert status[6] == (True, True, False)
+    assert status[7] == (False, None, None)
+    assert cov.addresses() == [0, 1, 2, 3, 5]
+    assert cov.summary(line_map) == (5, 6, 2, 4)
+
+    _run(cov, 2)  # accumulates: BNE now taken too
+    assert cov.by_line(line_map)[5] == (True, True, True)
+
+
+def test_merge_and_annotate():
+    _, line_map = symbols(SRC)
+    a, b = Coverage(), Coverage()
+    _run(a, 1)
+    _run(b, 3)
+    a.merge(b)
+    lines = list(a.annotate(SRC, line_map))
+    assert lines[0].startswith("     - |")
+    assert lines[4].endswith("BNE LOOP")
+    assert lines[5].endswith("[always taken]")
+    assert lines[6].startswith(" #####")
+    a.reset()
+    assert a.addresses() == []
+
+
+def test_reused_across_programs():
+    a = assemble(
+        ["LOADI R1, #1", "SUB R1, R1, R1", "BEQ END", "LOADI R3, #3", "END:", "HALT"]
+    )
+    b = assemble(["LOADI R1, #1", "LOADI R2, #2", "HALT"])
+    cov = Coverage()
+    for prog in (a, b):
+        c = make_cpu(prog)
+        c.attach(cov)
+        c.run()
+    assert cov.conditional[2] == 0
+    assert cov.branches[2] == TAKEN  # from program a only
+    cov.reset()
+    # Reloading the same instruction memory also rescans it.
+    c = make_cpu(a)
+    c.attach(cov)
+    c.run()
+    assert cov.conditional[2] == 1
+    c.load_program(b)
+    c._pc, c._halt = 0, False  # OK to access in tests
+    c.run()
+    assert cov.conditional[2] == 0
+    assert cov.branches[2] == TAKEN
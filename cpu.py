@@ -8,11 +8,58 @@ Clayton Cafiero <cbcafier@uvm.edu>
 STARTER CODE
 """
 
+import struct
+import time
+from dataclasses import dataclass, field
+
 from alu import Alu
-from constants import STACK_TOP
+from breakpoints import Breakpoints
+from counters import PerfCounters
+from events import Events
 from instruction_set import Instruction
 from memory import DataMemory, InstructionMemory
 from register_file import RegisterFile
+from stack import StackDepthError
+
+# How many instructions `Cpu.run()` executes between checks of its limits.
+CHECK_EVERY = 1024
+
+
+@dataclass
+class Stop:
+    """
+    Why `Cpu.run()` returned. `reason` is "halt" or names what stopped the
+    run (see `Cpu.run()`); `info` holds details such as the address and
+    value involved.
+    """
+
+    reason: str
+    pc: int
+    cycles: int
+    info: dict = field(default_factory=dict)
+
+
+@dataclass
+class StateDiff:
+    """
+    Differences between two CPU states, as returned by `Cpu.diff()`. Scalar
+    fields are `(ours, theirs)` or `None` if equal; `registers` maps register
+    index to `(ours, theirs)`; `memory` lists `(addr, ours, theirs)` for
+    data memory cells (including the stack) in address order.
+    """
+
+    pc: tuple = None
+    sp: tuple = None
+    halted: tuple = None
+    flags: tuple = None
+    registers: dict = field(default_factory=dict)
+    memory: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(
+            self.pc or self.sp or self.halted or self.flags
+            or self.registers or self.memory
+        )
 
 
 class Cpu:
@@ -20,6 +67,17 @@ class Cpu:
     Catamount Processing Unit
     """
 
+    # Snapshot header: magic, version, flags (halt, delta), ALU op index,
+    # ALU flags, PC, IR, cycle count, then eight registers (signed, since the
+    # ALU returns signed results). Data memory state follows; see
+    # `DataMemory.snapshot()`.
+    SNAPSHOT_MAGIC = b"CPUS"
+    SNAPSHOT_VERSION = 2
+    _SNAPSHOT_HEADER = struct.Struct("<4sBBBBIHQ8i")
+    _SNAP_HALT = 0b01
+    _SNAP_DELTA = 0b10
+    _ALU_OPS = ("ADD", "SUB", "AND", "OR", "SHFT")
+
     def __init__(self, *, alu, regs, d_mem, i_mem):
         """
         Constructor
@@ -30,9 +88,18 @@ class Cpu:
         self._alu = alu
         self._pc = 0  # program counter
         self._ir = 0  # instruction register
-        self._sp = STACK_TOP  # stack pointer
+        self._stack = d_mem.stack  # stack unit, owns the stack pointer
         self._decoded = Instruction()
         self._halt = False
+        self._cycles = 0  # instructions retired
+        self._breakpoints = None  # created on first use
+        self._events = None  # likewise
+        self._counters = None  # likewise
+        self._stop = None  # set when something other than HALT stops `run()`
+        self._monitors = []  # see `attach()`
+        # Decoded instructions keyed by raw word. Instruction memory is
+        # read-only once loaded, so this is shared with forks.
+        self._decode_cache = {}
 
     @property
     def running(self):
@@ -44,12 +111,61 @@ class Cpu:
 
     @property
     def sp(self):
-        return self._sp
+        return self._stack.sp
+
+    @property
+    def stack(self):
+        """
+        The stack unit used by CALL and RET. Exposes `depth`, `max_depth`,
+        `pushes` and `pops`.
+        """
+        return self._stack
 
     @property
     def ir(self):
         return self._ir
 
+    @property
+    def breakpoints(self):
+        """
+        Breakpoints and watchpoints for this CPU (see `breakpoints.py`).
+        """
+        if self._breakpoints is None:
+            self._breakpoints = Breakpoints(self)
+        return self._breakpoints
+
+    @property
+    def counters(self):
+        """
+        Performance counters for this CPU (see `counters.py`). Counting
+        starts on first access and covers instructions run by `run()`.
+        """
+        if self._counters is None:
+            self._counters = PerfCounters()
+            self.attach(self._counters)
+        return self._counters
+
+    def subscribe(self, event, fn, batch=None):
+        """
+        Call `fn` on every `event`, or with columns of up to `batch` events
+        at a time. See `events.py` for the events and their fields.
+        """
+        if self._events is None:
+            self._events = Events(self)
+        self._events.subscribe(event, fn, batch)
+
+    def unsubscribe(self, event, fn):
+        if self._events is None:
+            raise ValueError(f"{fn!r} is not subscribed to {event!r}.")
+        self._events.unsubscribe(event, fn)
+
+    @property
+    def cycles(self):
+        """
+        Number of instructions retired so far.
+        """
+        return self._cycles
+
     @property
     def decoded(self):
         return self._decoded
@@ -179,22 +295,16 @@ class Cpu:
                     offset = self.sext(self._decoded.imm, 8)
                     self._pc += offset # take branch
                 case "CALL":
-                    self._sp -= 1  # grow stack downward
                     # PC is incremented immediately upon fetch so already
                     # pointing to next instruction, which is return address.
                     ret_addr = self._pc  # explicit
-                    self._d_mem.write_enable(True)
-                    # push return address...
-                    self._d_mem.write(self._sp, ret_addr, from_stack=True)
+                    # push return address (stack grows downward)...
+                    self._stack.push(ret_addr)
                     offset = self._decoded.imm
                     self._pc += self.sext(offset, 8)  # jump to target
                 case "RET":
-                    # Get return address from memory via SP
-                    return_address = self._d_mem.read(self._sp)
-                    # Increment SP
-                    self._sp += 1
-                    # Update PC
-                    self._pc = return_address
+                    # Pop return address and update PC
+                    self._pc = self._stack.pop()
                 case "HALT":
                     self._halt = True
                 case _:  # default
@@ -202,14 +312,20 @@ class Cpu:
                         "Unknown mnemonic: " + str(self._decoded) + "\n" + str(self._ir)
                     )
 
+            self._cycles += 1
             return True
         return False
 
     def _decode(self):
         """
         We're effectively delegating decoding to the Instruction class.
+        Each distinct word is only decoded once.
         """
-        self._decoded = Instruction(raw=self._ir)
+        decoded = self._decode_cache.get(self._ir)
+        if decoded is None:
+            decoded = Instruction(raw=self._ir)
+            self._decode_cache[self._ir] = decoded
+        self._decoded = decoded
 
     def _fetch(self):
         pc_location = self._i_mem.read(self._pc)
@@ -219,6 +335,283 @@ class Cpu:
 
     def load_program(self, prog):
         self._i_mem.load_program(prog)
+        self._decode_cache.clear()
+
+    def fork(self):
+        """
+        Return a new CPU that continues from this one's current state.
+
+        The child shares instruction memory and the decode cache with its
+        parent, and shares data memory copy-on-write (see
+        `DataMemory.fork()`). Registers, PC, IR, SP and ALU flags are
+        duplicated, so parent and child can then run independently. Mapped
+        devices are mapped at the same addresses in the child; a device with
+        a `fork(cpu)` method is replaced by the device it returns for the
+        child CPU, others are shared.
+        """
+        child = Cpu(
+            alu=self._alu.copy(),
+            regs=self._regs.copy(),
+            d_mem=self._d_mem.fork(),
+            i_mem=self._i_mem,
+        )
+        for start, stop, device in self._d_mem._devices:
+            rebind = getattr(device, "fork", None)
+            if rebind is not None:
+                device = rebind(child)
+            child._d_mem.map_device(device, start, stop)
+        child._pc = self._pc
+        child._ir = self._ir
+        child._decoded = self._decoded
+        child._halt = self._halt
+        child._cycles = self._cycles
+        child._decode_cache = self._decode_cache
+        return child
+
+    def snapshot(self, delta=False):
+        """
+        Return the complete architectural state as compact bytes: PC, IR, SP,
+        halt flag, cycle count, registers, ALU op and flags, and the
+        populated data memory (including the stack). Instruction memory is
+        not included; it is read-only once loaded.
+
+        With `delta=True`, only data memory cells written since the last
+        `clear_dirty()` are included. Such a snapshot can only be restored
+        on top of the state it was taken relative to.
+        """
+        op = self._alu._op
+        flags = (self._SNAP_HALT if self._halt else 0) | (
+            self._SNAP_DELTA if delta else 0
+        )
+        header = self._SNAPSHOT_HEADER.pack(
+            self.SNAPSHOT_MAGIC,
+            self.SNAPSHOT_VERSION,
+            flags,
+            0xFF if op is None else self._ALU_OPS.index(op),
+            self._alu._flags,
+            self._pc,
+            self._ir,
+            self._cycles,
+            *[r.value for r in self._regs.registers],
+        )
+        return header + self._d_mem.snapshot(dirty_only=delta)
+
+    def clear_dirty(self):
+        """
+        Start a new dirty interval for `snapshot(delta=True)`.
+        """
+        self._d_mem.clear_dirty()
+
+    def restore(self, blob):
+        """
+        Restore state in place from bytes produced by `snapshot()`. The CPU
+        keeps its own instruction memory, so restore into a CPU loaded with
+        the same program. Delta snapshots are applied on top of the current
+        data memory.
+        """
+        fields = self._SNAPSHOT_HEADER.unpack_from(blob)
+        magic, version, snap_flags, op, flags, pc, ir, cycles = fields[:8]
+        if magic != self.SNAPSHOT_MAGIC:
+            raise ValueError("Not a CPU snapshot.")
+        if version != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+        self._halt = bool(snap_flags & self._SNAP_HALT)
+        self._alu._op = None if op == 0xFF else self._ALU_OPS[op]
+        self._alu._flags = flags
+        self._pc = pc
+        self._ir = ir
+        self._decode()
+        self._cycles = cycles
+        for reg, value in zip(self._regs.registers, fields[8:]):
+            reg.value = value
+        self._d_mem.restore(
+            blob, self._SNAPSHOT_HEADER.size, merge=bool(snap_flags & self._SNAP_DELTA)
+        )
+        return self
+
+    def mark_baseline(self):
+        """
+        Make the current data memory the baseline for `diff()`, so that
+        diffs against forks taken after this point only look at memory
+        written since.
+        """
+        self._d_mem.mark_baseline()
+
+    def diff(self, other):
+        """
+        Return a `StateDiff` between this CPU and `other`, which is another
+        `Cpu` or bytes from `snapshot()`. Diffing against a fork of this
+        CPU (or of a common ancestor) only compares memory written since the
+        fork; otherwise every populated cell is compared.
+        """
+        if not isinstance(other, Cpu):
+            other = self.fork().restore(other)
+        result = StateDiff()
+        if self._pc != other._pc:
+            result.pc = (self._pc, other._pc)
+        if self.sp != other.sp:
+            result.sp = (self.sp, other.sp)
+        if self._halt != other._halt:
+            result.halted = (self._halt, other._halt)
+        if self._alu._flags != other._alu._flags:
+            result.flags = (self._alu._flags, other._alu._flags)
+        theirs = other._regs.registers
+        for i, reg in enumerate(self._regs.registers):
+            if reg.value != theirs[i].value:
+                result.registers[i] = (reg.value, theirs[i].value)
+        result.memory = self._d_mem.diff(other._d_mem)
+        return result
+
+    def attach(self, monitor):
+        """
+        Attach a run monitor: any object with a `guard(cpu, step)` method
+        that returns a step function wrapping `step` (see `_stepper()`).
+        Monitors are used by `run()` only while attached. A monitor may
+        also have a `finish(cpu)` method, called when `run()` returns or raises.
+        """
+        self._monitors.append(monitor)
+
+    def detach(self, monitor):
+        """
+        Detach a run monitor. If it has a `stop_tracking()` method, that is
+        called to remove any hooks or wrappers it installed on this CPU.
+        """
+        self._monitors.remove(monitor)
+        stop_tracking = getattr(monitor, "stop_tracking", None)
+        if stop_tracking is not None:
+            stop_tracking()
+
+    def _stepper(self):
+        """
+        Return the function `run()` should call once per instruction. This
+        is plain `tick()` unless something (an armed breakpoint, an attached
+        monitor, an event subscriber) needs to look at every step, in which
+        case each wraps the step function in turn. Step functions return
+        `False` to stop the run, after calling `_request_stop()`.
+        """
+        step = self.tick
+        events = self._events
+        if events is not None and events.active:
+            step = events.guard(self, step)
+        bp = self._breakpoints
+        if bp is not None and bp.armed:
+            step = bp.guard(self, step)
+        for monitor in self._monitors:
+            step = monitor.guard(self, step)
+        return step
+
+    def _request_stop(self, reason, **info):
+        self._stop = Stop(reason, self._pc, self._cycles, info)
+
+    def run(
+        self,
+        checkpointer=None,
+        *,
+        max_instructions=None,
+        timeout=None,
+        max_stack_depth=None,
+        check_every=CHECK_EVERY,
+    ):
+        """
+        Tick until HALT, or until something else stops the run. Returns a
+        `Stop` describing why the run ended. Possible reasons:
+
+            - "halt": the program executed HALT
+            - "instruction-limit": `max_instructions` were retired
+            - "deadline": `timeout` seconds of wall-clock time passed
+            - "stack-depth": a CALL would exceed `max_stack_depth`
+            - reasons from breakpoints and attached monitors
+
+        The instruction budget and deadline are checked every `check_every`
+        instructions, not on every tick, and the clock is only read then.
+        The stack depth limit is enforced by the stack unit's own bounds
+        check. If a `Checkpointer` is given it is polled at the same points
+        and writes a final checkpoint when the run ends.
+
+        With no limits, checkpointer, breakpoints, monitors or event
+        subscribers this is a bare loop over `tick()`.
+        """
+        self._stop = None
+        step = self._stepper()
+        try:
+            if (
+                checkpointer is None
+                and max_instructions is None
+                and timeout is None
+                and max_stack_depth is None
+            ):
+                if step == self.tick:
+                    while not self._halt:
+                        self.tick()
+                else:
+                    while not self._halt and step():
+                        pass
+            else:
+                self._run_limited(
+                    step,
+                    checkpointer,
+                    max_instructions,
+                    timeout,
+                    max_stack_depth,
+                    check_every,
+                )
+        finally:
+            # Also on a fault, so buffered events and monitor output are
+            # not lost and monitors can undo what they installed.
+            if self._events is not None:
+                self._events.flush()
+            for monitor in self._monitors:
+                finish = getattr(monitor, "finish", None)
+                if finish is not None:
+                    finish(self)
+        stop = self._stop or Stop("halt", self._pc, self._cycles)
+        self._stop = None
+        return stop
+
+    def _run_limited(
+        self, step, checkpointer, max_instructions, timeout, max_stack_depth, stride
+    ):
+        """
+        The chunked run loop used by `run()` when limits or a checkpointer
+        are in play.
+        """
+        if checkpointer is not None:
+            stride = min(stride, checkpointer.stride)
+            checkpointer.start(self)
+        end = None if max_instructions is None else self._cycles + max_instructions
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stack = self._stack
+        floor = stack.floor
+        if max_stack_depth is not None:
+            stack.limit_depth(max_stack_depth)
+        try:
+            while not self._halt:
+                n = stride if end is None else min(stride, end - self._cycles)
+                if n <= 0:
+                    self._request_stop("instruction-limit", limit=max_instructions)
+                    break
+                for _ in range(n):
+                    if not step():
+                        break
+                if self._stop is not None:
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    self._request_stop("deadline", timeout=timeout)
+                    break
+                if checkpointer is not None and not self._halt:
+                    checkpointer.poll(self)
+        except StackDepthError:
+            # The CALL was fetched (advancing PC) but its push failed before
+            # anything else changed, so point PC back at it. Resuming then
+            # re-executes the CALL instead of skipping it.
+            self._pc -= 1
+            self._request_stop("stack-depth", limit=max_stack_depth)
+        finally:
+            stack.floor = floor
+        # Not reached if the guest faults: the state is then part-way
+        # through an instruction, and resuming from it would skip the fault.
+        if checkpointer is not None:
+            checkpointer.checkpoint(self)
 
     @staticmethod
     def sext(value, bits=16):
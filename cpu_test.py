@@ -10,11 +10,12 @@ import pytest
 
 from alu import Z_FLAG, Alu
 from assembler import assemble
-from constants import STACK_TOP
+from constants import STACK_BASE, STACK_TOP
 from cpu import Cpu, make_cpu
 from instruction_set import Instruction
 from memory import DataMemory, InstructionMemory
 from register_file import RegisterFile
+from stack import StackOverflowError, StackUnderflowError
 
 
 def test_instantiation_without_prog():
@@ -358,7 +359,6 @@ def test_load_store():
         0xB080,  # BNE
         0xCCF6,  # B
         0xD380,  # CALL
-        0xE000,  # RET
         0xF000,  # HALT
     ],
 )
@@ -443,6 +443,31 @@ def test_nested_call_ret():
     c.tick()
     assert c.decoded.mnem == "HALT"  # OK to access in tests
     assert not c.running
+    assert c.stack.max_depth == 2
+    assert c.stack.depth == 0
+
+
+def test_ret_on_empty_stack_underflows():
+    """
+    RET with nothing on the stack would move SP past STACK_TOP.
+    """
+    c = make_cpu([0xE000])  # RET
+    with pytest.raises(StackUnderflowError):
+        c.tick()
+    assert c.sp == STACK_TOP
+
+
+def test_unbounded_recursion_overflows_stack():
+    """
+    A routine that calls itself forever must not grow into the data region.
+    """
+    prog = assemble(["F:", "CALL F"])
+    c = make_cpu(prog)
+    with pytest.raises(StackOverflowError):
+        while c.running:
+            c.tick()
+    assert c.sp == STACK_BASE
+    assert c.stack.max_depth == STACK_TOP - STACK_BASE
 
 
 @pytest.mark.parametrize(
@@ -688,3 +713,212 @@ def test_and_resets_negative_flag():
     assert not c._alu.negative
     assert not c._alu.carry
     assert not c._alu.overflow
+
+
+def test_fork_runs_independently():
+    """
+    Ensure a forked CPU starts from the parent's state and that the two
+    diverge without affecting one another.
+    """
+    prog = assemble(
+        [
+            "LOADI R1, #5",
+            "LOADI R0, #0",
+            "STORE R1, [R0]",
+            "ADDI R1, R1, #1",
+            "ADDI R0, R0, #1",
+            "STORE R1, [R0]",
+            "CALL F",
+            "HALT",
+            "F:",
+            "RET",
+        ]
+    )
+    parent = make_cpu(prog)
+    for _ in range(3):
+        parent.tick()  # LOADI, LOADI, STORE
+    child = parent.fork()
+    assert child.pc == parent.pc == 3
+    assert child.get_reg(1) == 5
+    assert child._i_mem is parent._i_mem  # OK to access in tests
+    assert child._d_mem._cells is parent._d_mem._cells  # shared until written
+
+    child._regs.execute(rd=1, data=40, write_enable=True)
+    while child.running:
+        child.tick()
+    assert child._d_mem.read(1) == 41
+    assert child.stack.max_depth == 1
+    assert parent._d_mem.read(1) == 0  # parent untouched by child writes
+    assert parent.get_reg(1) == 5
+    assert parent.stack.max_depth == 0
+
+    while parent.running:
+        parent.tick()
+    assert parent._d_mem.read(0) == 5
+    assert parent._d_mem.read(1) == 6
+    assert child._d_mem.read(1) == 41
+
+
+def test_fork_copies_alu_flags():
+    c = make_cpu(assemble(["HALT"]))
+    c._alu._flags = Z_FLAG  # OK to access in tests
+    f = c.fork()
+    c._alu._flags = 0
+    assert f._alu.zero
+
+
+SNAPSHOT_PROG = [
+    "LOADI R1, #5",
+    "LOADI R0, #3",
+    "STORE R1, [R0]",
+    "LOOP:",
+    "SUB R1, R1, R2",
+    "CALL F",
+    "BNE LOOP",
+    "HALT",
+    "F:",
+    "RET",
+]
+
+
+def _run_to_halt(c):
+    while c.running:
+        c.tick()
+
+
+def test_snapshot_restore_round_trip():
+    """
+    Ensure that a CPU restored from a snapshot continues exactly as the
+    original does.
+    """
+    prog = assemble(SNAPSHOT_PROG)
+    c = make_cpu(prog)
+    c._regs.execute(rd=2, data=1, write_enable=True)
+    for _ in range(5):
+        c.tick()
+    blob = c.snapshot()
+    assert blob[:4] == Cpu.SNAPSHOT_MAGIC
+
+    other = make_cpu(prog)
+    other.restore(blob)
+    assert other.snapshot() == blob
+    assert (other.pc, other.sp, other.cycles) == (c.pc, c.sp, c.cycles)
+    assert other.decoded == c.decoded
+
+    _run_to_halt(c)
+    _run_to_halt(other)
+    assert other.snapshot() == c.snapshot()
+    assert other.get_reg(1) == 0
+    assert other._d_mem.read(3) == 5  # OK to access in tests
+
+
+def test_restore_rewinds_in_place():
+    prog = assemble(SNAPSHOT_PROG)
+    c = make_cpu(prog)
+    c._regs.execute(rd=2, data=1, write_enable=True)
+    blob = c.snapshot()
+    _run_to_halt(c)
+    assert not c.running
+    c.restore(blob)
+    assert c.running
+    assert c.pc == 0 and c.cycles == 0
+    assert c._d_mem.read(3) == 0  # OK to access in tests
+
+
+def test_restore_rejects_bad_blob():
+    c = make_cpu()
+    blob = bytearray(c.snapshot())
+    blob[4] = 99  # version
+    with pytest.raises(ValueError, match="version"):
+        c.restore(bytes(blob))
+
+
+def test_run_instruction_limit():
+    """
+    Ensure a runaway program is stopped once its instruction budget is spent.
+    """
+    c = make_cpu(assemble(["LOOP:", "B LOOP"]))
+    stop = c.run(max_instructions=2500, check_every=64)
+    assert stop.reason == "instruction-limit"
+    assert c.cycles == 2500
+    assert c.running
+
+
+def test_run_deadline():
+    c = make_cpu(assemble(["LOOP:", "B LOOP"]))
+    stop = c.run(timeout=0.01, check_every=256)
+    assert stop.reason == "deadline"
+    assert c.cycles % 256 == 0
+
+
+def test_run_stack_depth_limit():
+    c = make_cpu(assemble(["F:", "CALL F"]))
+    stop = c.run(max_stack_depth=10)
+    assert stop.reason == "stack-depth"
+    assert c.stack.depth == 10
+    assert c.stack.floor == STACK_BASE  # limit only applies during the run
+
+
+def test_resume_after_stack_depth_stop():
+    prog = assemble(
+        [
+            "LOADI R1, #1",  # 0
+            "CALL F",  # 1
+            "HALT",  # 2
+            "F:",
+            "CALL G",  # 3
+            "RET",  # 4
+            "G:",
+            "ADD R3, R1, R0",  # 5
+            "RET",  # 6
+        ]
+    )
+    c = make_cpu(prog)
+    stop = c.run(max_stack_depth=1)
+    assert (stop.reason, stop.pc, stop.cycles) == ("stack-depth", 3, 2)
+    assert c.stack.depth == 1
+    assert c.run().reason == "halt"
+    assert c.get_reg(3) == 1
+    assert c.cycles == make_cpu(prog).run().cycles
+
+
+def test_run_within_limits_halts():
+    c = make_cpu(assemble(["CALL F", "HALT", "F:", "RET"]))
+    stop = c.run(max_instructions=100, timeout=10, max_stack_depth=1)
+    assert stop.reason == "halt"
+    assert c.cycles == 3
+
+
+def test_diff_against_fork():
+    """
+    Ensure `diff()` reports exactly the state that diverged after a fork.
+    """
+    prog = assemble(SNAPSHOT_PROG)
+    c = make_cpu(prog)
+    c._regs.execute(rd=2, data=1, write_enable=True)
+    f = c.fork()
+    assert not c.diff(f)
+    for _ in range(4):
+        f.tick()  # LOADI, LOADI, STORE, SUB
+    d = c.diff(f)
+    assert d.pc == (0, 4)
+    assert d.registers == {0: (0, 3), 1: (0, 4)}
+    assert d.memory == [(3, 0, 5)]
+    assert d.sp is None and d.halted is None
+    f.tick()  # CALL
+    d = c.diff(f)
+    assert d.sp == (c.sp, c.sp - 1)
+    assert d.pc == (0, 7)
+    assert (f.sp, 0, 5) in d.memory  # return address
+
+
+def test_diff_against_snapshot():
+    c = make_cpu(assemble(SNAPSHOT_PROG))
+    c._regs.execute(rd=2, data=1, write_enable=True)
+    blob = c.snapshot()
+    _run_to_halt(c)
+    d = c.diff(blob)
+    assert d.halted == (True, False)
+    assert d.registers[0] == (3, 0)
+    assert d.memory == [(3, 5, 0), (c.sp - 1, 5, 0)]  # stale return address
+    assert not c.diff(c.snapshot())
@@ -0,0 +1,234 @@
+"""
+Event subscriptions for the Catamount Processing Unit.
+
+Tools subscribe to events through `Cpu.subscribe()`:
+
+    event       fields
+    --------    ----------------------------------------------
+    "fetch"     pc, ir            (before the instruction executes)
+    "retire"    pc, instruction   (the decoded `Instruction`)
+    "read"      address, value    (data memory reads)
+    "write"     address, value    (data memory writes)
+    "register"  register, value   (register file writes)
+    "call"      pc, target        (pc of the CALL, address jumped to)
+    "ret"       pc, target        (pc of the RET, return address)
+
+A subscriber is called as `fn(*fields)` for each event, or, when subscribed
+with `batch=n`, as `fn(*columns)` with one column per field holding up to
+`n` events (an `array` of ints, or a list for "retire"'s instructions).
+Batched subscribers to the same event share one buffer, which is delivered
+when the smallest batch size fills and when `Cpu.run()` returns.
+
+Fetch, retire, call and ret are produced by `Cpu.run()`; with nothing
+subscribed it runs its plain loop with no event checks at all, and with
+subscribers the step function only contains checks for the events that are
+subscribed. Memory and register events are delivered on every access while
+subscribed, by wrappers installed as instance attributes (as with
+`Memory.add_hook()`), so unsubscribed accesses cost nothing.
+
+CS 2210 Computer Organization
+"""
+
+from array import array
+
+EVENTS = {
+    "fetch": ("pc", "ir"),
+    "retire": ("pc", "instruction"),
+    "read": ("address", "value"),
+    "write": ("address", "value"),
+    "register": ("register", "value"),
+    "call": ("pc", "target"),
+    "ret": ("pc", "target"),
+}
+
+
+class _Channel:
+    """
+    Subscribers to one event, and the buffer for the batched ones.
+    """
+
+    def __init__(self, event):
+        self.event = event
+        self.immediate = []
+        self.batched = {}  # fn -> batch size
+        self.limit = 0
+        self.columns = None
+
+    def __bool__(self):
+        return bool(self.immediate or self.batched)
+
+    def _new_columns(self):
+        if self.event == "retire":
+            return (array("q"), [])
+        return (array("q"), array("q"))
+
+    def rebuild(self):
+        """
+        Flush pending events, then return the emit function for the
+        current subscribers, or `None` if there are none.
+        """
+        self.flush()
+        immediate = tuple(self.immediate)
+        self.limit = min(self.batched.values(), default=0)
+        self.columns = self._new_columns() if self.batched else None
+        if not self.batched:
+            if len(immediate) == 1:
+                return immediate[0]
+
+            def emit(a, b):
+                for fn in immediate:
+                    fn(a, b)
+
+            return emit if immediate else None
+
+        first, second = self.columns
+        limit = self.limit
+        flush = self.flush
+
+        def emit(a, b):
+            for fn in immediate:
+                fn(a, b)
+            first.append(a)
+            second.append(b)
+            if len(first) >= limit:
+                flush()
+
+        return emit
+
+    def flush(self):
+        if not self.columns or not self.columns[0]:
+            return
+        first, second = self.columns
+        a, b = first[:], second[:]
+        del first[:]
+        del second[:]
+        for fn in self.batched:
+            fn(a, b)
+
+
+class Events:
+    """
+    Event subscriptions for one `Cpu` (see `Cpu.subscribe()`).
+    """
+
+    def __init__(self, cpu):
+        self._cpu = cpu
+        self._channels = {event: _Channel(event) for event in EVENTS}
+        self._emit = dict.fromkeys(EVENTS)
+        self._regs_hooked = None  # (wrapper, previous attribute, live flag)
+
+    @property
+    def active(self):
+        """True if any event has a subscriber."""
+        return any(self._emit.values())
+
+    def subscribe(self, event, fn, batch=None):
+        if event not in EVENTS:
+            raise ValueError(f"Unknown event: {event!r}.")
+        if batch is not None and batch < 1:
+            raise ValueError("Batch size must be at least 1.")
+        channel = self._channels[event]
+        self._drop(channel, fn)
+        if batch is None:
+            channel.immediate.append(fn)
+        else:
+            channel.batched[fn] = batch
+        self._update(event)
+
+    def unsubscribe(self, event, fn):
+        channel = self._channels[event]
+        if not self._drop(channel, fn):
+            raise ValueError(f"{fn!r} is not subscribed to {event!r}.")
+        self._update(event)
+
+    @staticmethod
+    def _drop(channel, fn):
+        if fn in channel.immediate:
+            channel.immediate.remove(fn)
+            return True
+        return channel.batched.pop(fn, None) is not None
+
+    def flush(self):
+        """
+        Deliver all buffered events to batched subscribers.
+        """
+        for channel in self._channels.values():
+            channel.flush()
+
+    def _update(self, event):
+        old = self._emit[event]
+        new = self._emit[event] = self._channels[event].rebuild()
+        d_mem = self._cpu._d_mem
+        if event in ("read", "write"):
+            if old is not None:
+                d_mem.remove_hook(event, old)
+            if new is not None:
+                d_mem.add_hook(event, new)
+        elif event == "register":
+            self._hook_registers(new)
+
+    def _hook_registers(self, emit):
+        regs = self._cpu._regs
+        if self._regs_hooked is not None:
+            wrapper, previous, live = self._regs_hooked
+            self._regs_hooked = None
+            live[0] = False  # a wrapper left in place stops emitting
+            if regs.__dict__.get("execute") is wrapper:
+                if previous is None:
+                    del regs.__dict__["execute"]
+                else:
+                    regs.execute = previous
+        if emit is None:
+            return
+        previous = regs.__dict__.get("execute")
+        method = regs.execute
+        registers = regs.registers
+        live = [True]
+
+        def execute(rd=None, ra=None, rb=None, data=None, write_enable=False):
+            result = method(rd, ra, rb, data, write_enable)
+            if write_enable and live[0]:
+                emit(rd, registers[rd].value)
+            return result
+
+        regs.execute = execute
+        self._regs_hooked = (execute, previous, live)
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with the fetch, retire, call and ret events that have
+        subscribers, for `Cpu._stepper()`.
+        """
+        emit = self._emit
+        on_fetch, on_retire = emit["fetch"], emit["retire"]
+        on_call, on_ret = emit["call"], emit["ret"]
+        if not (on_fetch or on_retire or on_call or on_ret):
+            return step
+        read_ir = cpu._i_mem.read
+
+        if on_fetch:
+            inner = step
+
+            def step():
+                if not cpu._halt:
+                    on_fetch(cpu._pc, read_ir(cpu._pc))
+                return inner()
+
+        if not (on_retire or on_call or on_ret):
+            return step
+        fetching = step
+
+        def evented_step():
+            pc = cpu._pc
+            if not fetching():
+                return False
+            decoded = cpu._decoded
+            if on_retire:
+                on_retire(pc, decoded)
+            if on_call and decoded.mnem == "CALL":
+                on_call(pc, cpu._pc)
+            elif on_ret and decoded.mnem == "RET":
+                on_ret(pc, cpu._pc)
+            return True
+
+        return evented_step
@@ -0,0 +1,106 @@
+"""
+Tests for event subscriptions.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+
+PROG = assemble(
+    [
+        "LOADI R1, #2",  # 0
+        "LOADI R2, #1",  # 1
+        "LOOP:",
+        "STORE R1, [R0]",  # 2
+        "LOAD R3, [R0]",  # 3
+        "CALL F",  # 4
+        "SUB R1, R1, R2",  # 5
+        "BNE LOOP",  # 6
+        "HALT",  # 7
+        "F:",
+        "RET",  # 8
+    ]
+)
+
+
+def test_no_subscribers_uses_plain_tick():
+    c = make_cpu(PROG)
+    seen = []
+    c.subscribe("retire", seen.append)
+    assert c._stepper() != c.tick  # OK to access in tests
+    c.unsubscribe("retire", seen.append)
+    assert c._stepper() == c.tick
+    assert "execute" not in c._regs.__dict__
+
+
+def test_immediate_events():
+    c = make_cpu(PROG)
+    log = []
+    for event in ("fetch", "call", "ret", "read", "write", "register"):
+        c.subscribe(event, lambda a, b, event=event: log.append((event, a, b)))
+    assert c.run().reason == "halt"
+    assert log[:3] == [("fetch", 0, PROG[0]), ("register", 1, 2), ("fetch", 1, PROG[1])]
+    assert ("write", 0, 2) in log
+    assert ("read", 0, 2) in log
+    assert log.count(("call", 4, 8)) == 2
+    assert log.count(("ret", 8, 5)) == 2
+    assert sum(1 for e in log if e[0] == "fetch") == c.cycles
+
+
+def test_batched_retire_events():
+    c = make_cpu(PROG)
+    batches = []
+    c.subscribe("retire", lambda pcs, instrs: batches.append((pcs, instrs)), batch=4)
+    c.run()
+    assert [len(pcs) for pcs, _ in batches] == [4, 4, 4, 3]  # last batch flushed by run()
+    pcs = [pc for batch, _ in batches for pc in batch]
+    assert pcs == [0, 1, 2, 3, 4, 8, 5, 6, 2, 3, 4, 8, 5, 6, 7]
+    assert batches[0][1][2].mnem == "STORE"
+
+
+def test_bad_subscriptions():
+    c = make_cpu(PROG)
+    with pytest.raises(ValueError):
+        c.subscribe("bogus", print)
+    with pytest.raises(ValueError):
+        c.unsubscribe("fetch", print)
+    with pytest.raises(ValueError):
+        c.subscribe("fetch", print, batch=0)
+
+
+def test_register_hook_leaves_other_wrappers_alone():
+    c = make_cpu(PROG)
+    regs = c._regs  # OK to access in tests
+    calls = []
+
+    def wrap():
+        inner = regs.execute
+
+        def execute(*args, **kwargs):
+            calls.append(1)
+            return inner(*args, **kwargs)
+
+        regs.execute = execute
+        return execute
+
+    before = wrap()
+    seen = []
+
+    def on_register(r, value):
+        seen.append(r)
+
+    c.subscribe("register", on_register)
+    after = wrap()
+    c.tick()  # LOADI R1
+    assert seen == [1] and len(calls) == 2
+    c.unsubscribe("register", on_register)
+    assert regs.execute is after  # not removed from under the later wrapper
+    c.tick()
+    assert seen == [1]  # but no longer emitting
+    regs.execute = before
+    c.subscribe("register", on_register)
+    c.unsubscribe("register", on_register)
+    assert regs.execute is before  # the earlier wrapper is put back
@@ -0,0 +1,208 @@
+"""
+Compact binary execution trace for the Catamount Processing Unit.
+
+A `TraceBuffer` is a run monitor (see `Cpu.attach()`) that stores one
+fixed-width record per retired instruction in preallocated `array` columns
+used as a ring buffer, so recording allocates no objects and formats
+nothing. Once `capacity` records are held, the oldest are overwritten.
+
+Each record holds:
+
+    cycle     cycle count after the instruction retired
+    pc        address of the instruction
+    word      raw instruction word
+    rd        register written (-1 if none)
+    rd_value  value written to `rd` (0 if none)
+    access    data memory access: 0 none, READ or WRITE
+    address   address accessed (0 if none)
+    value     value read or written (0 if none)
+    flags     ALU flags after the instruction
+
+Every field of a slot is written on each record, so a reused slot never
+carries values over from the record it replaces.
+
+Records are only decoded (into `Instruction` objects and text) when the
+trace is read, with `records()` and `format()`. `columns()` returns the raw
+columns oldest first, and `as_numpy()` the same as NumPy arrays.
+
+CS 2210 Computer Organization
+"""
+
+from array import array
+from collections import namedtuple
+
+from instruction_set import ISA, Instruction
+
+READ = 1
+WRITE = 2
+
+COLUMNS = (
+    ("cycle", "Q"),
+    ("pc", "H"),
+    ("word", "H"),
+    ("rd", "b"),
+    ("rd_value", "i"),
+    ("access", "B"),
+    ("address", "H"),
+    ("value", "H"),
+    ("flags", "B"),
+)
+
+TraceRecord = namedtuple(
+    "TraceRecord",
+    "cycle pc word instruction rd rd_value access address value flags",
+)
+
+# Opcodes whose instructions write `rd`.
+_WRITES_RD = bytearray(16)
+for _info in ISA.values():
+    if _info["register_write"]:
+        _WRITES_RD[_info["opcode"]] = 1
+
+
+class TraceBuffer:
+    """
+    Ring buffer of the last `capacity` retired instructions.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        if capacity < 1:
+            raise ValueError("Trace capacity must be at least 1.")
+        self.capacity = capacity
+        self._columns = {
+            name: array(code, bytes(array(code).itemsize * capacity))
+            for name, code in COLUMNS
+        }
+        self.total = 0  # records ever written
+        self._pos = 0  # next slot to write
+        self._cpu = None
+        self._access = [0, 0, 0]  # kind, address, value of the last access
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def _on_read(self, addr, value):
+        self._access[:] = (READ, addr, value)
+
+    def _on_write(self, addr, value):
+        self._access[:] = (WRITE, addr, value)
+
+    def stop_tracking(self):
+        """Remove the memory hooks (e.g., after `Cpu.detach()`)."""
+        if self._cpu is not None:
+            self._cpu._d_mem.remove_hook("read", self._on_read)
+            self._cpu._d_mem.remove_hook("write", self._on_write)
+            self._cpu = None
+
+    def clear(self):
+        self.total = 0
+        self._pos = 0
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with trace recording, for `Cpu._stepper()`.
+        """
+        if self._cpu is not cpu:
+            self.stop_tracking()
+            self._cpu = cpu
+            cpu._d_mem.add_hook("read", self._on_read)
+            cpu._d_mem.add_hook("write", self._on_write)
+        c = self._columns
+        cycles, pcs, words = c["cycle"], c["pc"], c["word"]
+        rds, rd_values = c["rd"], c["rd_value"]
+        kinds, addresses, values = c["access"], c["address"], c["value"]
+        flags = c["flags"]
+        registers = cpu._regs.registers
+        alu = cpu._alu
+        access = self._access
+        capacity = self.capacity
+
+        def traced_step():
+            pc = cpu._pc
+            if not step():
+                return False
+            i = self._pos
+            d = cpu._decoded
+            cycles[i] = cpu._cycles
+            pcs[i] = pc
+            words[i] = cpu._ir
+            if _WRITES_RD[d.opcode]:
+                rds[i] = d.rd
+                rd_values[i] = registers[d.rd].value
+            else:
+                rds[i] = -1
+                rd_values[i] = 0  # unused fields are zeroed, not left stale
+            kind = access[0]
+            kinds[i] = kind
+            if kind:
+                addresses[i] = access[1]
+                values[i] = access[2]
+                access[0] = 0
+            else:
+                addresses[i] = values[i] = 0
+            flags[i] = alu._flags
+            self._pos = i + 1 if i + 1 < capacity else 0
+            self.total += 1
+            return True
+
+        return traced_step
+
+    def columns(self):
+        """
+        Return `{name: array}` holding the buffered records, oldest first.
+        """
+        n = len(self)
+        start = (self._pos - n) % self.capacity
+        result = {}
+        for name, column in self._columns.items():
+            if start + n <= self.capacity:
+                result[name] = column[start : start + n]
+            else:
+                result[name] = column[start:] + column[: self._pos]
+        return result
+
+    def as_numpy(self):
+        """
+        Return `{name: numpy array}` holding the buffered records, oldest
+        first.
+        """
+        import numpy as np  # optional dependency, only needed here
+
+        return {
+            name: np.frombuffer(column, dtype=column.typecode)
+            for name, column in self.columns().items()
+        }
+
+    def records(self, last=None):
+        """
+        Yield `TraceRecord`s, oldest first (or only the `last` n records),
+        decoding instruction words as they are read.
+        """
+        columns = self.columns()
+        n = len(self)
+        start = 0 if last is None else max(0, n - last)
+        decoded = {}
+        names = [name for name, _ in COLUMNS]
+        for i in range(start, n):
+            fields = {name: columns[name][i] for name in names}
+            word = fields["word"]
+            if word not in decoded:
+                decoded[word] = Instruction(raw=word)
+            if fields["rd"] < 0:
+                fields["rd_value"] = None
+            if not fields["access"]:
+                fields["address"] = fields["value"] = None
+            yield TraceRecord(instruction=decoded[word], **fields)
+
+    def format(self, last=None):
+        """
+        Yield one line of text per record, as `records()`.
+        """
+        for r in self.records(last):
+            text = f"{r.cycle:>10} {r.pc:04X}: {r.word:04X} {r.instruction.mnem:<5}"
+            if r.rd >= 0:
+                text += f" R{r.rd}={r.rd_value & 0xFFFF:04X}"
+            if r.access:
+                arrow = "<-" if r.access == READ else "->"
+                text += f" M[{r.address:04X}]{arrow}{r.value:04X}"
+            yield text + f" flags={r.flags:04b}"
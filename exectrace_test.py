@@ -0,0 +1,85 @@
+"""
+Tests for the binary execution trace.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+from exectrace import READ, WRITE, TraceBuffer
+
+PROG = assemble(
+    [
+        "LOADI R1, #7",  # 0
+        "STORE R1, [R0]",  # 1
+        "LOAD R2, [R0]",  # 2
+        "ADD R3, R1, R2",  # 3
+        "HALT",  # 4
+    ]
+)
+
+
+def _traced(capacity=16):
+    c = make_cpu(PROG)
+    trace = TraceBuffer(capacity)
+    c.attach(trace)
+    c.run()
+    return c, trace
+
+
+def test_records_are_decoded_on_read():
+    c, trace = _traced()
+    assert len(trace) == trace.total == c.cycles == 5
+    records = list(trace.records())
+    assert [r.pc for r in records] == [0, 1, 2, 3, 4]
+    mnems = [r.instruction.mnem for r in records]
+    assert mnems == ["LOADI", "STORE", "LOAD", "ADD", "HALT"]
+    assert (records[0].rd, records[0].rd_value) == (1, 7)
+    assert (records[1].access, records[1].address, records[1].value) == (WRITE, 0, 7)
+    assert (records[2].access, records[2].rd_value) == (READ, 7)
+    assert records[3].rd_value == 14
+    assert records[4].rd is not None and records[4].rd_value is None
+    assert records[4].address is None
+    assert records[3].cycle == 4
+
+
+def test_ring_buffer_keeps_newest():
+    c, trace = _traced(capacity=3)
+    assert len(trace) == 3
+    assert trace.total == 5
+    assert list(trace.columns()["pc"]) == [2, 3, 4]
+    assert [r.pc for r in trace.records(last=2)] == [3, 4]
+    lines = list(trace.format())
+    assert "LOAD" in lines[0] and "M[0000]<-0007" in lines[0]
+    assert "R3=000E" in lines[1]
+
+
+def test_reused_slots_hold_no_stale_fields():
+    # Capacity 2 puts the ADD (no memory access) in the slot the STORE used
+    # and the HALT (no register write) in the one the LOAD used.
+    _, trace = _traced(capacity=2)
+    cols = trace.columns()
+    assert list(cols["pc"]) == [3, 4]
+    assert list(cols["access"]) == [0, 0]
+    assert list(cols["address"]) == list(cols["value"]) == [0, 0]
+    assert list(cols["rd"])[1] == -1
+    assert list(cols["rd_value"]) == [14, 0]
+
+
+def test_as_numpy():
+    np = pytest.importorskip("numpy")
+    _, trace = _traced(capacity=4)
+    cols = trace.as_numpy()
+    assert cols["pc"].dtype == np.uint16
+    assert cols["pc"].tolist() == [1, 2, 3, 4]
+    assert cols["cycle"].tolist() == [2, 3, 4, 5]
+
+
+def test_detach_removes_hooks():
+    c, trace = _traced()
+    assert "read" in c._d_mem.__dict__  # OK to access in tests
+    c.detach(trace)
+    assert "read" not in c._d_mem.__dict__
+    assert "write" not in c._d_mem.__dict__
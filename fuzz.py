@@ -0,0 +1,217 @@
+"""
+Coverage-guided input fuzzing for guest programs.
+
+A `Fuzzer` holds one CPU with the program loaded. Each input (initial
+register values and a block of data memory words) is run on a fork of that
+CPU, so the program is loaded and decoded once and data memory is shared
+copy-on-write; starting an execution costs little more than copying the
+registers. Every run has an instruction budget.
+
+Inputs that reach new instructions or branch directions (see
+`coverage_map.Coverage`) are kept in the corpus and mutated further.
+Runs that end badly are recorded as crashes, one per kind and PC:
+
+    "bad-address"      a LOAD, STORE or fetch outside the address space
+    "stack-write"      a STORE into the stack region
+    "stack-overflow"   CALL with the stack full
+    "stack-underflow"  RET with the stack empty
+    "bad-decode"       an instruction word that doesn't decode
+    "non-terminating"  the CPU revisited a state (see `loopdetect.py`)
+    "budget"           the instruction budget ran out
+    "error"            any other exception
+
+Usage:
+
+    fuzzer = Fuzzer(prog, registers=[1, 2], memory=(0x0000, 0x0010))
+    fuzzer.fuzz(10_000)
+    for crash in fuzzer.crashes.values():
+        print(crash.kind, crash.pc, crash.input)
+
+CS 2210 Computer Organization
+"""
+
+import random
+import time
+from dataclasses import dataclass
+
+from constants import STACK_BASE
+from coverage_map import Coverage
+from cpu import make_cpu
+from loopdetect import LoopDetector
+from stack import StackOverflowError, StackUnderflowError
+
+# Values that tend to find edge cases in 16-bit code.
+INTERESTING = (0x0000, 0x0001, 0x0002, 0x7FFF, 0x8000, 0xFFFF, 0xFFFE, STACK_BASE)
+
+
+@dataclass(frozen=True)
+class FuzzInput:
+    """
+    Initial register values (for `Fuzzer.registers`, in order) and data
+    memory words (loaded at the start of `Fuzzer.memory`).
+    """
+
+    registers: tuple = ()
+    memory: tuple = ()
+
+
+@dataclass
+class Crash:
+    """
+    A run that ended badly. `detail` is the exception message or stop
+    information.
+    """
+
+    kind: str
+    pc: int
+    cycles: int
+    detail: str
+    input: FuzzInput
+
+
+def _classify(exc):
+    """Map an exception raised by `Cpu.run()` to a crash kind."""
+    if isinstance(exc, StackOverflowError):
+        return "stack-overflow"
+    if isinstance(exc, StackUnderflowError):
+        return "stack-underflow"
+    message = str(exc)
+    if isinstance(exc, AssertionError) or "mnemonic" in message:
+        return "bad-decode"
+    if "out of range" in message:
+        return "bad-address"
+    if "stack region" in message:
+        return "stack-write"
+    return "error"
+
+
+class Fuzzer:
+    """
+    Mutates register and data memory inputs to `prog`, keeping those that
+    increase coverage and recording those that crash.
+    """
+
+    def __init__(
+        self,
+        prog,
+        *,
+        registers=range(8),
+        memory=None,
+        budget=10_000,
+        detect_loops=True,
+        seed=None,
+    ):
+        self.registers = tuple(registers)
+        self.memory = memory  # (start, stop) of the input block, or None
+        self.budget = budget
+        self.detect_loops = detect_loops
+        self.random = random.Random(seed)
+        self._base = make_cpu(prog)
+        self.coverage = Coverage()
+        self.corpus = []
+        self.crashes = {}  # (kind, pc) -> first `Crash` seen
+        self.executions = 0
+
+    @property
+    def _memory_size(self):
+        return 0 if self.memory is None else self.memory[1] - self.memory[0]
+
+    def add_seed(self, registers=None, memory=None):
+        """
+        Add an input to the corpus (zeros for anything not given) and run
+        it. Returns the crash, or `None`.
+        """
+        registers = tuple(registers or ()) + (0,) * len(self.registers)
+        memory = tuple(memory or ()) + (0,) * self._memory_size
+        inp = FuzzInput(
+            registers[: len(self.registers)], memory[: self._memory_size]
+        )
+        crash = self.execute(inp)
+        if inp not in self.corpus:
+            self.corpus.append(inp)
+        return crash
+
+    def execute(self, inp):
+        """
+        Run one input on a fork of the loaded program. Adds it to the corpus
+        if it reached new coverage; returns the `Crash` if it crashed,
+        otherwise `None`.
+        """
+        cpu = self._base.fork()
+        regs = cpu._regs.registers
+        for r, value in zip(self.registers, inp.registers):
+            regs[r].value = value
+        if inp.memory:
+            cpu._d_mem.load_words(inp.memory, self.memory[0])
+        cpu.attach(self.coverage)
+        detector = None
+        if self.detect_loops:
+            detector = LoopDetector()
+            cpu.attach(detector)
+
+        before = self.coverage.total()
+        crash = None
+        try:
+            stop = cpu.run(max_instructions=self.budget)
+        except (AssertionError, ValueError, RuntimeError) as exc:
+            crash = Crash(_classify(exc), cpu.pc, cpu.cycles, str(exc), inp)
+        else:
+            if stop.reason != "halt":
+                kind = "budget" if stop.reason == "instruction-limit" else stop.reason
+                crash = Crash(kind, stop.pc, stop.cycles, str(stop.info), inp)
+        finally:
+            if detector is not None:
+                detector.stop_tracking()
+        self.executions += 1
+
+        if self.coverage.total() > before:
+            self.corpus.append(inp)
+        if crash is not None:
+            self.crashes.setdefault((crash.kind, crash.pc), crash)
+        return crash
+
+    def mutate(self, inp):
+        """
+        Return a mutated copy of `inp`: one or more words replaced by an
+        interesting value, a random value, a nearby value, a bit flip, or
+        the corresponding word of another corpus entry.
+        """
+        rng = self.random
+        words = list(inp.registers) + list(inp.memory)
+        if not words:
+            return inp
+        for _ in range(1 + int(rng.expovariate(1.0))):
+            i = rng.randrange(len(words))
+            choice = rng.randrange(5)
+            if choice == 0:
+                words[i] = rng.choice(INTERESTING)
+            elif choice == 1:
+                words[i] = rng.getrandbits(16)
+            elif choice == 2:
+                words[i] = (words[i] + rng.randint(-16, 16)) & 0xFFFF
+            elif choice == 3:
+                words[i] ^= 1 << rng.randrange(16)
+            else:
+                other = rng.choice(self.corpus)
+                words[i] = (list(other.registers) + list(other.memory))[i]
+        n = len(self.registers)
+        return FuzzInput(tuple(words[:n]), tuple(words[n:]))
+
+    def fuzz(self, n=None, *, timeout=None):
+        """
+        Run `n` mutated inputs, or keep going until `timeout` seconds have
+        passed (at least one of the two must be given). Returns the number
+        of executions.
+        """
+        if n is None and timeout is None:
+            raise ValueError("Need a number of executions or a timeout.")
+        if not self.corpus:
+            self.add_seed()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = 0
+        while n is None or done < n:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            self.execute(self.mutate(self.random.choice(self.corpus)))
+            done += 1
+        return done
@@ -0,0 +1,66 @@
+"""
+Tests for the coverage-guided fuzzer.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from fuzz import Fuzzer, FuzzInput, _classify
+from stack import StackUnderflowError
+
+PROG = assemble(
+    [
+        "LOAD R0, [R7]",  # 0: R0 <- M[0]
+        "LOADI R2, #1",  # 1
+        "STORE R0, [R0]",  # 2: M[R0] <- R0; bad address if R0 wraps negative
+        "SUB R3, R2, R1",  # 3
+        "BNE L",  # 4: loops forever unless R1 == 1
+        "HALT",  # 5
+        "L:",
+        "B L",  # 6
+    ]
+)
+
+
+def test_seed_runs_and_records_crash():
+    f = Fuzzer(PROG, registers=[1], memory=(0, 1), seed=0)
+    assert f.add_seed(registers=[1]) is None
+    assert f.coverage.addresses() == [0, 1, 2, 3, 4, 5]
+    crash = f.add_seed()  # R1 == 0: spins at L
+    assert crash.kind == "non-terminating"
+    assert crash.input == FuzzInput((0,), (0,))
+    assert f.executions == 2
+
+
+def test_fuzz_finds_new_paths_and_crashes():
+    f = Fuzzer(PROG, registers=[1], memory=(0, 1), seed=1)
+    f.add_seed(registers=[1])
+    assert f.fuzz(500) == 500
+    assert 6 in f.coverage.addresses()
+    kinds = {kind for kind, _ in f.crashes}
+    assert "non-terminating" in kinds
+    assert "bad-address" in kinds
+    assert len(f.corpus) >= 2
+
+
+def test_budget_without_loop_detection():
+    f = Fuzzer(PROG, registers=[1], memory=(0, 1), budget=50, detect_loops=False)
+    crash = f.add_seed()
+    assert crash.kind == "budget"
+    assert crash.cycles == 50
+
+
+def test_classify():
+    assert _classify(ValueError("Address 0x10000 out of range.")) == "bad-address"
+    assert _classify(RuntimeError("Write to stack region 0xff00 disallowed.")) == (
+        "stack-write"
+    )
+    assert _classify(StackUnderflowError("empty")) == "stack-underflow"
+    assert _classify(AssertionError()) == "bad-decode"
+
+
+def test_fuzz_needs_a_limit():
+    with pytest.raises(ValueError):
+        Fuzzer(PROG).fuzz()
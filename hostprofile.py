@@ -0,0 +1,207 @@
+"""
+Host-side phase profiler for the simulator itself.
+
+Where does host CPU time go while the simulator runs a guest program? A
+`HostProfiler` is a run monitor (see `Cpu.attach()`) that times, with
+`time.perf_counter_ns()`, each sampled instruction as a whole and each
+call into the engine's phases during it:
+
+    fetch       InstructionMemory.read
+    decode      Cpu._decode (decode cache lookup, and `Instruction`
+                construction on a miss)
+    registers   RegisterFile.execute
+    alu         Alu.set_op and Alu.execute (including flag updates)
+    memory      DataMemory.read and DataMemory.write
+    stack       Stack.push and Stack.pop
+
+Time in an instruction not spent in any phase is reported as "dispatch"
+(the `match` in `Cpu.tick()`, call overhead, and so on). Time per
+instruction is also attributed to its opcode. With `every=n` only every
+n-th instruction is timed, which keeps overhead down on long runs.
+
+Phases are timed by wrapping the methods while the profiler tracks a CPU:
+memory methods through `Memory.add_wrapper()`, so hooks other monitors add
+later keep the timing in place, and the rest with instance attributes.
+`stop_tracking()` removes them. An attribute wrapper something else has
+since replaced or wrapped is left in place and just stops timing, so other
+tools keep working. Timer overhead is included in every figure, so compare
+profiles with each other rather than reading them as absolute costs.
+
+CS 2210 Computer Organization
+"""
+
+import time
+from array import array
+
+from instruction_set import OPCODE_MAP
+
+PHASES = ("fetch", "decode", "registers", "alu", "memory", "stack")
+
+
+class HostProfiler:
+    """
+    Attributes host wall time to simulator phases and guest opcodes.
+    """
+
+    def __init__(self, every=1):
+        if every < 1:
+            raise ValueError("Sampling interval must be at least 1.")
+        self.every = every
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.opcode_ns = array("Q", bytes(8 * 16))
+        self.opcode_count = array("Q", bytes(8 * 16))
+        self.sampled_ns = 0
+        self._cpu = None
+        self._timing = [False]  # True while a sampled instruction runs
+        self._wrapped = []  # (object, name, previous instance value, wrapper)
+        self._memory_wrapped = []  # (memory, name, wrap), see `add_wrapper()`
+        self._live = [False]  # cleared when the current wrappers are removed
+
+    def _targets(self, cpu):
+        return [
+            (cpu._i_mem, "read", "fetch"),
+            (cpu, "_decode", "decode"),
+            (cpu._regs, "execute", "registers"),
+            (cpu._alu, "set_op", "alu"),
+            (cpu._alu, "execute", "alu"),
+            (cpu._d_mem, "read", "memory"),
+            (cpu._d_mem, "write", "memory"),
+            (cpu._stack, "push", "stack"),
+            (cpu._stack, "pop", "stack"),
+        ]
+
+    def _start(self, cpu):
+        self._cpu = cpu
+        timing = self._timing
+        live = self._live = [True]
+        phase_ns = self.phase_ns
+        phase_calls = self.phase_calls
+        ns = time.perf_counter_ns
+
+        def timer(phase):
+            def wrap(method):
+                def timed(*args, **kwargs):
+                    if not (timing[0] and live[0]):
+                        return method(*args, **kwargs)
+                    start = ns()
+                    try:
+                        return method(*args, **kwargs)
+                    finally:
+                        phase_ns[phase] += ns() - start
+                        phase_calls[phase] += 1
+
+                return timed
+
+            return wrap
+
+        for obj, name, phase in self._targets(cpu):
+            wrap = timer(phase)
+            if hasattr(obj, "add_wrapper"):  # a memory
+                obj.add_wrapper(name, wrap)
+                self._memory_wrapped.append((obj, name, wrap))
+                continue
+            timed = wrap(getattr(obj, name))
+            self._wrapped.append((obj, name, obj.__dict__.get(name), timed))
+            setattr(obj, name, timed)
+
+    def stop_tracking(self):
+        """Remove the timing wrappers (e.g., after `Cpu.detach()`)."""
+        self._live[0] = False
+        for obj, name, previous, timed in reversed(self._wrapped):
+            if obj.__dict__.get(name) is not timed:
+                continue  # replaced or wrapped since; ours is now a no-op
+            if previous is None:
+                del obj.__dict__[name]
+            else:
+                setattr(obj, name, previous)
+        self._wrapped = []
+        for memory, name, wrap in self._memory_wrapped:
+            memory.remove_wrapper(name, wrap)
+        self._memory_wrapped = []
+        self._cpu = None
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with timing, for `Cpu._stepper()`.
+        """
+        if self._cpu is not cpu:
+            self.stop_tracking()
+            self._start(cpu)
+        timing = self._timing
+        opcode_ns = self.opcode_ns
+        opcode_count = self.opcode_count
+        every = self.every
+        countdown = every
+        ns = time.perf_counter_ns
+
+        def timed_step():
+            nonlocal countdown
+            countdown -= 1
+            if countdown:
+                return step()
+            countdown = every
+            timing[0] = True
+            start = ns()
+            try:
+                result = step()
+            finally:
+                elapsed = ns() - start
+                timing[0] = False
+            self.sampled_ns += elapsed
+            if result:
+                op = cpu._decoded.opcode
+                opcode_ns[op] += elapsed
+                opcode_count[op] += 1
+            return result
+
+        return timed_step
+
+    def finish(self, cpu):
+        """Called when `Cpu.run()` returns."""
+        self.stop_tracking()
+
+    def phases(self):
+        """
+        Return `[(phase, ns, calls), ...]` including "dispatch", largest
+        first.
+        """
+        rows = [(p, self.phase_ns[p], self.phase_calls[p]) for p in PHASES]
+        dispatch = self.sampled_ns - sum(self.phase_ns.values())
+        rows.append(("dispatch", max(0, dispatch), sum(self.opcode_count)))
+        rows.sort(key=lambda row: -row[1])
+        return rows
+
+    def opcodes(self):
+        """
+        Return `[(mnemonic, ns, count), ...]` for sampled instructions,
+        largest total first.
+        """
+        rows = [
+            (OPCODE_MAP.get(op, "???"), self.opcode_ns[op], self.opcode_count[op])
+            for op in range(16)
+            if self.opcode_count[op]
+        ]
+        rows.sort(key=lambda row: -row[1])
+        return rows
+
+    def report(self):
+        """
+        Return ranked tables of time per phase and per opcode.
+        """
+        total = self.sampled_ns or 1
+        rows = [f"{'phase':<10} {'ms':>10} {'%':>6} {'calls':>10} {'ns/call':>8}"]
+        for phase, t, calls in self.phases():
+            per = t // calls if calls else 0
+            rows.append(
+                f"{phase:<10} {t / 1e6:>10.3f} {100 * t / total:>6.1f} "
+                f"{calls:>10} {per:>8}"
+            )
+        rows.append("")
+        rows.append(f"{'opcode':<10} {'ms':>10} {'%':>6} {'count':>10} {'ns/inst':>8}")
+        for mnem, t, count in self.opcodes():
+            rows.append(
+                f"{mnem:<10} {t / 1e6:>10.3f} {100 * t / total:>6.1f} "
+                f"{count:>10} {t // count:>8}"
+            )
+        return "\n".join(rows)
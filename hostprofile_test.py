@@ -0,0 +1,110 @@
+"""
+Tests for the host-side phase profiler.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+from hostprofile import PHASES, HostProfiler
+from locality import LocalityProfiler
+from loopdetect import LoopDetector
+
+PROG = assemble(
+    [
+        "LOADI R1, #10",
+        "LOADI R2, #1",
+        "LOOP:",
+        "STORE R1, [R0]",
+        "LOAD R3, [R0]",
+        "CALL F",
+        "SUB R1, R1, R2",
+        "BNE LOOP",
+        "HALT",
+        "F:",
+        "RET",
+    ]
+)
+
+
+def test_phases_and_opcodes_are_attributed():
+    c = make_cpu(PROG)
+    prof = HostProfiler()
+    c.attach(prof)
+    c.run()
+    calls = {phase: n for phase, _, n in prof.phases()}
+    assert calls["fetch"] == calls["decode"] == calls["dispatch"] == c.cycles
+    assert calls["memory"] == 20  # 10 loads, 10 stores
+    assert calls["stack"] == 20
+    assert calls["alu"] == 2 * 20  # set_op and execute for STORE and SUB
+    opcodes = {mnem: n for mnem, _, n in prof.opcodes()}
+    assert opcodes["BNE"] == 10
+    assert opcodes["HALT"] == 1
+    assert sum(t for _, t, _ in prof.opcodes()) == prof.sampled_ns
+    # Wrappers are removed when the run ends.
+    assert "execute" not in c._regs.__dict__  # OK to access in tests
+    assert "_decode" not in c.__dict__
+    report = prof.report()
+    assert report.splitlines()[0].split() == ["phase", "ms", "%", "calls", "ns/call"]
+    assert all(phase in report for phase in PHASES)
+
+
+def test_sampling_interval():
+    c = make_cpu(PROG)
+    prof = HostProfiler(every=4)
+    c.attach(prof)
+    c.run()
+    assert sum(n for _, _, n in prof.opcodes()) == c.cycles // 4
+    with pytest.raises(ValueError):
+        HostProfiler(every=0)
+
+
+def test_keeps_hooks_added_after_it():
+    # The loop only differs between iterations in memory, so a detector
+    # that stops seeing writes reports it as non-terminating.
+    prog = assemble(
+        [
+            "LOADI R4, #5",
+            "LOOP:",
+            "LOAD R1, [R0]",
+            "ADDI R1, R1, #1",
+            "STORE R1, [R0]",
+            "SUB R3, R1, R4",
+            "LOADI R1, #0",
+            "LOADI R3, #0",
+            "BNE LOOP",
+            "HALT",
+        ]
+    )
+    c = make_cpu(prog)
+    prof = HostProfiler()
+    c.attach(prof)
+    c.attach(LoopDetector())
+    assert c.run(max_instructions=3).reason == "instruction-limit"
+    assert c.run().reason == "halt"
+    assert "write" in c._d_mem.__dict__  # the detector's hook is still there
+    prof.stop_tracking()
+    assert "_decode" not in c.__dict__
+
+
+def test_wrappers_are_removed_when_the_program_faults():
+    c = make_cpu(assemble(["RET"]))
+    c.attach(HostProfiler())
+    with pytest.raises(RuntimeError):
+        c.run()
+    assert "_decode" not in c.__dict__
+    assert "execute" not in c._regs.__dict__
+
+
+def test_memory_timing_survives_hooks_added_later():
+    c = make_cpu(PROG)
+    prof = HostProfiler()
+    c.attach(prof)
+    c.attach(LocalityProfiler())  # adds memory hooks after the profiler starts
+    c.run()
+    calls = {phase: n for phase, _, n in prof.phases()}
+    assert calls["memory"] == 20
+    assert calls["fetch"] == c.cycles
+    assert "read" not in c._d_mem.__dict__  # OK to access in tests
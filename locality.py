@@ -0,0 +1,236 @@
+"""
+Memory access heatmap and locality report.
+
+A `LocalityProfiler` counts data memory reads and writes per address, and
+instruction fetches per address, in 64K-entry uint32 arrays. It works
+entirely through `Memory.add_hook()` on the CPU's data and instruction
+memories, installed only while a run it is attached to (see `Cpu.attach()`)
+is in progress, so other runs pay nothing; it does not wrap the step
+function at all. Note that forks share instruction memory, so fetches by
+forks are counted too while the profiler is tracking.
+
+It also logs the first `max_log` data accesses (address and the PC of the
+accessing instruction), from which it derives:
+
+    working_set()   distinct addresses touched per window of accesses
+    reuse()         histogram of reuse (LRU stack) distances
+    strides()       address strides between successive accesses per PC
+
+`write_csv()` writes the per-address counts; `write_heatmap()` writes a
+256 x 256 greyscale image of the address space (one pixel per address,
+row = high byte) as a binary PGM file, which most image tools open.
+
+CS 2210 Computer Organization
+"""
+
+import math
+from array import array
+
+ADDRESS_SPACE = 0x10000
+
+
+def _zeros():
+    return array("I", bytes(4 * ADDRESS_SPACE))
+
+
+class _Fenwick:
+    """Binary indexed tree over positions 1..n, for prefix counts."""
+
+    def __init__(self, n):
+        self.tree = [0] * (n + 1)
+
+    def add(self, i, delta):
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        tree = self.tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+class LocalityProfiler:
+    """
+    Per-address access counts and locality statistics.
+    """
+
+    def __init__(self, max_log=1 << 20):
+        self.reads = _zeros()
+        self.writes = _zeros()
+        self.fetches = _zeros()
+        self.max_log = max_log
+        self.log_addresses = array("H")
+        self.log_pcs = array("H")
+        self._cpu = None
+
+    def guard(self, cpu, step):
+        """
+        Start tracking `cpu`'s memories, for `Cpu._stepper()`. The step
+        function itself is returned unchanged.
+        """
+        if self._cpu is not cpu:
+            self.stop_tracking()
+            self._start(cpu)
+        return step
+
+    def _start(self, cpu):
+        self._cpu = cpu
+        reads, writes, fetches = self.reads, self.writes, self.fetches
+        log_addresses, log_pcs = self.log_addresses, self.log_pcs
+        max_log = self.max_log
+
+        def on_read(addr, value):
+            reads[addr] += 1
+            if len(log_addresses) < max_log:
+                log_addresses.append(addr)
+                log_pcs.append((cpu._pc - 1) & 0xFFFF)  # PC already advanced
+
+        def on_write(addr, value):
+            writes[addr] += 1
+            if len(log_addresses) < max_log:
+                log_addresses.append(addr)
+                log_pcs.append((cpu._pc - 1) & 0xFFFF)
+
+        def on_fetch(addr, value):
+            fetches[addr] += 1
+
+        self._hooks = (on_read, on_write, on_fetch)
+        cpu._d_mem.add_hook("read", on_read)
+        cpu._d_mem.add_hook("write", on_write)
+        cpu._i_mem.add_hook("read", on_fetch)
+
+    def finish(self, cpu):
+        """Called when `Cpu.run()` returns: remove the hooks until the next run."""
+        self.stop_tracking()
+
+    def stop_tracking(self):
+        """Remove the memory hooks (e.g., after `Cpu.detach()`)."""
+        if self._cpu is not None:
+            on_read, on_write, on_fetch = self._hooks
+            self._cpu._d_mem.remove_hook("read", on_read)
+            self._cpu._d_mem.remove_hook("write", on_write)
+            self._cpu._i_mem.remove_hook("read", on_fetch)
+            self._cpu = None
+
+    def working_set(self, window=1000):
+        """
+        Return `[(start, distinct addresses), ...]` for consecutive windows
+        of `window` logged accesses.
+        """
+        log = self.log_addresses
+        return [
+            (start, len(set(log[start : start + window])))
+            for start in range(0, len(log), window)
+        ]
+
+    def reuse(self):
+        """
+        Return `(histogram, cold)`: `histogram` maps power-of-two bucket
+        lower bounds (0, 1, 2, 4, 8, ...) to the number of accesses whose
+        reuse distance (distinct other addresses touched since the previous
+        access to the same address) falls in that bucket; `cold` counts
+        first accesses.
+        """
+        log = self.log_addresses
+        marks = _Fenwick(len(log))
+        last = {}
+        histogram = {}
+        cold = 0
+        for t, addr in enumerate(log, 1):
+            prev = last.get(addr)
+            if prev is None:
+                cold += 1
+            else:
+                distance = marks.prefix(t - 1) - marks.prefix(prev)
+                bucket = 0 if distance == 0 else 1 << (distance.bit_length() - 1)
+                histogram[bucket] = histogram.get(bucket, 0) + 1
+                marks.add(prev, -1)
+            marks.add(t, 1)
+            last[addr] = t
+        return dict(sorted(histogram.items())), cold
+
+    def strides(self, top=3):
+        """
+        Return `{pc: [(stride, count), ...]}` giving, for each LOAD/STORE
+        PC, its `top` most common differences between successive addresses
+        it accessed.
+        """
+        previous = {}
+        counts = {}
+        for pc, addr in zip(self.log_pcs, self.log_addresses):
+            if pc in previous:
+                per_pc = counts.setdefault(pc, {})
+                stride = addr - previous[pc]
+                per_pc[stride] = per_pc.get(stride, 0) + 1
+            previous[pc] = addr
+        return {
+            pc: sorted(per_pc.items(), key=lambda item: (-item[1], item[0]))[:top]
+            for pc, per_pc in sorted(counts.items())
+        }
+
+    def write_csv(self, path):
+        """
+        Write "address,reads,writes,fetches" rows for every address with a
+        nonzero count.
+        """
+        with open(path, "w") as f:
+            f.write("address,reads,writes,fetches\n")
+            for addr in range(ADDRESS_SPACE):
+                r, w, x = self.reads[addr], self.writes[addr], self.fetches[addr]
+                if r or w or x:
+                    f.write(f"{addr:#06x},{r},{w},{x}\n")
+
+    def write_heatmap(self, path, kind="data"):
+        """
+        Write a 256 x 256 binary PGM heatmap, log scaled, of data accesses
+        (reads + writes, `kind="data"`) or instruction fetches
+        (`kind="fetch"`).
+        """
+        if kind == "data":
+            counts = [r + w for r, w in zip(self.reads, self.writes)]
+        elif kind == "fetch":
+            counts = self.fetches
+        else:
+            raise ValueError(f"Unknown heatmap kind {kind!r}.")
+        scale = 255 / math.log1p(max(counts) or 1)
+        pixels = bytes(round(math.log1p(n) * scale) for n in counts)
+        with open(path, "wb") as f:
+            f.write(b"P5\n256 256\n255\n")
+            f.write(pixels)
+
+    def report(self, window=1000):
+        """
+        Return a text summary: totals, hottest addresses, working set,
+        reuse distances and strides.
+        """
+        reads, writes = sum(self.reads), sum(self.writes)
+        rows = [
+            f"reads {reads}, writes {writes}, fetches {sum(self.fetches)}, "
+            f"logged {len(self.log_addresses)}"
+        ]
+        counts = [(r + w, a) for a, (r, w) in enumerate(zip(self.reads, self.writes))]
+        hot = sorted((c for c in counts if c[0]), key=lambda c: (-c[0], c[1]))[:10]
+        rows.append(
+            "hottest data addresses: "
+            + ", ".join(f"{a:#06x} ({n})" for n, a in hot)
+        )
+        sizes = [n for _, n in self.working_set(window)]
+        if sizes:
+            rows.append(
+                f"working set per {window} accesses: min {min(sizes)}, "
+                f"mean {sum(sizes) / len(sizes):.1f}, max {max(sizes)}"
+            )
+        histogram, cold = self.reuse()
+        rows.append(f"reuse distance: cold {cold}")
+        for bucket, n in histogram.items():
+            label = str(bucket) if bucket < 2 else f"{bucket}-{2 * bucket - 1}"
+            rows.append(f"  {label:>11}: {n}")
+        for pc, strides in self.strides().items():
+            text = ", ".join(f"{s:+d} x{n}" for s, n in strides)
+            rows.append(f"pc {pc:#06x} strides: {text}")
+        return "\n".join(rows)
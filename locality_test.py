@@ -0,0 +1,84 @@
+"""
+Tests for the memory access heatmap and locality report.
+
+CS 2210 Computer Organization
+"""
+
+from assembler import assemble
+from cpu import make_cpu
+from locality import LocalityProfiler
+
+# Writes M[4], M[3], M[2], M[1] then reads them back in the same order.
+PROG = assemble(
+    [
+        "LOADI R0, #4",  # 0
+        "LOADI R2, #1",  # 1
+        "W:",
+        "STORE R0, [R0]",  # 2
+        "SUB R0, R0, R2",  # 3
+        "BNE W",  # 4
+        "LOADI R0, #4",  # 5
+        "R:",
+        "LOAD R1, [R0]",  # 6
+        "SUB R0, R0, R2",  # 7
+        "BNE R",  # 8
+        "HALT",  # 9
+    ]
+)
+
+
+def _profile(**kwargs):
+    c = make_cpu(PROG)
+    prof = LocalityProfiler(**kwargs)
+    c.attach(prof)
+    c.run()
+    return c, prof
+
+
+def test_counts_and_hooks():
+    c, prof = _profile()
+    assert [prof.writes[a] for a in range(5)] == [0, 1, 1, 1, 1]
+    assert [prof.reads[a] for a in range(5)] == [0, 1, 1, 1, 1]
+    assert prof.fetches[2] == 4
+    assert sum(prof.fetches) == c.cycles
+    # Hooks are only installed during runs.
+    assert "read" not in c._d_mem.__dict__  # OK to access in tests
+    assert "read" not in c._i_mem.__dict__
+
+
+def test_detached_profiler_counts_nothing():
+    c = make_cpu(PROG)
+    prof = LocalityProfiler()
+    c.attach(prof)
+    c.run(max_instructions=8)
+    c.detach(prof)
+    c.run()
+    assert sum(prof.fetches) == 8
+    assert "write" not in c._d_mem.__dict__
+
+
+def test_locality_statistics():
+    _, prof = _profile()
+    assert list(prof.log_addresses) == [4, 3, 2, 1, 4, 3, 2, 1]
+    assert prof.working_set(window=4) == [(0, 4), (4, 4)]
+    histogram, cold = prof.reuse()
+    assert cold == 4
+    assert histogram == {2: 4}  # three others touched between reuses
+    assert prof.strides() == {2: [(-1, 3)], 6: [(-1, 3)]}
+    assert "pc 0x0002 strides: -1 x3" in prof.report(window=4)
+
+
+def test_log_limit_and_outputs(tmp_path):
+    _, prof = _profile(max_log=3)
+    assert len(prof.log_addresses) == 3
+    assert sum(prof.reads) == 4  # counting continues past the log limit
+    csv = tmp_path / "heat.csv"
+    prof.write_csv(csv)
+    lines = csv.read_text().splitlines()
+    assert lines[0] == "address,reads,writes,fetches"
+    assert "0x0004,1,1,4" in lines  # data and instruction address 4
+    pgm = tmp_path / "heat.pgm"
+    prof.write_heatmap(pgm)
+    data = pgm.read_bytes()
+    assert data.startswith(b"P5\n256 256\n255\n")
+    assert len(data) == len(b"P5\n256 256\n255\n") + 0x10000
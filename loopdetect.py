@@ -0,0 +1,136 @@
+"""
+Infinite-loop and livelock detection for guest programs.
+
+A `LoopDetector` is an opt-in run monitor (see `Cpu.attach()`). It keeps a
+Zobrist-style hash of the data memory outside the stack: each populated
+cell contributes `mix(addr, value)`, XORed together, and every write updates
+the hash in O(1) by XORing out the old contribution and XORing in the new.
+Registers, ALU flags, PC, SP and the stack words are few and are hashed when
+needed.
+
+The full state is only hashed after a taken control transfer (a branch,
+CALL or RET landing somewhere other than PC + 1), since any loop must pass
+through one. If the same state is seen twice the program can never halt
+(it is deterministic), and the run stops with reason "non-terminating" and
+the loop's entry PC.
+
+Seen states are kept in a table of at most `max_states` entries; when it
+fills, it is cleared. Loops whose period (in taken branches) is shorter
+than `max_states` are always detected.
+
+CS 2210 Computer Organization
+"""
+
+from constants import STACK_BASE
+
+_MASK64 = (1 << 64) - 1
+
+# Component tags, so e.g. register 1 holding 5 and PC holding 5 differ.
+_PC = 1 << 40
+_SP = 2 << 40
+_FLAGS = 3 << 40
+_REG = 8 << 40
+_MEM = 1 << 48
+
+
+def _mix(x):
+    """splitmix64 finaliser: a cheap, well-distributed 64-bit hash."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class LoopDetector:
+    """
+    Stops `Cpu.run()` when the CPU revisits an earlier architectural state.
+    """
+
+    def __init__(self, max_states=1 << 16):
+        self.max_states = max_states
+        self._cpu = None
+        self._mem_hash = 0
+        self._shadow = {}  # addr -> value, for XORing out old contributions
+        self._seen = {}  # state hash -> (cycles, pc) when first seen
+
+    def _cell(self, addr, value):
+        if value == self._default:
+            return 0  # unwritten and default-valued cells hash alike
+        return _mix(_MEM | addr << 16 | value)
+
+    def _start(self, cpu):
+        """Start tracking writes."""
+        self._cpu = cpu
+        cpu._d_mem.add_hook("write", self._on_write)
+
+    def _reset(self):
+        """
+        Hash the current memory and forget seen states. Memory can change
+        between runs without going through `write()` (`Cpu.restore()`,
+        `load_words()`), and states seen in an earlier run are no evidence
+        of a loop in this one.
+        """
+        d_mem = self._cpu._d_mem
+        self._default = d_mem.default
+        self._shadow = {a: v for a, v in d_mem._cells.items() if a < STACK_BASE}
+        h = 0
+        for addr, value in self._shadow.items():
+            h ^= self._cell(addr, value)
+        self._mem_hash = h
+        self._seen = {}
+
+    def stop_tracking(self):
+        """Stop tracking memory writes (e.g., after `Cpu.detach()`)."""
+        if self._cpu is not None:
+            self._cpu._d_mem.remove_hook("write", self._on_write)
+            self._cpu = None
+
+    def _on_write(self, addr, value):
+        if addr >= STACK_BASE:
+            return  # stack words are hashed directly
+        old = self._shadow.get(addr, self._default)
+        self._mem_hash ^= self._cell(addr, old) ^ self._cell(addr, value)
+        self._shadow[addr] = value
+
+    def state_hash(self):
+        """
+        Return a hash of the CPU's full architectural state.
+        """
+        cpu = self._cpu
+        h = self._mem_hash ^ _mix(_PC | cpu._pc) ^ _mix(_SP | cpu.sp)
+        h ^= _mix(_FLAGS | cpu._alu._flags)
+        for i, reg in enumerate(cpu._regs.registers):
+            h ^= _mix(_REG | i << 32 | reg.value & 0xFFFFFFFF)
+        return h, hash(cpu._stack._words.tobytes())
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with loop detection, for `Cpu._stepper()`.
+        """
+        if self._cpu is not cpu:
+            self.stop_tracking()
+            self._start(cpu)
+        self._reset()  # each call starts a new run
+        seen = self._seen
+
+        def checked_step():
+            pc = cpu._pc
+            result = step()
+            if cpu._pc != pc + 1 and not cpu._halt:
+                key = self.state_hash()
+                first = seen.get(key)
+                if first is not None:
+                    cycles, entry = first
+                    cpu._request_stop(
+                        "non-terminating",
+                        entry_pc=entry,
+                        first_seen=cycles,
+                        period=cpu._cycles - cycles,
+                    )
+                    return False
+                if len(seen) >= self.max_states:
+                    seen.clear()
+                seen[key] = (cpu._cycles, cpu._pc)
+            return result
+
+        return checked_step
@@ -0,0 +1,118 @@
+"""
+Tests for infinite-loop detection.
+
+CS 2210 Computer Organization
+"""
+
+from assembler import assemble
+from cpu import make_cpu
+from loopdetect import LoopDetector
+
+
+def _run(lines, **kwargs):
+    c = make_cpu(assemble(lines))
+    det = LoopDetector(**kwargs)
+    c.attach(det)
+    return c, c.run()
+
+
+def test_branch_to_self():
+    c, stop = _run(["LOOP:", "B LOOP"])
+    assert stop.reason == "non-terminating"
+    assert stop.info["entry_pc"] == 0
+    assert stop.info["period"] == 1
+
+
+def test_bne_on_flag_that_never_changes():
+    c, stop = _run(
+        [
+            "LOADI R1, #1",
+            "LOADI R2, #2",
+            "LOOP:",
+            "STORE R3, [R0]",  # same value, same address after first pass
+            "ADD R3, R1, R2",  # never zero
+            "BNE LOOP",
+            "HALT",
+        ]
+    )
+    assert stop.reason == "non-terminating"
+    assert stop.info["entry_pc"] == 2
+    assert stop.info["period"] == 3
+
+
+def test_call_ret_livelock():
+    c, stop = _run(["LOOP:", "CALL F", "B LOOP", "F:", "RET"])
+    assert stop.reason == "non-terminating"
+
+
+def test_terminating_loop_runs_to_halt():
+    c, stop = _run(
+        [
+            "LOADI R1, #50",
+            "LOADI R2, #1",
+            "LOOP:",
+            "ADDI R0, R1, #0",
+            "STORE R1, [R0]",
+            "SUB R1, R1, R2",
+            "BNE LOOP",
+            "HALT",
+        ]
+    )
+    assert stop.reason == "halt"
+    assert c._d_mem.read(50) == 50  # OK to access in tests
+
+
+def test_memory_changes_are_part_of_state():
+    # The loop body alternates a memory cell between two values, so states
+    # only repeat every second iteration.
+    c, stop = _run(
+        [
+            "LOADI R1, #1",
+            "LOOP:",
+            "LOAD R2, [R0]",
+            "SUB R2, R1, R2",
+            "STORE R2, [R0]",
+            "B LOOP",
+        ]
+    )
+    assert stop.reason == "non-terminating"
+    assert stop.info["period"] == 8
+
+
+def test_each_run_starts_afresh():
+    # Memory is the only state that differs between iterations. Restoring
+    # it bypasses the write hook, and states from the first run must not
+    # count as repeats in the second.
+    c = make_cpu(
+        assemble(
+            [
+                "LOADI R4, #5",
+                "LOOP:",
+                "LOAD R1, [R0]",
+                "ADDI R1, R1, #1",
+                "STORE R1, [R0]",
+                "SUB R3, R1, R4",
+                "LOADI R1, #0",
+                "LOADI R3, #0",
+                "BNE LOOP",
+                "HALT",
+            ]
+        )
+    )
+    initial = c.snapshot()
+    c.attach(LoopDetector())
+    assert c.run(max_instructions=40).reason == "halt"
+    c.restore(initial)
+    assert c.run(max_instructions=20).reason == "instruction-limit"
+    c.restore(initial)
+    assert c.run().reason == "halt"
+
+
+def test_detach_stops_tracking():
+    c = make_cpu(assemble(["HALT"]))
+    det = LoopDetector()
+    c.attach(det)
+    c.run()
+    assert "write" in vars(c._d_mem)  # OK to access in tests
+    c.detach(det)  # calls stop_tracking()
+    assert "write" not in vars(c._d_mem)
@@ -13,7 +13,11 @@ First released: 2025-11-10
   - Moved definition of `STACK_BASE` to `constants.py`.
 """
 
+import struct
+from array import array
+
 from constants import STACK_BASE, STACK_TOP, WORD_SIZE
+from stack import Stack
 
 
 class Memory:
@@ -23,6 +27,8 @@ class Memory:
         self._cells = {}
         self.default = default
         self._write_enable = False
+        self._hooks = {"read": [], "write": []}
+        self._wrappers = {"read": [], "write": []}
 
     def _check_addr(self, address):
         # Make sure address is positive, in the desired range,
@@ -73,27 +79,190 @@ class Memory:
             self._write_enable = False
             return True
 
-    def hexdump(self, start=0, stop=None, width=8):
+    def add_hook(self, kind, fn):
+        """
+        Call `fn(addr, value)` after every successful `read()` or `write()`
+        (`kind` is "read" or "write"). Hooks are installed as an instance
+        attribute shadowing the method, so a memory without hooks pays
+        nothing for this feature.
+        """
+        self._hooks[kind].append(fn)
+        self._install_hooks(kind)
+
+    def remove_hook(self, kind, fn):
+        """
+        Remove a hook added with `add_hook()`.
+        """
+        self._hooks[kind].remove(fn)
+        self._install_hooks(kind)
+
+    def add_wrapper(self, kind, wrap):
+        """
+        Replace `read()` or `write()` with `wrap(method)`, where `method` is
+        what would otherwise be called. Unlike a plain attribute assignment,
+        this survives hooks being added and removed afterwards, as the whole
+        chain (hooks innermost) is rebuilt each time.
+        """
+        self._wrappers[kind].append(wrap)
+        self._install_hooks(kind)
+
+    def remove_wrapper(self, kind, wrap):
+        """
+        Remove a wrapper added with `add_wrapper()`.
+        """
+        self._wrappers[kind].remove(wrap)
+        self._install_hooks(kind)
+
+    def _install_hooks(self, kind):
+        hooks = tuple(self._hooks[kind])
+        wrappers = self._wrappers[kind]
+        if not hooks and not wrappers:
+            self.__dict__.pop(kind, None)  # back to the plain class method
+            return
+        method = getattr(type(self), kind).__get__(self)
+        if hooks and kind == "read":
+            inner = method
+
+            def method(addr):
+                value = inner(addr)
+                for hook in hooks:
+                    hook(addr, value)
+                return value
+
+        elif hooks:
+            inner = method
+
+            def method(addr, value, *args, **kwargs):
+                result = inner(addr, value, *args, **kwargs)
+                for hook in hooks:
+                    hook(addr, value & 0xFFFF)
+                return result
+
+        for wrap in wrappers:
+            method = wrap(method)
+        setattr(self, kind, method)
+
+    def hexdump(self, start=0, stop=None, width=8, collapse=False):
         """
         Yield formatted lines showing memory cells in ascending order
         from `start` to the highest initialized address (or `stop` if provided).
         Uninitialized cells display as 0000.
+
+        With `collapse=True`, rows holding nothing but unwritten or default
+        cells are skipped, and each run of skipped rows is replaced by a
+        single `*` line. Only rows containing populated cells are visited,
+        so a sparse memory costs time proportional to its populated cells.
         """
-        if not self._cells:
+        cells = self._populated()
+        if not cells:
             return  # nothing to show
 
-        highest = max(self._cells)
+        highest = max(cells)
         end = highest + 1 if stop is None else min(stop, highest + 1)
+        if end <= start:
+            return
+
+        row_fmt = " ".join(["{:04X}"] * width)
+        get = cells.get
+
+        if not collapse:
+            for base in range(start, end, width):
+                n = min(width, end - base)
+                fmt = row_fmt if n == width else " ".join(["{:04X}"] * n)
+                vals = [get(addr, 0) for addr in range(base, base + n)]
+                yield f"{base:04X}: " + fmt.format(*vals)
+            return
+
+        default = self.default
+        bases = sorted(
+            {
+                start + (addr - start) // width * width
+                for addr, val in cells.items()
+                if start <= addr < end and val != default
+            }
+        )
+        expected = start
+        for base in bases:
+            if base != expected:
+                yield "*"
+            n = min(width, end - base)
+            fmt = row_fmt if n == width else " ".join(["{:04X}"] * n)
+            vals = [get(addr, 0) for addr in range(base, base + n)]
+            yield f"{base:04X}: " + fmt.format(*vals)
+            expected = base + width
+        if expected < end:
+            yield "*"
+
+    def dump(self, fp, start=0, stop=None, width=8, collapse=True):
+        """
+        Stream a hexdump to `fp`, either an open text file or a path. Lines
+        are written as they are produced, so the whole dump is never held
+        in memory. Returns the number of lines written.
+        """
+        if isinstance(fp, (str, bytes)) or hasattr(fp, "__fspath__"):
+            with open(fp, "w") as f:
+                return self.dump(f, start, stop, width, collapse)
+        count = 0
+        for line in self.hexdump(start, stop, width, collapse):
+            fp.write(line + "\n")
+            count += 1
+        return count
+
+    def diff(self, other):
+        """
+        Compare this memory against `other` and return a sorted list of
+        `(address, ours, theirs)` tuples for every cell that differs.
+        Unwritten cells compare as each memory's default value. Only
+        populated cells are examined.
+        """
+        mine = self._populated()
+        theirs = other._populated()
+        d_mine = self.default
+        d_theirs = other.default
+        result = []
+        for addr, val in mine.items():
+            other_val = theirs.get(addr, d_theirs)
+            if val != other_val:
+                result.append((addr, val, other_val))
+        for addr, other_val in theirs.items():
+            if addr not in mine and other_val != d_mine:
+                result.append((addr, d_mine, other_val))
+        result.sort()
+        return result
+
+    def load_words(self, words, start_addr=0x0000):
+        """
+        Bulk-load 16-bit words into consecutive cells starting at
+        `start_addr`, masking each to 16 bits. This is the loader path: the
+        address range is checked once for the whole block and write enable is
+        neither required nor changed. Returns the number of words loaded.
+        """
+        words = [w & 0xFFFF for w in words]
+        if not words:
+            return 0
+        self._check_addr(start_addr)
+        self._check_addr(start_addr + len(words) - 1)
+        self._cells.update(zip(range(start_addr, start_addr + len(words)), words))
+        return len(words)
+
+    def read_range(self, start, stop):
+        """
+        Return a list of the words at addresses `start` up to (not including)
+        `stop`. Unwritten cells read as the default value.
+        """
+        if stop <= start:
+            return []
+        self._check_addr(start)
+        self._check_addr(stop - 1)
+        get = self._populated().get
+        default = self.default
+        return [get(addr, default) for addr in range(start, stop)]
 
-        for base in range(start, end, width):
-            row = []
-            for offset in range(width):
-                addr = base + offset
-                if addr >= end:
-                    break
-                val = self._cells.get(addr, 0)
-                row.append(f"{val:04X}")
-            yield f"{base:04X}: {' '.join(row)}"
+    def _populated(self):
+        """
+        Return a mapping of every address that has been written to its value.
+        """
+        return self._cells
 
     def __len__(self):
         return len(self._cells)
@@ -105,14 +274,297 @@ class Memory:
 class DataMemory(Memory):
     """
     Word-addressable memory for data. Reserves a portion for stack use.
+
+    Addresses at or above `STACK_BASE` live in a dedicated `Stack` unit
+    (`self.stack`), which the CPU uses directly for CALL and RET. Ordinary
+    reads and writes of the stack region are routed to the same unit, so
+    both views always agree.
     """
 
+    def __init__(self, default=0):
+        super().__init__(default)
+        self.stack = Stack(default=default)
+        self._shared = False  # `_cells` shared with a fork; copy before writing
+        self._dirty = set()  # addresses written since last `clear_dirty()`
+        # Addresses written since the baseline; two memories with the same
+        # baseline token can only differ at these addresses (or the stack).
+        self._modified = set()
+        self._baseline = None  # None: empty memory
+        self._devices = []  # (start, stop, device), see `map_device()`
+        # Lowest address needing more than a plain cell access. Ordinary
+        # addresses are below it, so they pay a single comparison.
+        self._device_base = STACK_BASE
+
+    def map_device(self, device, start, stop):
+        """
+        Route data memory accesses to addresses `start` up to (not
+        including) `stop`, which must lie below `STACK_BASE`, to `device`:
+        reads return `device.read(offset)` and writes call
+        `device.write(offset, value)`, where `offset` is `addr - start`. A
+        device without a `write` method is read-only.
+        """
+        if not 0 <= start < stop <= STACK_BASE:
+            raise ValueError(f"Bad device range {start:#06x}..{stop:#06x}.")
+        for lo, hi, _ in self._devices:
+            if start < hi and lo < stop:
+                raise ValueError(f"Device range overlaps {lo:#06x}..{hi:#06x}.")
+        self._devices.append((start, stop, device))
+        self._device_base = min(lo for lo, _, _ in self._devices)
+
+    def unmap_device(self, device):
+        self._devices = [d for d in self._devices if d[2] is not device]
+        self._device_base = min((lo for lo, _, _ in self._devices), default=STACK_BASE)
+
+    def _device_at(self, addr):
+        for start, stop, device in self._devices:
+            if start <= addr < stop:
+                return device, addr - start
+        return None, None
+
+    def fork(self):
+        """
+        Return a copy-on-write clone. Parent and child share the populated
+        cells until one of them writes, at which point the writer takes a
+        private copy. The stack unit is small and is copied outright.
+        """
+        child = DataMemory.__new__(DataMemory)
+        child.__dict__.update(self.__dict__)
+        child.stack = self.stack.copy()
+        # Hooks belong to the parent; the child starts with none.
+        child.__dict__.pop("read", None)
+        child.__dict__.pop("write", None)
+        child._hooks = {"read": [], "write": []}
+        child._wrappers = {"read": [], "write": []}
+        # So do devices, which are usually bound to the parent's CPU;
+        # `Cpu.fork()` maps them into the child.
+        child._devices = []
+        child._device_base = STACK_BASE
+        child._dirty = set(self._dirty)
+        child._modified = set(self._modified)
+        child._write_enable = False
+        self._shared = child._shared = True
+        return child
+
+    # Layout: cell count; stack SP and bookkeeping; addresses; values;
+    # stack words and written-word map (see `Stack.get_state()`).
+    _STATE = struct.Struct("<I IIQQ")
+
+    def snapshot(self, dirty_only=False):
+        """
+        Return the populated cells, in address order, and the stack unit's
+        state as bytes. With
+        `dirty_only=True`, only cells written since the last `clear_dirty()`
+        are included (the stack is always included; it is small).
+        """
+        stack_regs, stack_words = self.stack.get_state()
+        cells = self._cells
+        # Sorted, so equal states always give equal bytes.
+        addrs = array("H", sorted(self._dirty if dirty_only else cells))
+        vals = array("H", [cells[a] for a in addrs])
+        return b"".join(
+            (
+                self._STATE.pack(len(addrs), *stack_regs),
+                addrs.tobytes(),
+                vals.tobytes(),
+                stack_words,
+            )
+        )
+
+    def clear_dirty(self):
+        """
+        Forget which cells have been written, starting a new dirty interval.
+        """
+        self._dirty = set()
+
+    def restore(self, blob, offset=0, merge=False):
+        """
+        Restore state from `blob` (as produced by `snapshot()`), starting at
+        `offset`. With `merge=True` the cells in `blob` are applied on top of
+        the current cells, as for a `dirty_only` snapshot. Returns the offset
+        just past the data consumed.
+        """
+        start = offset
+        fields = self._STATE.unpack_from(blob, offset)
+        n = fields[0]
+        offset += self._STATE.size
+        addrs = array("H")
+        addrs.frombytes(blob[offset : offset + 2 * n])
+        offset += 2 * n
+        vals = array("H")
+        vals.frombytes(blob[offset : offset + 2 * n])
+        offset += 2 * n
+        size = self.stack.state_size
+        self.stack.set_state(fields[1:], blob[offset : offset + size])
+        if merge:
+            if self._shared:
+                self._unshare()
+            self._cells.update(zip(addrs, vals))
+            self._modified.update(addrs)
+        else:
+            self._cells = dict(zip(addrs, vals))
+            self._shared = False
+            self._modified = set()
+            self._baseline = ("snapshot", hash(bytes(blob[start:offset])))
+        self._dirty = set()
+        self._write_enable = False
+        return offset + size
+
+    def mark_baseline(self):
+        """
+        Make the current contents the baseline for `diff()`: from now on
+        only cells written after this call are candidates for differences
+        against memories forked from this one (which share the baseline).
+        """
+        self._modified = set()
+        self._baseline = object()
+
+    def diff(self, other, full=None):
+        """
+        Like `Memory.diff()`, but when both memories share a baseline (one
+        was forked from the other, both were restored from the same
+        snapshot, or both started empty) only cells modified since then on
+        either side are compared, so the cost is proportional to what was
+        written rather than to the populated size. Pass `full=True` to force
+        a comparison of every populated cell.
+        """
+        if full is None:
+            full = (
+                not isinstance(other, DataMemory)
+                or self._baseline != other._baseline
+                or self.default != other.default
+            )
+        if full:
+            return super().diff(other)
+        mine = self._cells
+        theirs = other._cells
+        d_mine = self.default
+        d_theirs = other.default
+        result = []
+        for addr in self._modified | other._modified:
+            ours = mine.get(addr, d_mine)
+            other_val = theirs.get(addr, d_theirs)
+            if ours != other_val:
+                result.append((addr, ours, other_val))
+        if self.stack._words != other.stack._words:
+            stack_mine = self.stack.populated()
+            stack_theirs = other.stack.populated()
+            for addr in stack_mine.keys() | stack_theirs.keys():
+                ours = stack_mine.get(addr, d_mine)
+                other_val = stack_theirs.get(addr, d_theirs)
+                if ours != other_val:
+                    result.append((addr, ours, other_val))
+        result.sort()
+        return result
+
+    def _unshare(self):
+        self._cells = dict(self._cells)
+        self._shared = False
+
+    def read(self, addr):
+        if addr >= self._device_base:
+            if addr >= STACK_BASE:
+                self._check_addr(addr)
+                return self.stack.read(addr)
+            device, offset = self._device_at(addr)
+            if device is not None:
+                return device.read(offset) & 0xFFFF
+        return super().read(addr)
+
     def write(self, addr, value, from_stack=False):
-        if addr >= STACK_BASE and not from_stack:
-            raise RuntimeError(f"Write to stack region {addr:#06x} disallowed.")
+        if addr >= self._device_base:
+            if addr >= STACK_BASE:
+                if not from_stack:
+                    raise RuntimeError(f"Write to stack region {addr:#06x} disallowed.")
+                if not self._write_enable:
+                    raise RuntimeError("Write attempted when write_enable is False.")
+                self._check_addr(addr)
+                self.stack.store(addr, value)
+                self._write_enable = False
+                return True
+            device, offset = self._device_at(addr)
+            if device is not None:
+                if not self._write_enable:
+                    raise RuntimeError("Write attempted when write_enable is False.")
+                if not hasattr(device, "write"):
+                    raise RuntimeError(f"Write to read-only device at {addr:#06x}.")
+                device.write(offset, value & 0xFFFF)
+                self._write_enable = False
+                return True
+        if self._shared:
+            self._unshare()
         super().write(addr, value)
+        self._dirty.add(addr)
+        self._modified.add(addr)
         return True
 
+    def load_words(self, words, start_addr=0x0000):
+        """
+        Bulk-load an initial data image. Unlike `write()`, this may also
+        initialise the stack region.
+        """
+        words = list(words)
+        split = max(0, min(len(words), STACK_BASE - start_addr))
+        if split and self._shared:
+            self._unshare()
+        count = super().load_words(words[:split], start_addr)
+        self._dirty.update(range(start_addr, start_addr + split))
+        self._modified.update(range(start_addr, start_addr + split))
+        if split < len(words):
+            addr = start_addr + split
+            self._check_addr(addr)
+            self._check_addr(start_addr + len(words) - 1)
+            for offset, word in enumerate(words[split:]):
+                self.stack.store(addr + offset, word)
+            count += len(words) - split
+        return count
+
+    def as_array(self, start=0x0000, stop=None):
+        """
+        Return words `start` up to `stop` (default: highest populated address)
+        as a NumPy `uint16` array. Unwritten cells read as the default value.
+
+        A range lying entirely within the stack region is returned as a
+        zero-copy view of the stack unit's buffer, so later pushes show up in
+        it. Any other range is a fresh array built from the populated cells.
+        Requires NumPy.
+        """
+        import numpy as np  # optional dependency, only needed here
+
+        if stop is None:
+            cells = self._populated()
+            stop = max(cells) + 1 if cells else start
+        if stop <= start:
+            return np.empty(0, dtype=np.uint16)
+        self._check_addr(start)
+        self._check_addr(stop - 1)
+        base = self.stack.base
+        stack_view = np.frombuffer(self.stack._words, dtype=np.uint16)
+        if start >= base:
+            return stack_view[start - base : stop - base]
+
+        arr = np.full(stop - start, self.default, dtype=np.uint16)
+        items = [(a - start, v) for a, v in self._cells.items() if start <= a < stop]
+        if items:
+            idx, vals = zip(*items)
+            arr[list(idx)] = vals
+        if stop > base:
+            arr[base - start :] = stack_view[: stop - base]  # start < base here
+        return arr
+
+    def __len__(self):
+        return len(self._cells) + self.stack.written_count()
+
+    def __contains__(self, addr):
+        if addr >= STACK_BASE:
+            return self.stack.written(addr)
+        return addr in self._cells
+
+    def _populated(self):
+        stack_cells = self.stack.populated()
+        if not stack_cells:
+            return self._cells
+        return {**self._cells, **stack_cells}
+
 
 class InstructionMemory(Memory):
     """
@@ -123,6 +575,7 @@ class InstructionMemory(Memory):
     def __init__(self, default=0):
         super().__init__(default)
         self._loading = False  # internal guard flag
+        self.generation = 0  # incremented by every `load_program()`
 
     def write(self, addr, value):
         """
@@ -133,25 +586,44 @@ class InstructionMemory(Memory):
         super().write(addr, value)
         return True
 
+    def load_words(self, words, start_addr=0x0000):
+        """
+        Bulk path used by `load_program()`; not available outside the loader.
+        """
+        if not self._loading:
+            raise RuntimeError("Cannot write to instruction memory outside of loader.")
+        return super().load_words(words, start_addr)
+
     def load_program(self, words, start_addr=0x0000):
         """
         Load list of 16-bit words into consecutive memory cells.
         """
         self._loading = True
-        # Write each word in `words` to successive addresses in instruction
-        # memory. Set `_write_enable` as needed can call parent write with
-        # `super().write(start_addr + offset, word)` as needed. Important:
-        # Ensure that `_loading` and `_write_enable` are set to `False` when
-        # done. (Hint: use `try`/`finally`.)
-        self._write_enable = True
+        self.generation += 1
+        # Words are loaded in one bulk update rather than one `write()` per
+        # word. Important: Ensure that `_loading` and `_write_enable` are set
+        # to `False` when done.
         try:
-            for offset, word in enumerate(words):
-                self._write_enable = True # Since it is reset to false for every call of write
-                super().write(start_addr + offset, word)
+            self.load_words(words, start_addr)
         finally:
             self._write_enable = False
             self._loading = False
 
+
+def regions_to_array(memories, start, stop):
+    """
+    Gather words `start` up to `stop` from each memory in `memories` into
+    one 2-D NumPy `uint16` array, one row per memory. Requires NumPy.
+    """
+    import numpy as np  # optional dependency, only needed here
+
+    memories = list(memories)
+    out = np.empty((len(memories), max(0, stop - start)), dtype=np.uint16)
+    for row, mem in zip(out, memories):
+        row[:] = mem.as_array(start, stop)
+    return out
+
+
 if __name__ == "__main__":
 
     # Quick smoke test...
@@ -0,0 +1,344 @@
+"""
+Import and export of memory images for the Catamount Processing Unit.
+
+Supported formats:
+
+    - raw binary, one 16-bit word per two bytes, little- or big-endian
+    - Intel HEX (byte-addressed, so word address `a` is byte address `2a`)
+    - Logisim `v2.0 raw` hex, including `count*value` run-length entries
+    - NumPy `.npy` (1-D `uint16`/`int16`); NumPy itself is not required
+
+Every loader works on either `InstructionMemory` or `DataMemory`. Input is
+read in blocks of `CHUNK_WORDS` words and each block goes through the
+memory's bulk load path, so memory use is bounded regardless of image size.
+Writers likewise read memory a block at a time. Files may be given as paths
+or as already-open file objects (binary for raw/`.npy`, text otherwise).
+
+CS 2210 Computer Organization
+"""
+
+import ast
+import struct
+import sys
+from array import array
+from contextlib import contextmanager
+
+from memory import InstructionMemory
+
+CHUNK_WORDS = 4096
+
+NPY_MAGIC = b"\x93NUMPY"
+LOGISIM_HEADER = "v2.0 raw"
+
+
+@contextmanager
+def _opened(f, mode):
+    """Open `f` if it is a path, otherwise use it as-is (and don't close it)."""
+    if isinstance(f, (str, bytes)) or hasattr(f, "__fspath__"):
+        with open(f, mode) as fp:
+            yield fp
+    else:
+        yield f
+
+
+def _load(mem, words, start_addr):
+    """Send one block of words through the memory's bulk load path."""
+    if isinstance(mem, InstructionMemory):
+        mem.load_program(words, start_addr)
+    else:
+        mem.load_words(words, start_addr)
+
+
+def _stop(mem, stop):
+    """Default end of an export: one past the highest populated address."""
+    if stop is not None:
+        return stop
+    cells = mem._populated()
+    return max(cells) + 1 if cells else 0
+
+
+def _swap(byteorder):
+    if byteorder not in ("little", "big"):
+        raise ValueError(f"Bad byteorder: {byteorder}")
+    return byteorder != sys.byteorder
+
+
+# Raw binary ---------------------------------------------------------------
+
+
+def load_raw(mem, f, start_addr=0x0000, byteorder="little"):
+    """
+    Load a raw binary image of 16-bit words. Returns the number of words
+    loaded.
+    """
+    swap = _swap(byteorder)
+    addr = start_addr
+    with _opened(f, "rb") as fp:
+        while True:
+            data = fp.read(CHUNK_WORDS * 2)
+            if not data:
+                break
+            if len(data) % 2:
+                raise ValueError("Raw image has an odd number of bytes.")
+            block = array("H")
+            block.frombytes(data)
+            if swap:
+                block.byteswap()
+            _load(mem, block, addr)
+            addr += len(block)
+    return addr - start_addr
+
+
+def save_raw(mem, f, start=0x0000, stop=None, byteorder="little"):
+    """
+    Write words `start` up to `stop` (default: highest populated address)
+    as a raw binary image. Returns the number of words written.
+    """
+    swap = _swap(byteorder)
+    stop = _stop(mem, stop)
+    with _opened(f, "wb") as fp:
+        _write_words(mem, fp, start, stop, swap)
+    return max(0, stop - start)
+
+
+def _write_words(mem, fp, start, stop, swap):
+    """Write words `start` up to `stop` to binary file `fp`, a block at a time."""
+    for base in range(start, stop, CHUNK_WORDS):
+        block = array("H", mem.read_range(base, min(base + CHUNK_WORDS, stop)))
+        if swap:
+            block.byteswap()
+        fp.write(block.tobytes())
+
+
+# Intel HEX ----------------------------------------------------------------
+
+
+def _ihex_record(rtype, addr, data):
+    body = bytes([len(data), (addr >> 8) & 0xFF, addr & 0xFF, rtype]) + data
+    checksum = (-sum(body)) & 0xFF
+    return ":" + body.hex().upper() + f"{checksum:02X}\n"
+
+
+def load_ihex(mem, f, byteorder="little"):
+    """
+    Load an Intel HEX image. Data records must be word aligned. Contiguous
+    data records are gathered into blocks before loading. Returns the number
+    of words loaded.
+    """
+    total = 0
+    upper = 0  # from extended address records
+    run_start = None  # byte address of first byte in `run`
+    run = bytearray()
+
+    def flush(keep_odd=False):
+        nonlocal run_start, run, total
+        n = len(run) - (len(run) % 2 if keep_odd else 0)
+        if n % 2:
+            raise ValueError("Intel HEX data does not end on a word boundary.")
+        if n:
+            block = array("H")
+            block.frombytes(bytes(run[:n]))
+            if _swap(byteorder):
+                block.byteswap()
+            _load(mem, block, run_start // 2)
+            total += len(block)
+            run_start += n
+            del run[:n]
+        if not run:
+            run_start = None
+
+    with _opened(f, "r") as fp:
+        for lineno, line in enumerate(fp, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith(":"):
+                raise ValueError(f"Line {lineno}: missing ':' start code.")
+            record = bytes.fromhex(line[1:])
+            if len(record) < 5 or len(record) != record[0] + 5:
+                raise ValueError(f"Line {lineno}: bad record length.")
+            if sum(record) & 0xFF:
+                raise ValueError(f"Line {lineno}: bad checksum.")
+            count, addr, rtype = record[0], (record[1] << 8) | record[2], record[3]
+            data = record[4 : 4 + count]
+            if rtype == 0x00:
+                byte_addr = upper + addr
+                if run_start is not None and byte_addr != run_start + len(run):
+                    flush()
+                if run_start is None:
+                    if byte_addr % 2:
+                        raise ValueError(f"Line {lineno}: data not word aligned.")
+                    run_start = byte_addr
+                run += data
+                if len(run) >= CHUNK_WORDS * 2:
+                    flush(keep_odd=True)
+            elif rtype == 0x01:
+                break
+            elif rtype == 0x02:
+                upper = ((data[0] << 8) | data[1]) << 4
+            elif rtype == 0x04:
+                upper = ((data[0] << 8) | data[1]) << 16
+            elif rtype in (0x03, 0x05):
+                pass  # start address records mean nothing to us
+            else:
+                raise ValueError(f"Line {lineno}: unknown record type {rtype:02X}.")
+    flush()
+    return total
+
+
+def save_ihex(mem, f, start=0x0000, stop=None, byteorder="little", record_words=8):
+    """
+    Write populated cells between `start` and `stop` as Intel HEX. Only runs
+    of populated cells are emitted, so sparse memories give small files.
+    Returns the number of words written.
+    """
+    stop = _stop(mem, stop)
+    cells = mem._populated()
+    addrs = sorted(a for a in cells if start <= a < stop)
+    fmt = "<H" if byteorder == "little" else ">H"
+    _swap(byteorder)  # validate
+    upper = 0
+    with _opened(f, "w") as fp:
+        i = 0
+        while i < len(addrs):
+            # One record: up to `record_words` consecutive populated words that
+            # don't cross a 64 KiB byte boundary.
+            first = addrs[i]
+            j = i + 1
+            while (
+                j < len(addrs)
+                and j - i < record_words
+                and addrs[j] == addrs[j - 1] + 1
+                and (addrs[j] * 2) >> 16 == (first * 2) >> 16
+            ):
+                j += 1
+            byte_addr = first * 2
+            if byte_addr >> 16 != upper:
+                upper = byte_addr >> 16
+                fp.write(_ihex_record(0x04, 0, struct.pack(">H", upper)))
+            data = b"".join(struct.pack(fmt, cells[a]) for a in addrs[i:j])
+            fp.write(_ihex_record(0x00, byte_addr & 0xFFFF, data))
+            i = j
+        fp.write(_ihex_record(0x01, 0, b""))
+    return len(addrs)
+
+
+# Logisim v2.0 raw ---------------------------------------------------------
+
+
+def load_logisim(mem, f, start_addr=0x0000):
+    """
+    Load a Logisim `v2.0 raw` image. Returns the number of words loaded.
+    """
+    addr = start_addr
+    block = []
+    with _opened(f, "r") as fp:
+        header = fp.readline().strip()
+        if header != LOGISIM_HEADER:
+            raise ValueError(f"Not a Logisim image (header {header!r}).")
+        for line in fp:
+            for token in line.split("#", 1)[0].split():
+                if "*" in token:
+                    count, value = token.split("*", 1)
+                    block.extend([int(value, 16)] * int(count))
+                else:
+                    block.append(int(token, 16))
+                if len(block) >= CHUNK_WORDS:
+                    _load(mem, block, addr)
+                    addr += len(block)
+                    block = []
+    if block:
+        _load(mem, block, addr)
+        addr += len(block)
+    return addr - start_addr
+
+
+def save_logisim(mem, f, start=0x0000, stop=None, per_line=8):
+    """
+    Write words `start` up to `stop` as a Logisim `v2.0 raw` image, using
+    `count*value` for repeated words. Returns the number of words written.
+    """
+    stop = _stop(mem, stop)
+    with _opened(f, "w") as fp:
+        fp.write(LOGISIM_HEADER + "\n")
+        tokens = []
+        prev, count = None, 0
+
+        def emit():
+            if count == 1:
+                tokens.append(f"{prev:x}")
+            elif count:
+                tokens.append(f"{count}*{prev:x}")
+            if len(tokens) >= per_line:
+                fp.write(" ".join(tokens) + "\n")
+                tokens.clear()
+
+        for base in range(start, stop, CHUNK_WORDS):
+            for word in mem.read_range(base, min(base + CHUNK_WORDS, stop)):
+                if word == prev:
+                    count += 1
+                else:
+                    emit()
+                    prev, count = word, 1
+        emit()
+        if tokens:
+            fp.write(" ".join(tokens) + "\n")
+    return max(0, stop - start)
+
+
+# NumPy .npy ---------------------------------------------------------------
+
+
+def load_npy(mem, f, start_addr=0x0000):
+    """
+    Load a 1-D `uint16` or `int16` `.npy` file. Returns the number of words
+    loaded.
+    """
+    with _opened(f, "rb") as fp:
+        if fp.read(6) != NPY_MAGIC:
+            raise ValueError("Not a .npy file.")
+        major = fp.read(2)[0]
+        if major == 1:
+            (hlen,) = struct.unpack("<H", fp.read(2))
+        else:
+            (hlen,) = struct.unpack("<I", fp.read(4))
+        header = ast.literal_eval(fp.read(hlen).decode("latin1"))
+        descr = header["descr"]
+        if descr[1:] not in ("u2", "i2") or header["fortran_order"]:
+            raise ValueError(f"Unsupported .npy dtype {descr!r}.")
+        if len(header["shape"]) != 1:
+            raise ValueError("Only 1-D .npy images are supported.")
+        swap = _swap("big" if descr[0] == ">" else "little")
+        remaining = header["shape"][0]
+        addr = start_addr
+        while remaining:
+            n = min(remaining, CHUNK_WORDS)
+            data = fp.read(n * 2)
+            if len(data) != n * 2:
+                raise ValueError(".npy file is truncated.")
+            block = array("H")
+            block.frombytes(data)
+            if swap:
+                block.byteswap()
+            _load(mem, block, addr)
+            addr += n
+            remaining -= n
+    return addr - start_addr
+
+
+def save_npy(mem, f, start=0x0000, stop=None):
+    """
+    Write words `start` up to `stop` as a 1-D little-endian `uint16` `.npy`
+    file. Returns the number of words written.
+    """
+    stop = _stop(mem, stop)
+    n = max(0, stop - start)
+    header = f"{{'descr': '<u2', 'fortran_order': False, 'shape': ({n},), }}"
+    # Pad so magic + version + length + header is a multiple of 64 bytes.
+    pad = 64 - (len(NPY_MAGIC) + 4 + len(header) + 1) % 64
+    header = header + " " * (pad % 64) + "\n"
+    with _opened(f, "wb") as fp:
+        fp.write(NPY_MAGIC + b"\x01\x00" + struct.pack("<H", len(header)))
+        fp.write(header.encode("latin1"))
+        _write_words(mem, fp, start, stop, _swap("little"))
+    return n
@@ -0,0 +1,109 @@
+"""
+Tests for memory image import and export.
+
+CS 2210 Computer Organization
+"""
+
+import io
+
+import pytest
+
+import memory_image
+from constants import STACK_TOP
+from memory import DataMemory, InstructionMemory
+
+PROG = [0x0202, 0x0404, 0x5650, 0x58C8, 0x4B0A, 0xF000]
+
+
+def _data_memory():
+    dm = DataMemory()
+    dm.load_words([0x1234, 0xABCD, 0x0000, 0xFFFF], 0x0010)
+    dm.stack.push(0xBEEF)
+    return dm
+
+
+@pytest.mark.parametrize("byteorder", ["little", "big"])
+def test_raw_round_trip(tmp_path, byteorder):
+    im = InstructionMemory()
+    im.load_program(PROG)
+    path = tmp_path / "prog.bin"
+    assert memory_image.save_raw(im, path, byteorder=byteorder) == len(PROG)
+    assert path.stat().st_size == 2 * len(PROG)
+    im2 = InstructionMemory()
+    assert memory_image.load_raw(im2, path, byteorder=byteorder) == len(PROG)
+    assert im2.read_range(0, len(PROG)) == PROG
+    assert not im2._loading and not im2._write_enable
+
+
+def test_raw_byte_order():
+    buf = io.BytesIO()
+    im = InstructionMemory()
+    im.load_program([0x1234])
+    memory_image.save_raw(im, buf, byteorder="big")
+    assert buf.getvalue() == b"\x12\x34"
+
+
+def test_raw_load_in_chunks(monkeypatch):
+    monkeypatch.setattr(memory_image, "CHUNK_WORDS", 2)
+    dm = DataMemory()
+    words = list(range(7))
+    data = b"".join(w.to_bytes(2, "little") for w in words)
+    assert memory_image.load_raw(dm, io.BytesIO(data), start_addr=0x100) == 7
+    assert dm.read_range(0x100, 0x107) == words
+
+
+def test_ihex_round_trip_sparse():
+    dm = _data_memory()
+    buf = io.StringIO()
+    memory_image.save_ihex(dm, buf)
+    text = buf.getvalue()
+    assert text.endswith(":00000001FF\n")
+    # 0xFFFE * 2 needs an extended linear address record.
+    assert ":020000040001F9\n" in text
+    dm2 = DataMemory()
+    memory_image.load_ihex(dm2, io.StringIO(text))
+    assert dm.diff(dm2) == []
+    assert dm2.read(STACK_TOP - 1) == 0xBEEF
+
+
+def test_ihex_rejects_bad_checksum():
+    with pytest.raises(ValueError, match="checksum"):
+        memory_image.load_ihex(DataMemory(), io.StringIO(":020000003412FF\n"))
+
+
+def test_logisim_round_trip():
+    im = InstructionMemory()
+    im.load_program([0x0000] * 5 + PROG)
+    buf = io.StringIO()
+    memory_image.save_logisim(im, buf)
+    assert buf.getvalue().startswith("v2.0 raw\n5*0 202 404")
+    im2 = InstructionMemory()
+    assert memory_image.load_logisim(im2, io.StringIO(buf.getvalue())) == 11
+    assert im.diff(im2) == []
+
+
+def test_logisim_rejects_missing_header():
+    with pytest.raises(ValueError):
+        memory_image.load_logisim(DataMemory(), io.StringIO("1 2 3\n"))
+
+
+def test_npy_round_trip(tmp_path):
+    dm = DataMemory()
+    dm.load_words(PROG, 0x20)
+    path = tmp_path / "mem.npy"
+    assert memory_image.save_npy(dm, path, start=0x20, stop=0x20 + len(PROG)) == 6
+    assert path.stat().st_size % 64 == 12 % 64  # 64-byte aligned header
+    dm2 = DataMemory()
+    assert memory_image.load_npy(dm2, path, start_addr=0x20) == 6
+    assert dm2.read_range(0x20, 0x26) == PROG
+
+
+def test_npy_readable_by_numpy(tmp_path):
+    np = pytest.importorskip("numpy")
+    im = InstructionMemory()
+    im.load_program(PROG)
+    path = tmp_path / "prog.npy"
+    memory_image.save_npy(im, path)
+    arr = np.load(path)
+    assert arr.dtype == np.uint16
+    assert arr.tolist() == PROG
@@ -8,7 +8,7 @@ Clayton Cafiero <cbcafier@uvm.edu>
 import pytest
 
 from constants import STACK_BASE
-from memory import DataMemory, InstructionMemory, Memory
+from memory import DataMemory, InstructionMemory, Memory, regions_to_array
 
 
 def test_write_out_of_range():
@@ -177,3 +177,139 @@ def test_memory_len_and_contains():
     assert len(m) == 1
     assert 0 in m
     assert 1 not in m
+
+
+def test_hexdump_collapse_skips_default_rows():
+    """
+    Ensure a collapsed dump of a sparse memory shows only populated rows,
+    with `*` standing in for each run of skipped rows.
+    """
+    dm = DataMemory()
+    dm.write_enable(True)
+    dm.write(0x0000, 0x1234)
+    dm.stack.push(0xBEEF)  # lands at 0xFFFE
+    lines = list(dm.hexdump(collapse=True))
+    assert lines == [
+        "0000: 1234 0000 0000 0000 0000 0000 0000 0000",
+        "*",
+        "FFF8: 0000 0000 0000 0000 0000 0000 BEEF",
+    ]
+
+
+def test_hexdump_collapse_matches_full_dump_when_dense():
+    m = Memory()
+    for i in range(1, 20):
+        m.write_enable(True)
+        m.write(i, i)
+    assert list(m.hexdump(width=4, collapse=True)) == list(m.hexdump(width=4))
+
+
+def test_dump_streams_to_file(tmp_path):
+    m = Memory()
+    m.write_enable(True)
+    m.write(0x0100, 0xABCD)
+    path = tmp_path / "dump.txt"
+    assert m.dump(path) == 2
+    assert path.read_text() == "*\n0100: ABCD\n"
+
+
+def test_diff_reports_only_differing_cells():
+    a = DataMemory()
+    b = DataMemory()
+    for mem, addr, val in [(a, 0x10, 1), (a, 0x20, 2), (b, 0x20, 2), (b, 0x30, 3)]:
+        mem.write_enable(True)
+        mem.write(addr, val)
+    a.write_enable(True)
+    a.write(0x40, 0)  # written, but same as default
+    assert a.diff(b) == [(0x10, 1, 0), (0x30, 0, 3)]
+    assert b.diff(a) == [(0x10, 0, 1), (0x30, 3, 0)]
+    assert a.diff(a) == []
+
+
+
+def test_wrappers_survive_hook_changes():
+    dm = DataMemory()
+    calls = []
+    seen = []
+
+    def wrap(method):
+        def read(addr):
+            calls.append(addr)
+            return method(addr)
+
+        return read
+
+    def hook(addr, value):
+        seen.append(addr)
+
+    dm.add_wrapper("read", wrap)
+    dm.add_hook("read", hook)
+    dm.read(3)
+    dm.remove_hook("read", hook)
+    dm.read(4)
+    assert calls == [3, 4] and seen == [3]
+    dm.remove_wrapper("read", wrap)
+    dm.read(5)
+    assert calls == [3, 4]
+    assert "read" not in vars(dm)  # OK to access in tests
+
+
+def test_as_array_fills_defaults():
+    np = pytest.importorskip("numpy")
+    dm = DataMemory()
+    dm.load_words([1, 2, 3], 0x10)
+    arr = dm.as_array(0x0E, 0x14)
+    assert arr.dtype == np.uint16
+    assert arr.tolist() == [0, 0, 1, 2, 3, 0]
+    assert dm.as_array().tolist()[-3:] == [1, 2, 3]
+
+
+def test_as_array_stack_region_is_a_view():
+    pytest.importorskip("numpy")
+    dm = DataMemory()
+    view = dm.as_array(STACK_BASE, STACK_BASE + 256)
+    dm.stack.push(0xBEEF)
+    assert view[-2] == 0xBEEF
+
+
+def test_as_array_spanning_stack_boundary():
+    pytest.importorskip("numpy")
+    dm = DataMemory()
+    dm.load_words([7], STACK_BASE - 1)
+    dm.load_words([8], STACK_BASE)
+    assert dm.as_array(STACK_BASE - 2, STACK_BASE + 2).tolist() == [0, 7, 8, 0]
+
+
+def test_as_array_empty_range():
+    np = pytest.importorskip("numpy")
+    dm = DataMemory()
+    dm.load_words([8], STACK_BASE)
+    for start in (0x10, STACK_BASE, STACK_BASE + 16):
+        arr = dm.as_array(start, start)
+        assert arr.dtype == np.uint16 and arr.size == 0
+    assert dm.as_array(STACK_BASE + 4, STACK_BASE).size == 0
+
+
+def test_regions_to_array():
+    pytest.importorskip("numpy")
+    mems = []
+    for i in range(3):
+        dm = DataMemory()
+        dm.load_words([i, i * 2], 0x40)
+        mems.append(dm)
+    grid = regions_to_array(mems, 0x40, 0x42)
+    assert grid.shape == (3, 2)
+    assert grid.tolist() == [[0, 0], [1, 2], [2, 4]]
+
+
+def test_diff_after_fork_checks_only_modified_cells():
+    a = DataMemory()
+    a.load_words(list(range(1, 101)), 0)
+    a.mark_baseline()
+    b = a.fork()
+    b.write_enable(True)
+    b.write(5, 0xBEEF)
+    a._cells[7] = 0  # behind the back of dirty tracking: not seen
+    assert a.diff(b) == [(5, 6, 0xBEEF)]
+    assert a.diff(b, full=True) == [(5, 6, 0xBEEF), (7, 0, 8)]
+    assert DataMemory().diff(DataMemory()) == []
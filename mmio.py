@@ -0,0 +1,71 @@
+"""
+Guest-visible counters via memory-mapped registers.
+
+`map_counters(cpu)` maps a small read-only device into data memory at
+`MMIO_BASE` (just below the stack), so guest programs can time their own
+routines with LOAD, as they would on real hardware. Each counter is 64 bits
+wide, split across four consecutive words, least significant word first:
+
+    offset  0..3   cycle count
+    offset  4..7   instructions retired
+    offset  8..11  host monotonic clock, nanoseconds
+
+In this model every instruction takes one cycle, so the first two always
+agree; both are provided so programs written against real hardware work
+unchanged. Reading the least significant word of a counter latches its
+whole value, and the other three words return the latched value, so a
+64-bit value read with four LOADs is consistent. (Like any LOAD, reading
+the cycle count returns the count of instructions retired before it.)
+
+Writes to the window raise `RuntimeError`. `Cpu.fork()` gives the child
+its own device, reading the child's counters.
+
+CS 2210 Computer Organization
+"""
+
+import time
+
+from constants import MMIO_BASE
+
+CYCLES = 0
+INSTRET = 4
+TIME_NS = 8
+MMIO_SIZE = 12
+
+
+class CounterDevice:
+    """
+    Read-only counters for `cpu`, for `DataMemory.map_device()`.
+    """
+
+    def __init__(self, cpu, clock=time.monotonic_ns):
+        self._cpu = cpu
+        self._clock = clock
+        self._latched = [0, 0, 0]
+
+    def fork(self, cpu):
+        """Return a device for `cpu`, a fork of this one's CPU."""
+        child = CounterDevice(cpu, self._clock)
+        child._latched = list(self._latched)
+        return child
+
+    def _sample(self, counter):
+        if counter == TIME_NS // 4:
+            return self._clock()
+        return self._cpu.cycles  # cycles and instructions retired agree
+
+    def read(self, offset):
+        counter, word = divmod(offset, 4)
+        if word == 0:
+            self._latched[counter] = self._sample(counter)
+        return (self._latched[counter] >> (16 * word)) & 0xFFFF
+
+
+def map_counters(cpu, base=MMIO_BASE):
+    """
+    Map a `CounterDevice` for `cpu` into its data memory at `base`, and
+    return the device.
+    """
+    device = CounterDevice(cpu)
+    cpu._d_mem.map_device(device, base, base + MMIO_SIZE)
+    return device
@@ -0,0 +1,75 @@
+"""
+Tests for memory-mapped counters.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from constants import MMIO_BASE, STACK_BASE
+from cpu import make_cpu
+from memory import DataMemory
+from mmio import CYCLES, TIME_NS, CounterDevice, map_counters
+
+
+def test_guest_reads_cycle_count():
+    c = make_cpu(assemble(["LOADI R1, #0", "LOADI R2, #0", "LOAD R3, [R1]", "HALT"]))
+    map_counters(c)
+    c.tick()
+    c.tick()
+    c._regs.execute(rd=1, data=MMIO_BASE + CYCLES, write_enable=True)
+    c.tick()  # LOAD R3 <- low word of the cycle count
+    assert c.get_reg(3) == 2
+
+    c._cycles = 0x1_0002_0003  # OK to access in tests
+    d = c._d_mem
+    assert [d.read(MMIO_BASE + i) for i in range(4)] == [0x0003, 0x0002, 0x0001, 0]
+    c._cycles = 0x5_0000_0000  # latched: high words don't change mid-read
+    assert d.read(MMIO_BASE + 1) == 0x0002
+    assert d.read(MMIO_BASE + 4) == 0  # instructions retired, low word
+    assert d.read(MMIO_BASE + 6) == 5
+
+
+def test_clock_and_read_only():
+    c = make_cpu()
+    device = CounterDevice(c, clock=lambda: 0xABCD_1234_5678)
+    c._d_mem.map_device(device, MMIO_BASE, MMIO_BASE + 12)
+    words = [c._d_mem.read(MMIO_BASE + TIME_NS + i) for i in range(3)]
+    assert words == [0x5678, 0x1234, 0xABCD]
+    c._d_mem.write_enable(True)
+    with pytest.raises(RuntimeError, match="read-only"):
+        c._d_mem.write(MMIO_BASE, 1)
+
+
+def test_map_device_checks_and_forks():
+    d = DataMemory()
+    with pytest.raises(ValueError):
+        d.map_device(object(), STACK_BASE - 4, STACK_BASE + 4)
+    c = make_cpu()
+    device = map_counters(c)
+    with pytest.raises(ValueError, match="overlaps"):
+        c._d_mem.map_device(object(), MMIO_BASE - 4, MMIO_BASE + 4)
+    plain = c._d_mem.fork()  # without a CPU to rebind to, devices are dropped
+    plain.write_enable(True)
+    plain.write(MMIO_BASE, 7)
+    assert plain.read(MMIO_BASE) == 7
+    c._d_mem.unmap_device(device)
+    assert c._d_mem.read(MMIO_BASE) == 0
+    assert c._d_mem._device_base == STACK_BASE  # OK to access in tests
+
+
+def test_fork_reads_its_own_counters():
+    prog = assemble(["LOADI R1, #0", "LOADI R2, #0", "LOAD R3, [R1]", "HALT"])
+    c = make_cpu(prog)
+    map_counters(c)
+    c.tick()
+    c.tick()
+    f = c.fork()
+    f._regs.execute(rd=1, data=MMIO_BASE + CYCLES, write_enable=True)
+    f._cycles = 40  # OK to access in tests
+    f.tick()
+    assert f.get_reg(3) == 40
+    c._regs.execute(rd=1, data=MMIO_BASE + CYCLES, write_enable=True)
+    c.tick()
+    assert c.get_reg(3) == 2
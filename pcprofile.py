@@ -0,0 +1,189 @@
+"""
+Sampling PC profiler for guest programs.
+
+A `SamplingProfiler` is a run monitor (see `Cpu.attach()`) that records the
+PC of every `every`-th instruction in a 64K-entry histogram, so its cost is
+a countdown per instruction and one increment per sample. The histogram can
+be aggregated by basic block or by the nearest preceding label from the
+assembler's label table, and `report()` lists hot spots with their `.asm`
+line numbers:
+
+    labels, line_map = symbols(src)
+    prof = SamplingProfiler(every=10)
+    cpu.attach(prof)
+    cpu.run()
+    print(prof.report(labels, line_map, src))
+
+CS 2210 Computer Organization
+"""
+
+from array import array
+from bisect import bisect_right
+
+from instruction_set import ISA
+
+ADDRESS_SPACE = 0x10000
+_BRANCHES = {ISA[m]["opcode"] for m in ("BEQ", "BNE", "B")}
+_CALL = ISA["CALL"]["opcode"]
+_ENDS_BLOCK = _BRANCHES | {_CALL, ISA["RET"]["opcode"], ISA["HALT"]["opcode"]}
+
+
+def _sext8(value):
+    return ((value & 0xFF) ^ 0x80) - 0x80
+
+
+def branch_target(pc, word):
+    """
+    Return the address a branch or CALL at `pc` jumps to, or `None` if
+    `word` isn't one.
+    """
+    opcode = word >> 12
+    if opcode in _BRANCHES:
+        return pc + 1 + _sext8(word)
+    if opcode == _CALL:
+        return pc + 1 + _sext8(word >> 4)
+    return None
+
+
+def basic_blocks(prog):
+    """
+    Return the sorted start addresses (leaders) of the basic blocks of
+    `prog`, a list of instruction words loaded at address 0: the first
+    instruction, every branch and CALL target, and every instruction
+    following a branch, CALL, RET or HALT.
+    """
+    leaders = {0}
+    for pc, word in enumerate(prog):
+        target = branch_target(pc, word)
+        if target is not None and 0 <= target < len(prog):
+            leaders.add(target)
+        if word >> 12 in _ENDS_BLOCK and pc + 1 < len(prog):
+            leaders.add(pc + 1)
+    return sorted(leaders)
+
+
+def label_resolver(labels):
+    """
+    Return a function mapping an address to `(label, offset)` for the
+    nearest label at or before it (`(None, addr)` if there is none).
+    """
+    by_addr = sorted((addr, name) for name, addr in labels.items())
+    addrs = [addr for addr, _ in by_addr]
+
+    def resolve(addr):
+        i = bisect_right(addrs, addr) - 1
+        if i < 0:
+            return None, addr
+        start, name = by_addr[i]
+        return name, addr - start
+
+    return resolve
+
+
+def describe(addr, resolve):
+    """Format `addr` as "0x0012 LOOP+2" (or just the address)."""
+    name, offset = resolve(addr)
+    if name is None:
+        return f"{addr:#06x}"
+    return f"{addr:#06x} {name}+{offset}" if offset else f"{addr:#06x} {name}"
+
+
+class SamplingProfiler:
+    """
+    Samples the PC every `every` instructions run by `Cpu.run()`.
+    """
+
+    def __init__(self, every=100):
+        if every < 1:
+            raise ValueError("Sampling interval must be at least 1.")
+        self.every = every
+        self.histogram = array("I", bytes(4 * ADDRESS_SPACE))
+
+    @property
+    def samples(self):
+        return sum(self.histogram)
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with sampling, for `Cpu._stepper()`.
+        """
+        histogram = self.histogram
+        every = self.every
+        countdown = every
+
+        def sampled_step():
+            nonlocal countdown
+            countdown -= 1
+            if not countdown:
+                countdown = every
+                histogram[cpu._pc & 0xFFFF] += 1
+            return step()
+
+        return sampled_step
+
+    def reset(self):
+        self.histogram = array("I", bytes(4 * ADDRESS_SPACE))
+
+    def by_address(self):
+        """
+        Return `[(addr, samples), ...]`, hottest first.
+        """
+        hot = [(addr, n) for addr, n in enumerate(self.histogram) if n]
+        hot.sort(key=lambda item: (-item[1], item[0]))
+        return hot
+
+    def by_label(self, labels):
+        """
+        Return `[(label, samples), ...]`, hottest first, attributing each
+        sample to the nearest label at or before its PC (`None` for PCs
+        before the first label).
+        """
+        resolve = label_resolver(labels)
+        totals = {}
+        for addr, n in self.by_address():
+            name = resolve(addr)[0]
+            totals[name] = totals.get(name, 0) + n
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+    def by_block(self, prog):
+        """
+        Return `[((start, stop), samples), ...]`, hottest first, for the
+        basic blocks of `prog` (see `basic_blocks()`).
+        """
+        leaders = basic_blocks(prog)
+        bounds = leaders[1:] + [len(prog)]
+        totals = {}
+        for addr, n in self.by_address():
+            i = bisect_right(leaders, addr) - 1
+            if i < 0 or addr >= len(prog):
+                block = (addr, addr + 1)  # outside the program
+            else:
+                block = (leaders[i], bounds[i])
+            totals[block] = totals.get(block, 0) + n
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+    def report(self, labels=None, line_map=None, source=None, top=20):
+        """
+        Return a text table of the `top` hottest addresses with their share
+        of samples, label, source line number and (if `source` is given)
+        source text, followed by per-label totals when `labels` is given.
+        """
+        total = self.samples
+        if not total:
+            return "No samples."
+        resolve = label_resolver(labels or {})
+        line_map = line_map or {}
+        rows = [f"{'samples':>8} {'%':>6}  {'address':<20} {'line':>5}  source"]
+        for addr, n in self.by_address()[:top]:
+            line = line_map.get(addr)
+            text = source[line - 1].strip() if source and line else ""
+            rows.append(
+                f"{n:>8} {100 * n / total:>6.1f}  {describe(addr, resolve):<20} "
+                f"{line if line else '-':>5}  {text}".rstrip()
+            )
+        if labels:
+            rows.append("")
+            rows.append(f"{'samples':>8} {'%':>6}  label")
+            for name, n in self.by_label(labels):
+                rows.append(f"{n:>8} {100 * n / total:>6.1f}  {name or '(none)'}")
+        return "\n".join(rows)
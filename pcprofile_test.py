@@ -0,0 +1,67 @@
+"""
+Tests for the sampling PC profiler.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble, symbols
+from cpu import make_cpu
+from pcprofile import SamplingProfiler, basic_blocks, label_resolver
+
+SRC = [
+    "START:",
+    "    LOADI R1, #40",  # 0, line 2
+    "    LOADI R2, #1",  # 1, line 3
+    "LOOP:",
+    "    CALL WORK",  # 2, line 5
+    "    SUB R1, R1, R2",  # 3, line 6
+    "    BNE LOOP",  # 4, line 7
+    "    HALT",  # 5, line 8
+    "WORK:",
+    "    ADD R3, R3, R2",  # 6, line 10
+    "    ADD R3, R3, R2",  # 7, line 11
+    "    RET",  # 8, line 12
+]
+PROG = assemble(SRC)
+
+
+def test_basic_blocks_and_labels():
+    assert basic_blocks(PROG) == [0, 2, 3, 5, 6]
+    resolve = label_resolver(symbols(SRC)[0])
+    assert resolve(7) == ("WORK", 1)
+    assert resolve(0) == ("START", 0)
+    assert label_resolver({"X": 3})(1) == (None, 1)
+
+
+def test_every_instruction_sampled():
+    c = make_cpu(PROG)
+    prof = SamplingProfiler(every=1)
+    c.attach(prof)
+    c.run()
+    assert prof.samples == c.cycles
+    assert prof.histogram[6] == 40
+    assert prof.by_address()[0] == (2, 40)  # ties broken by address
+    labels, _ = symbols(SRC)
+    assert dict(prof.by_label(labels)) == {"START": 2, "LOOP": 121, "WORK": 120}
+    blocks = dict(prof.by_block(PROG))
+    assert blocks[(6, 9)] == 120
+    assert blocks[(3, 5)] == 80
+
+
+def test_sampling_interval_and_report():
+    c = make_cpu(PROG)
+    prof = SamplingProfiler(every=7)
+    c.attach(prof)
+    c.run()
+    assert prof.samples == c.cycles // 7
+    labels, line_map = symbols(SRC)
+    report = prof.report(labels, line_map, SRC, top=3)
+    lines = report.splitlines()
+    assert lines[0].split()[:3] == ["samples", "%", "address"]
+    assert len([l for l in lines[1:4] if "WORK" in l or "LOOP" in l]) == 3
+    assert "ADD R3, R3, R2" in report or "CALL WORK" in report
+    assert SamplingProfiler().report() == "No samples."
+    with pytest.raises(ValueError):
+        SamplingProfiler(every=0)
@@ -168,6 +168,15 @@ class RegisterFile:
 
         return self._read(ra, rb)  # looks like a read
 
+    def copy(self):
+        """
+        Return a new register file holding the same register values.
+        """
+        other = RegisterFile()
+        for dst, src in zip(other.registers, self.registers):
+            dst.value = src.value
+        return other
+
     def __repr__(self):
         # Notice that this expects a member field `registers`, a list.
         vals = [str(r) for r in self.registers]
@@ -0,0 +1,204 @@
+"""
+Dedicated stack unit for the Catamount Processing Unit.
+
+The stack occupies the top of data memory, from `STACK_TOP` (exclusive, since
+SP starts there and is decremented before each push) down to `STACK_BASE`.
+Rather than going through the general `DataMemory.write()` / `read()` paths,
+CALL and RET push and pop through this unit, which keeps the stack words in a
+preallocated array and needs only a single bounds check per operation.
+
+The unit also keeps a few statistics that are handy when looking at recursive
+guest routines:
+
+    - `depth`: current call depth (number of words on the stack)
+    - `max_depth`: high-water mark of `depth`
+    - `pushes` / `pops`: total number of pushes and pops
+
+CS 2210 Computer Organization
+"""
+
+from array import array
+
+from constants import STACK_BASE, STACK_TOP, WORD_MASK
+
+
+class StackOverflowError(RuntimeError):
+    """Raised when a push would grow the stack into the data region."""
+
+
+class StackUnderflowError(RuntimeError):
+    """Raised when a pop would move SP past `STACK_TOP`."""
+
+
+class StackDepthError(StackOverflowError):
+    """Raised when a push would exceed the depth limit set by `limit_depth()`."""
+
+
+class Stack:
+    """
+    Preallocated, word-addressable stack for the region between `STACK_BASE`
+    and `STACK_TOP` (inclusive).
+    """
+
+    def __init__(self, base=STACK_BASE, top=STACK_TOP, default=0):
+        self.base = base
+        self.top = top
+        self.default = default
+        self._words = array("H", [default]) * (top - base + 1)
+        self.sp = top
+        self.floor = base  # lowest address a push may use
+        self.pushes = 0
+        self.pops = 0
+        self._min_sp = top  # lowest SP seen, gives us the high-water mark
+        # 1 for each word written with `store()` (or pushed before the last
+        # `reset_stats()`). Words pushed since are those from `_min_sp` up.
+        self._stored = bytearray(top - base + 1)
+
+    @property
+    def depth(self):
+        return self.top - self.sp
+
+    @property
+    def max_depth(self):
+        return self.top - self._min_sp
+
+    def push(self, value):
+        """
+        Decrement SP and store `value` (masked to 16 bits) at the new SP.
+        """
+        sp = self.sp - 1
+        if sp < self.floor:
+            if self.floor > self.base:
+                raise StackDepthError(
+                    f"Stack depth limit of {self.top - self.floor} exceeded."
+                )
+            raise StackOverflowError(
+                f"Stack overflow: push to {sp:#06x} would enter data region."
+            )
+        self._words[sp - self.base] = value & WORD_MASK
+        self.sp = sp
+        if sp < self._min_sp:
+            self._min_sp = sp
+        self.pushes += 1
+
+    def pop(self):
+        """
+        Return the word at SP and increment SP.
+        """
+        sp = self.sp
+        if sp >= self.top:
+            raise StackUnderflowError(
+                f"Stack underflow: pop would move SP past {self.top:#06x}."
+            )
+        self.sp = sp + 1
+        self.pops += 1
+        return self._words[sp - self.base]
+
+    def read(self, addr):
+        """
+        Read the stack word at absolute address `addr`.
+        """
+        return self._words[addr - self.base]
+
+    def store(self, addr, value):
+        """
+        Write the stack word at absolute address `addr` without moving SP.
+        This is the path used by `DataMemory.write(..., from_stack=True)`.
+        """
+        self._words[addr - self.base] = value & WORD_MASK
+        self._stored[addr - self.base] = 1
+
+    def written(self, addr):
+        """
+        Return whether the stack word at `addr` has ever been written.
+        """
+        return self._min_sp <= addr < self.top or self._stored[addr - self.base] == 1
+
+    def written_count(self):
+        """
+        Return the number of stack words ever written.
+        """
+        stored = self._stored
+        pushed_from = self._min_sp - self.base
+        pushed_to = self.top - self.base
+        outside = stored.count(1, 0, pushed_from) + stored.count(1, pushed_to)
+        return outside + pushed_to - pushed_from
+
+    def populated(self):
+        """
+        Return a `dict` of every stack address that has ever been written,
+        mapped to its current value.
+        """
+        base = self.base
+        words = self._words
+        stored = self._stored
+        pushed = range(self._min_sp - base, self.top - base)
+        return {
+            base + i: words[i]
+            for i in range(len(words))
+            if stored[i] or i in pushed
+        }
+
+    def copy(self):
+        """
+        Return an independent copy of this stack, contents and statistics.
+        """
+        other = Stack.__new__(Stack)
+        other.__dict__.update(self.__dict__)
+        other._words = array("H", self._words)
+        other._stored = bytearray(self._stored)
+        return other
+
+    def limit_depth(self, depth=None):
+        """
+        Make pushes beyond `depth` words raise `StackDepthError` (`None`
+        removes the limit). This moves the bound that `push()` already
+        checks, so a limit costs nothing extra.
+        """
+        if depth is None:
+            self.floor = self.base
+        else:
+            self.floor = max(self.base, self.top - depth)
+
+    @property
+    def state_size(self):
+        """Length of the bytes returned by `get_state()`."""
+        return 3 * len(self._words)
+
+    def get_state(self):
+        """
+        Return `(registers, data)`: a tuple of SP and bookkeeping values, and
+        the stack contents and written-word map as bytes. See `set_state()`.
+        """
+        regs = (self.sp, self._min_sp, self.pushes, self.pops)
+        return regs, self._words.tobytes() + bytes(self._stored)
+
+    def set_state(self, regs, data):
+        """
+        Restore state previously returned by `get_state()`.
+        """
+        self.sp, self._min_sp, self.pushes, self.pops = regs
+        split = 2 * len(self._words)
+        self._words = array("H")
+        self._words.frombytes(data[:split])
+        self._stored = bytearray(data[split:])
+
+    def reset_stats(self):
+        """
+        Reset push/pop counters and the high-water mark (SP is unchanged).
+        """
+        # Record pushed words as written before forgetting the high-water mark.
+        start, stop = self._min_sp - self.base, self.top - self.base
+        self._stored[start:stop] = b"\x01" * (stop - start)
+        self.pushes = 0
+        self.pops = 0
+        self._min_sp = self.sp
+
+    def __len__(self):
+        return self.depth
+
+    def __repr__(self):
+        return (
+            f"Stack(sp={self.sp:#06x}, depth={self.depth}, "
+            f"max_depth={self.max_depth})"
+        )
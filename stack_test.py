@@ -0,0 +1,104 @@
+"""
+Tests for the stack unit.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from constants import STACK_BASE, STACK_TOP
+from memory import DataMemory
+from stack import Stack, StackOverflowError, StackUnderflowError
+
+
+def test_push_pop_round_trip():
+    """
+    Ensure values come back in LIFO order and SP is restored.
+    """
+    s = Stack()
+    s.push(0x1111)
+    s.push(0x12345)  # masked to 16 bits
+    assert s.sp == STACK_TOP - 2
+    assert s.read(STACK_TOP - 1) == 0x1111
+    assert s.pop() == 0x2345
+    assert s.pop() == 0x1111
+    assert s.sp == STACK_TOP
+
+
+def test_overflow_into_data_region():
+    """
+    Ensure a push below STACK_BASE raises and leaves SP unchanged.
+    """
+    s = Stack()
+    for i in range(STACK_TOP - STACK_BASE):
+        s.push(i)
+    assert s.sp == STACK_BASE
+    with pytest.raises(StackOverflowError):
+        s.push(0xBEEF)
+    assert s.sp == STACK_BASE
+
+
+def test_underflow_past_top():
+    """
+    Ensure popping an empty stack raises.
+    """
+    s = Stack()
+    with pytest.raises(StackUnderflowError):
+        s.pop()
+
+
+def test_depth_statistics():
+    """
+    Ensure depth, high-water mark and counters are tracked.
+    """
+    s = Stack()
+    for i in range(3):
+        s.push(i)
+    s.pop()
+    s.pop()
+    s.push(7)
+    assert s.depth == 2
+    assert s.max_depth == 3
+    assert (s.pushes, s.pops) == (4, 2)
+    s.reset_stats()
+    assert s.max_depth == 2
+    assert (s.pushes, s.pops) == (0, 0)
+
+
+def test_data_memory_sees_stack_unit():
+    """
+    Ensure pushes are visible through `DataMemory.read()` and stack writes
+    through `DataMemory.write()` are visible to the stack unit.
+    """
+    dm = DataMemory()
+    dm.stack.push(0xABCD)
+    assert dm.read(STACK_TOP - 1) == 0xABCD
+    assert STACK_TOP - 1 in dm
+    dm.write_enable(True)
+    dm.write(STACK_BASE, 0x1234, from_stack=True)
+    assert dm.stack.read(STACK_BASE) == 0x1234
+    assert not dm._write_enable
+
+
+def test_len_and_contains_count_only_written_words():
+    dm = DataMemory()
+    assert len(dm) == 0 and STACK_TOP - 1 not in dm
+    dm.load_words([1, 2], 0x10)
+    dm.stack.store(STACK_BASE, 3)
+    dm.stack.store(STACK_BASE + 0xF0, 4)
+    dm.stack.push(5)
+    dm.stack.push(6)
+    dm.stack.pop()
+    written = {0x10, 0x11, STACK_BASE, STACK_BASE + 0xF0, STACK_TOP - 1, STACK_TOP - 2}
+    assert len(dm) == len(written)
+    for addr in written:
+        assert addr in dm
+    for addr in (0x12, STACK_BASE + 1, STACK_BASE + 0x80, STACK_TOP - 3, STACK_TOP):
+        assert addr not in dm
+    dm.stack.reset_stats()  # pushed words stay written
+    dm.stack.pop()
+    assert len(dm) == len(written)
+    assert set(dm._populated()) == written  # OK to access in tests
+    restored = DataMemory()
+    restored.restore(dm.snapshot())
+    assert set(restored._populated()) == written
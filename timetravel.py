@@ -0,0 +1,147 @@
+"""
+Time-travel debugging for the Catamount Processing Unit.
+
+The simulator is fully deterministic, so we don't need to record every
+register and memory change to run backwards. A `TimeTravel` recorder keeps a
+full `Cpu.snapshot()` every `interval` instructions. To go back to an earlier
+cycle it restores the nearest snapshot at or before that cycle and replays
+forward with plain `tick()`s.
+
+Memory use is bounded by `max_snapshots`: when the limit is exceeded, every
+other snapshot is dropped and the interval doubles, so replay distance grows
+but the number of snapshots doesn't.
+
+Changing the CPU's state by hand (e.g., writing a register) makes snapshots
+after the current cycle stale; call `discard_future()` after doing so.
+
+CS 2210 Computer Organization
+"""
+
+from bisect import bisect_right, insort
+
+
+class TimeTravel:
+    """
+    Records periodic snapshots of `cpu` so it can be stepped backwards.
+    """
+
+    def __init__(self, cpu, interval=1000, max_snapshots=1024):
+        if interval < 1:
+            raise ValueError("Snapshot interval must be at least 1.")
+        self.cpu = cpu
+        self.interval = interval
+        self.max_snapshots = max_snapshots
+        self.origin = cpu.cycles
+        self._cycles = []  # sorted cycles at which we hold snapshots
+        self._snapshots = {}  # cycle -> snapshot bytes
+        self._take()
+
+    @property
+    def snapshot_cycles(self):
+        """Cycles for which a snapshot is held, in order."""
+        return list(self._cycles)
+
+    def _take(self):
+        cycle = self.cpu.cycles
+        if cycle in self._snapshots:
+            return
+        self._snapshots[cycle] = self.cpu.snapshot()
+        insort(self._cycles, cycle)
+        if len(self._cycles) > self.max_snapshots:
+            self._thin()
+
+    def _thin(self):
+        """Drop every other snapshot and double the interval."""
+        self.interval *= 2
+        keep = [
+            c
+            for c in self._cycles
+            if c == self.origin or (c - self.origin) % self.interval == 0
+        ]
+        for c in set(self._cycles) - set(keep):
+            del self._snapshots[c]
+        self._cycles = keep
+
+    def _next_snapshot_at(self):
+        done = self.cpu.cycles - self.origin
+        return self.origin + (done // self.interval + 1) * self.interval
+
+    def step(self, n=1):
+        """
+        Run forward `n` instructions (or until HALT), recording snapshots.
+        Returns the number of instructions executed.
+        """
+        cpu = self.cpu
+        tick = cpu.tick
+        start = cpu.cycles
+        target = start + n
+        while cpu.running and cpu.cycles < target:
+            stop = min(target, self._next_snapshot_at())
+            for _ in range(stop - cpu.cycles):
+                if not tick():
+                    break
+            if (cpu.cycles - self.origin) % self.interval == 0:
+                self._take()
+        return cpu.cycles - start
+
+    def run(self):
+        """
+        Run forward until HALT, recording snapshots.
+        """
+        cpu = self.cpu
+        start = cpu.cycles
+        while cpu.running:
+            self.step(self.interval)
+        return cpu.cycles - start
+
+    def goto(self, cycle):
+        """
+        Put the CPU in the state it had (or will have) after `cycle`
+        instructions. Going backwards restores the nearest earlier snapshot
+        and replays; going forwards simply steps. Returns the cycle reached,
+        which is earlier than `cycle` if the program halts first.
+        """
+        cpu = self.cpu
+        if cycle < self.origin:
+            raise ValueError(
+                f"Cannot go back before cycle {self.origin}, when recording began."
+            )
+        if cycle < cpu.cycles or not self._covers(cpu.cycles, cycle):
+            i = bisect_right(self._cycles, cycle) - 1
+            cpu.restore(self._snapshots[self._cycles[i]])
+        tick = cpu.tick
+        # Replay up to the last recorded snapshot without re-recording...
+        last = self._cycles[-1]
+        for _ in range(min(cycle, last) - cpu.cycles):
+            if not tick():
+                break
+        # ...and record anything beyond it.
+        if cpu.cycles < cycle:
+            self.step(cycle - cpu.cycles)
+        return cpu.cycles
+
+    def _covers(self, current, cycle):
+        """
+        True if stepping forward from `current` to `cycle` is no more work
+        than restoring the nearest snapshot at or before `cycle`.
+        """
+        i = bisect_right(self._cycles, cycle) - 1
+        return self._cycles[i] <= current
+
+    def step_back(self, n=1):
+        """
+        Go back `n` instructions (but not before recording began). Returns
+        the cycle reached.
+        """
+        return self.goto(max(self.origin, self.cpu.cycles - n))
+
+    def discard_future(self):
+        """
+        Forget snapshots after the current cycle, e.g., after the CPU's state
+        has been changed by hand.
+        """
+        current = self.cpu.cycles
+        for c in self._cycles[bisect_right(self._cycles, current) :]:
+            del self._snapshots[c]
+        self._cycles = self._cycles[: bisect_right(self._cycles, current)]
+        self._take()
@@ -0,0 +1,106 @@
+"""
+Tests for time-travel debugging.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+from timetravel import TimeTravel
+
+PROG = assemble(
+    [
+        "LOADI R1, #30",
+        "LOADI R2, #1",
+        "LOOP:",
+        "ADDI R0, R1, #0",
+        "STORE R1, [R0]",
+        "CALL F",
+        "SUB R1, R1, R2",
+        "BNE LOOP",
+        "HALT",
+        "F:",
+        "ADD R3, R3, R2",
+        "RET",
+    ]
+)
+
+
+def _state_after(n):
+    c = make_cpu(PROG)
+    for _ in range(n):
+        c.tick()
+    return c.snapshot()
+
+
+def test_run_records_at_interval():
+    c = make_cpu(PROG)
+    tt = TimeTravel(c, interval=10)
+    tt.run()
+    assert not c.running
+    assert tt.snapshot_cycles == list(range(0, c.cycles + 1, 10))
+
+
+@pytest.mark.parametrize("target", [0, 1, 9, 10, 11, 57, 100])
+def test_goto_backwards_matches_straight_run(target):
+    c = make_cpu(PROG)
+    tt = TimeTravel(c, interval=10)
+    tt.run()
+    assert tt.goto(target) == target
+    assert c.snapshot() == _state_after(target)
+
+
+def test_step_back_and_forward():
+    c = make_cpu(PROG)
+    tt = TimeTravel(c, interval=8)
+    tt.step(45)
+    assert tt.step_back() == 44
+    assert c.snapshot() == _state_after(44)
+    assert tt.step_back(20) == 24
+    assert c.snapshot() == _state_after(24)
+    tt.step(30)
+    assert c.cycles == 54
+    assert c.snapshot() == _state_after(54)
+    assert tt.step_back(1000) == 0
+
+
+def test_goto_past_recording_keeps_recording():
+    c = make_cpu(PROG)
+    tt = TimeTravel(c, interval=5)
+    assert tt.goto(23) == 23
+    assert tt.snapshot_cycles == [0, 5, 10, 15, 20]
+    assert c.snapshot() == _state_after(23)
+
+
+def test_snapshot_count_is_bounded():
+    c = make_cpu(PROG)
+    tt = TimeTravel(c, interval=1, max_snapshots=8)
+    tt.run()
+    assert len(tt.snapshot_cycles) <= 8
+    assert tt.interval > 1
+    tt.goto(37)
+    assert c.snapshot() == _state_after(37)
+
+
+def test_cannot_go_before_origin():
+    c = make_cpu(PROG)
+    c.tick()
+    tt = TimeTravel(c, interval=4)
+    tt.step(10)
+    with pytest.raises(ValueError):
+        tt.goto(0)
+    assert tt.step_back(100) == 1
+
+
+def test_discard_future_after_manual_change():
+    c = make_cpu(PROG)
+    tt = TimeTravel(c, interval=5)
+    tt.run()
+    tt.goto(12)
+    c._regs.execute(rd=3, data=0x100, write_enable=True)  # OK in tests
+    tt.discard_future()
+    assert tt.snapshot_cycles[-1] == 12
+    tt.goto(20)
+    assert c.get_reg(3) >= 0x100
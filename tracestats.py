@@ -0,0 +1,185 @@
+"""
+Dynamic instruction-mix and dependency statistics.
+
+`instruction_stats()` takes a binary trace (an `exectrace.TraceBuffer`, or
+a dict of columns with at least "pc" and "word", e.g. a block from
+`tracewriter.read_trace()`) and computes, with vectorised NumPy passes
+rather than per-record Python code:
+
+    opcode_mix         dynamic count per mnemonic
+    register_reads     times each register was read as a source operand
+    register_writes    times each register was written
+    branch_offsets     {mnemonic: {offset: count}} for B, BEQ, BNE and CALL
+    branch_sites       {pc: (taken, not taken)} for BEQ and BNE
+    flag_distance      {instructions: count} from the last flag-setting ALU
+                       instruction to each BEQ/BNE that tests the flags
+    load_use_distance  {instructions: count} from each LOAD to the first
+                       instruction reading the loaded register
+    unused_loads       LOADs whose register was overwritten (or the trace
+                       ended) before being read
+
+Flag-setting instructions are those that go through the ALU: ADD, ADDI,
+SUB, AND, OR, SHFT and STORE (which uses the ALU to form its address).
+
+NumPy is required.
+
+CS 2210 Computer Organization
+"""
+
+from dataclasses import dataclass, field
+
+from instruction_set import ISA, OPCODE_MAP
+
+_OP = {mnem: info["opcode"] for mnem, info in ISA.items()}
+_R_FORMAT = ("ADD", "SUB", "AND", "OR", "SHFT")
+# Bit positions of source register fields, by mnemonic.
+_SOURCES = {
+    **{m: (6, 3) for m in _R_FORMAT},
+    "ADDI": (6,),
+    "LUI": (9,),  # keeps the low byte of Rd
+    "LOAD": (6,),
+    "STORE": (9, 6),
+}
+_WRITES = _R_FORMAT + ("ADDI", "LOADI", "LUI", "LOAD")
+_SETS_FLAGS = _R_FORMAT + ("ADDI", "STORE")
+
+
+@dataclass
+class InstructionStats:
+    """
+    Results of `instruction_stats()`; see the module docstring.
+    """
+
+    instructions: int = 0
+    opcode_mix: dict = field(default_factory=dict)
+    register_reads: list = field(default_factory=list)
+    register_writes: list = field(default_factory=list)
+    branch_offsets: dict = field(default_factory=dict)
+    branch_sites: dict = field(default_factory=dict)
+    flag_distance: dict = field(default_factory=dict)
+    load_use_distance: dict = field(default_factory=dict)
+    unused_loads: int = 0
+
+    def report(self):
+        """
+        Return the statistics as text.
+        """
+        n = self.instructions or 1
+        rows = [f"{self.instructions} instructions", "", "opcode mix:"]
+        for mnem, count in sorted(self.opcode_mix.items(), key=lambda i: -i[1]):
+            rows.append(f"  {mnem:<6} {count:>10} {100 * count / n:>6.1f}%")
+        rows.append("")
+        rows.append("register   " + " ".join(f"{f'R{r}':>7}" for r in range(8)))
+        rows.append("  reads    " + " ".join(f"{c:>7}" for c in self.register_reads))
+        rows.append("  writes   " + " ".join(f"{c:>7}" for c in self.register_writes))
+        rows.append("")
+        rows.append("branch offsets:")
+        for mnem, offsets in self.branch_offsets.items():
+            text = ", ".join(f"{o:+d} x{c}" for o, c in offsets.items())
+            rows.append(f"  {mnem:<6} {text}")
+        rows.append("")
+        rows.append("branch sites (taken / not taken):")
+        for pc, (taken, not_taken) in self.branch_sites.items():
+            rate = 100 * taken / ((taken + not_taken) or 1)
+            rows.append(f"  {pc:#06x} {taken:>8} / {not_taken:<8} {rate:>5.1f}% taken")
+        rows.append("")
+        rows.append("flag-set to branch distance: " + _histogram(self.flag_distance))
+        rows.append("load to use distance: " + _histogram(self.load_use_distance))
+        rows.append(f"loads never used: {self.unused_loads}")
+        return "\n".join(rows)
+
+
+def _histogram(counts):
+    return ", ".join(f"{d} x{c}" for d, c in counts.items()) or "none"
+
+
+def _counts(np, values):
+    keys, counts = np.unique(values, return_counts=True)
+    return {int(k): int(c) for k, c in zip(keys, counts)}
+
+
+def instruction_stats(trace):
+    """
+    Compute `InstructionStats` for `trace`.
+    """
+    import numpy as np  # optional dependency, only needed here
+
+    if hasattr(trace, "as_numpy"):
+        trace = trace.as_numpy()
+    pcs = np.asarray(trace["pc"], dtype=np.int64)
+    words = np.asarray(trace["word"], dtype=np.int64)
+    n = len(words)
+    stats = InstructionStats(instructions=n)
+    opcodes = words >> 12
+    index = np.arange(n)
+
+    mix = np.bincount(opcodes, minlength=16)
+    stats.opcode_mix = {OPCODE_MAP[op]: int(mix[op]) for op in range(16) if mix[op]}
+
+    def is_op(*mnems):
+        return np.isin(opcodes, [_OP[m] for m in mnems])
+
+    # Register operands. `sources` has one column per possible source
+    # field, -1 where the instruction has no such operand.
+    sources = np.full((n, 2), -1, dtype=np.int64)
+    for mnem, shifts in _SOURCES.items():
+        rows = opcodes == _OP[mnem]
+        for col, shift in enumerate(shifts):
+            sources[rows, col] = (words[rows] >> shift) & 0x7
+    used = sources[sources >= 0]
+    stats.register_reads = np.bincount(used, minlength=8).tolist()
+    writes = is_op(*_WRITES)
+    dest = np.where(writes, (words >> 9) & 0x7, -1)
+    stats.register_writes = np.bincount(dest[writes], minlength=8).tolist()
+
+    # Branch offsets.
+    for mnem in ("B", "BEQ", "BNE", "CALL"):
+        rows = opcodes == _OP[mnem]
+        if rows.any():
+            raw = words[rows] >> 4 if mnem == "CALL" else words[rows]
+            offsets = ((raw & 0xFF) ^ 0x80) - 0x80
+            stats.branch_offsets[mnem] = _counts(np, offsets)
+
+    # Per-site outcomes of conditional branches, judged from the next
+    # record's pc (so the last record is left out).
+    conditional = is_op("BEQ", "BNE")[:-1]
+    taken = pcs[1:] != pcs[:-1] + 1
+    sites = pcs[:-1][conditional]
+    outcomes = taken[conditional]
+    for pc in np.unique(sites):
+        at = sites == pc
+        t = int(np.count_nonzero(outcomes[at]))
+        stats.branch_sites[int(pc)] = (t, int(np.count_nonzero(at)) - t)
+
+    # Distance from the last flag-setting instruction to each BEQ/BNE.
+    last_setter = np.maximum.accumulate(np.where(is_op(*_SETS_FLAGS), index, -1))
+    consumers = index[is_op("BEQ", "BNE")]
+    setters = last_setter[consumers]
+    found = setters >= 0
+    stats.flag_distance = _counts(np, consumers[found] - setters[found])
+
+    # Load-to-use distance, one register at a time: the next read of the
+    # register after the LOAD counts only if it comes no later than the
+    # next write to it (an instruction reading and writing it is a use).
+    loads = opcodes == _OP["LOAD"]
+    big = n + 1
+    distances = []
+    unused = 0
+    for r in range(8):
+        reads_r = (sources == r).any(axis=1)
+        writes_r = dest == r
+        next_read = np.minimum.accumulate(np.where(reads_r, index, big)[::-1])[::-1]
+        next_write = np.minimum.accumulate(np.where(writes_r, index, big)[::-1])[::-1]
+        at = index[loads & writes_r]
+        after = at + 1
+        valid = after < n
+        read_at = np.full(len(at), big)
+        write_at = np.full(len(at), big)
+        read_at[valid] = next_read[after[valid]]
+        write_at[valid] = next_write[after[valid]]
+        ok = (read_at < big) & (read_at <= write_at)
+        distances.append(read_at[ok] - at[ok])
+        unused += int(np.count_nonzero(~ok))
+    stats.load_use_distance = _counts(np, np.concatenate(distances))
+    stats.unused_loads = unused
+    return stats
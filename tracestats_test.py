@@ -0,0 +1,83 @@
+"""
+Tests for the instruction-mix and dependency statistics.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+from exectrace import TraceBuffer
+from tracestats import instruction_stats
+
+np = pytest.importorskip("numpy")
+
+PROG = assemble(
+    [
+        "LOADI R1, #3",  # 0
+        "LOADI R2, #1",  # 1
+        "LOOP:",
+        "SUB R1, R1, R2",  # 2
+        "LOADI R5, #0",  # 3
+        "BNE LOOP",  # 4
+        "LOAD R3, [R0]",  # 5
+        "LOAD R6, [R0]",  # 6
+        "ADDI R7, R0, #1",  # 7
+        "ADD R4, R3, R3",  # 8
+        "HALT",  # 9
+    ]
+)
+
+
+def _stats():
+    c = make_cpu(PROG)
+    trace = TraceBuffer(64)
+    c.attach(trace)
+    c.run()
+    return instruction_stats(trace)
+
+
+def test_opcode_and_register_mix():
+    stats = _stats()
+    assert stats.instructions == 2 + 3 * 3 + 5
+    assert stats.opcode_mix == {
+        "LOADI": 5,
+        "LOAD": 2,
+        "ADDI": 1,
+        "ADD": 1,
+        "SUB": 3,
+        "BNE": 3,
+        "HALT": 1,
+    }
+    # SUB reads R1, R2 three times; LOADs and ADDI read R0; ADD reads R3 twice.
+    assert stats.register_reads == [3, 3, 3, 2, 0, 0, 0, 0]
+    assert stats.register_writes == [0, 4, 1, 1, 1, 3, 1, 1]
+
+
+def test_branches():
+    stats = _stats()
+    assert stats.branch_offsets == {"BNE": {-3: 3}}
+    assert stats.branch_sites == {4: (2, 1)}
+    assert "66.7% taken" in stats.report()
+
+
+def test_dependency_distances():
+    stats = _stats()
+    # Each BNE tests the flags set by the SUB two instructions earlier.
+    assert stats.flag_distance == {2: 3}
+    # R3 is used three instructions after its LOAD; R6 is never read.
+    assert stats.load_use_distance == {3: 1}
+    assert stats.unused_loads == 1
+
+
+def test_columns_and_empty_trace():
+    c = make_cpu(PROG)
+    trace = TraceBuffer(64)
+    c.attach(trace)
+    c.run()
+    columns = {name: list(col) for name, col in trace.columns().items()}
+    assert instruction_stats(columns) == instruction_stats(trace)
+    empty = instruction_stats({"pc": [], "word": []})
+    assert empty.instructions == 0 and empty.opcode_mix == {}
+    assert "0 instructions" in empty.report()
@@ -0,0 +1,168 @@
+"""
+Indexed on-disk trace store.
+
+A `TraceStore` is a run monitor (see `Cpu.attach()`) that records the same
+per-instruction records as `exectrace.TraceBuffer`, using one as its
+in-memory chunk, and writes each full chunk (and the remainder when
+`Cpu.run()` returns) to an SQLite database in a single transaction.
+
+The trace table is keyed by cycle, and has indexes on (pc, cycle),
+(address, cycle) for instructions that access memory, and (rd, cycle) for
+instructions that write a register. Questions like these are therefore
+answered by index lookups rather than by scanning the whole trace:
+
+    store.writes(0x0040)                      # every write to 0x0040
+    store.executions(0x12, start=X, stop=Y)   # pc 0x12 in cycles [X, Y)
+    store.last_register_write(3, before=Z)    # last write to R3 before Z
+
+Query results are `exectrace.TraceRecord`s.
+
+CS 2210 Computer Organization
+"""
+
+import sqlite3
+
+from exectrace import COLUMNS, READ, WRITE, TraceBuffer, TraceRecord
+from instruction_set import Instruction
+
+_NAMES = [name for name, _ in COLUMNS]
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trace (
+    cycle INTEGER PRIMARY KEY,
+    pc INTEGER NOT NULL,
+    word INTEGER NOT NULL,
+    rd INTEGER NOT NULL,
+    rd_value INTEGER NOT NULL,
+    access INTEGER NOT NULL,
+    address INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    flags INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trace_pc ON trace (pc, cycle);
+CREATE INDEX IF NOT EXISTS trace_address ON trace (address, cycle)
+    WHERE access != 0;
+CREATE INDEX IF NOT EXISTS trace_rd ON trace (rd, cycle) WHERE rd >= 0;
+"""
+_INSERT = f"INSERT OR REPLACE INTO trace VALUES ({', '.join('?' * len(_NAMES))})"
+# Queries repeat the partial indexes' conditions verbatim so SQLite uses them.
+_ACCESS = "address = ? AND access = ? AND access != 0"
+
+
+class TraceStore:
+    """
+    SQLite-backed trace of every instruction retired while attached.
+    """
+
+    def __init__(self, path, chunk=1 << 16):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._buffer = TraceBuffer(chunk)
+        self._decoded = {}
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with trace recording, for `Cpu._stepper()`.
+        """
+        buffer = self._buffer
+        traced = buffer.guard(cpu, step)
+        capacity = buffer.capacity
+
+        def stored_step():
+            if not traced():
+                return False
+            if buffer.total == capacity:
+                self.flush()
+            return True
+
+        return stored_step
+
+    def finish(self, cpu):
+        """Called when `Cpu.run()` returns: write what is buffered."""
+        self.flush()
+
+    def flush(self):
+        """
+        Write buffered records to the database.
+        """
+        if not len(self._buffer):
+            return
+        columns = self._buffer.columns()
+        rows = zip(*(columns[name] for name in _NAMES))
+        with self._db:
+            self._db.executemany(_INSERT, rows)
+        self._buffer.clear()
+
+    def stop_tracking(self):
+        """Remove the trace buffer's memory hooks (e.g., after `Cpu.detach()`)."""
+        self._buffer.stop_tracking()
+
+    def close(self):
+        self.flush()
+        self._buffer.stop_tracking()
+        self._db.close()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM trace").fetchone()[0]
+
+    def _record(self, row):
+        fields = dict(zip(_NAMES, row))
+        word = fields["word"]
+        instruction = self._decoded.get(word)
+        if instruction is None:
+            instruction = self._decoded[word] = Instruction(raw=word)
+        if fields["rd"] < 0:
+            fields["rd_value"] = None
+        if not fields["access"]:
+            fields["address"] = fields["value"] = None
+        return TraceRecord(instruction=instruction, **fields)
+
+    def _query(self, where, params, start, stop, order="ASC", limit=None):
+        sql = f"SELECT {', '.join(_NAMES)} FROM trace WHERE {where}"
+        if start is not None:
+            sql += " AND cycle >= ?"
+            params += (start,)
+        if stop is not None:
+            sql += " AND cycle < ?"
+            params += (stop,)
+        sql += f" ORDER BY cycle {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [self._record(row) for row in self._db.execute(sql, params)]
+
+    def cycles(self, start, stop):
+        """
+        Records for cycles in `[start, stop)`.
+        """
+        return self._query("1", (), start, stop)
+
+    def executions(self, pc, start=None, stop=None):
+        """
+        Records of every execution of the instruction at `pc`, optionally
+        restricted to cycles in `[start, stop)`.
+        """
+        return self._query("pc = ?", (pc,), start, stop)
+
+    def writes(self, address, start=None, stop=None):
+        """
+        Records of every data memory write to `address`.
+        """
+        return self._query(_ACCESS, (address, WRITE), start, stop)
+
+    def reads(self, address, start=None, stop=None):
+        """
+        Records of every data memory read from `address`.
+        """
+        return self._query(_ACCESS, (address, READ), start, stop)
+
+    def last_register_write(self, r, before=None):
+        """
+        The last record that wrote register `r` (before cycle `before`, if
+        given), or `None`.
+        """
+        found = self._query(
+            "rd = ? AND rd >= 0", (r,), None, before, order="DESC", limit=1
+        )
+        return found[0] if found else None
@@ -0,0 +1,75 @@
+"""
+Tests for the indexed on-disk trace store.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+from stack import StackUnderflowError
+from tracestore import TraceStore
+
+PROG = assemble(
+    [
+        "LOADI R1, #3",  # 0
+        "LOADI R2, #1",  # 1
+        "LOOP:",
+        "STORE R1, [R0]",  # 2
+        "LOAD R3, [R0]",  # 3
+        "SUB R1, R1, R2",  # 4
+        "BNE LOOP",  # 5
+        "HALT",  # 6
+    ]
+)
+
+
+def _store(tmp_path, chunk=4):
+    c = make_cpu(PROG)
+    store = TraceStore(str(tmp_path / "trace.db"), chunk=chunk)
+    c.attach(store)
+    c.run()
+    return c, store
+
+
+def test_whole_run_is_stored_across_chunks(tmp_path):
+    c, store = _store(tmp_path)
+    assert len(store) == c.cycles == 15
+    assert [r.pc for r in store.cycles(1, 4)] == [0, 1, 2]
+    assert store.cycles(15, 16)[0].instruction.mnem == "HALT"
+    store.close()
+
+
+def test_queries(tmp_path):
+    _, store = _store(tmp_path)
+    writes = store.writes(0)
+    assert [w.value for w in writes] == [3, 2, 1]
+    assert [r.value for r in store.reads(0)] == [3, 2, 1]
+    assert store.writes(1) == []
+    runs = store.executions(2, start=4, stop=12)
+    assert [r.cycle for r in runs] == [7, 11]
+    last = store.last_register_write(1, before=12)
+    assert (last.pc, last.rd_value) == (4, 1)
+    assert store.last_register_write(1, before=1) is None
+    assert store.last_register_write(3).rd_value == 1
+    store.close()
+
+
+def test_reopen_for_queries(tmp_path):
+    _, store = _store(tmp_path, chunk=1 << 10)
+    store.close()
+    again = TraceStore(str(tmp_path / "trace.db"))
+    assert len(again) == 15
+    assert again.executions(6)[0].cycle == 15
+    again.close()
+
+
+def test_records_are_written_when_the_program_faults(tmp_path):
+    c = make_cpu(assemble(["LOADI R1, #1", "LOADI R2, #2", "RET"]))
+    store = TraceStore(str(tmp_path / "trace.db"))
+    c.attach(store)
+    with pytest.raises(StackUnderflowError):
+        c.run()
+    assert [r.pc for r in store.cycles(0, 10)] == [0, 1]
+    store.close()
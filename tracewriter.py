@@ -0,0 +1,207 @@
+"""
+Streaming compressed trace writer.
+
+A `TraceWriter` is a run monitor (see `Cpu.attach()`). On the simulator
+thread it only appends records to an `exectrace.TraceBuffer` holding one
+block; each full block (and the remainder when `Cpu.run()` returns) is
+handed through a bounded queue to a background thread, which encodes and
+compresses it and writes it to disk. If the writer falls behind, the queue
+fills and the simulator waits, so memory use stays bounded.
+
+File format: a header (magic, version, codec), then blocks. Each block is a
+header (record count, compressed length, first cycle, first pc) followed by
+the compressed columns, in `exectrace.COLUMNS` order, little-endian. The
+cycle and pc columns are delta encoded (each value minus the previous
+one), which makes them very compressible: in straight-line code every
+delta is 1. `read_trace()` decodes a file back into columns.
+
+CS 2210 Computer Organization
+"""
+
+import lzma
+import queue
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from itertools import accumulate
+from operator import sub
+
+from exectrace import COLUMNS, TraceBuffer
+
+TRACE_MAGIC = b"CTRC"
+TRACE_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sBB")
+_BLOCK_HEADER = struct.Struct("<IIQH")  # count, compressed length, cycle, pc
+CODECS = {
+    "zlib": (1, zlib.compress, zlib.decompress),
+    "lzma": (2, lzma.compress, lzma.decompress),
+}
+_BY_ID = {codec_id: name for name, (codec_id, _, _) in CODECS.items()}
+# Encoded type codes: deltas are signed (a branch or restore can go back).
+_ENCODED = dict(COLUMNS, cycle="q", pc="i")
+
+
+def _little(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _deltas(typecode, column):
+    """`column` as differences from the previous value (the first is 0)."""
+    deltas = array(typecode, [0])
+    deltas.extend(map(sub, column[1:], column[:-1]))
+    return deltas
+
+
+def _encode(columns):
+    """Delta encode cycle and pc, then serialise all columns."""
+    columns = dict(
+        columns,
+        cycle=_deltas("q", columns["cycle"]),
+        pc=_deltas("i", columns["pc"]),
+    )
+    return b"".join(_little(columns[name]) for name, _ in COLUMNS)
+
+
+def _decode(payload, count, first_cycle, first_pc):
+    columns = {}
+    offset = 0
+    for name, _ in COLUMNS:
+        column = array(_ENCODED[name])
+        size = column.itemsize * count
+        column.frombytes(payload[offset : offset + size])
+        if sys.byteorder == "big":
+            column.byteswap()
+        offset += size
+        columns[name] = column
+    cycles = accumulate(columns["cycle"][1:], initial=first_cycle)
+    columns["cycle"] = array("Q", cycles)
+    columns["pc"] = array("H", accumulate(columns["pc"][1:], initial=first_pc))
+    return columns
+
+
+class TraceWriter:
+    """
+    Writes a compressed trace of every instruction retired while attached
+    to `path`, on a background thread.
+    """
+
+    def __init__(self, path, block=1 << 14, codec="zlib", level=None, queue_size=8):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec {codec!r}; use one of {sorted(CODECS)}.")
+        codec_id, compress, _ = CODECS[codec]
+        if level is None:
+            self._compress = compress
+        elif codec == "lzma":
+            self._compress = lambda data: compress(data, preset=level)
+        else:
+            self._compress = lambda data: compress(data, level)
+        self._buffer = TraceBuffer(block)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._file = open(path, "wb")
+        self._file.write(_FILE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, codec_id))
+        self.blocks = 0
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def guard(self, cpu, step):
+        """
+        Wrap `step` with trace recording, for `Cpu._stepper()`.
+        """
+        buffer = self._buffer
+        traced = buffer.guard(cpu, step)
+        capacity = buffer.capacity
+
+        def written_step():
+            if not traced():
+                return False
+            if buffer.total == capacity:
+                self.flush()
+            return True
+
+        return written_step
+
+    def finish(self, cpu):
+        """Called when `Cpu.run()` returns: hand off what is buffered."""
+        self.flush()
+
+    def flush(self):
+        """
+        Queue the buffered records for writing. Blocks if the queue is full.
+        """
+        if self._error is not None:
+            raise RuntimeError("Trace writer failed.") from self._error
+        if len(self._buffer):
+            self._queue.put(self._buffer.columns())
+            self._buffer.clear()
+
+    def _work(self):
+        while True:
+            columns = self._queue.get()
+            if columns is None:
+                return
+            if self._error is not None:
+                continue  # drain, so the simulator never blocks forever
+            try:
+                payload = self._compress(_encode(columns))
+                self._file.write(
+                    _BLOCK_HEADER.pack(
+                        len(columns["cycle"]),
+                        len(payload),
+                        columns["cycle"][0],
+                        columns["pc"][0],
+                    )
+                )
+                self._file.write(payload)
+                self.blocks += 1
+            except Exception as exc:  # reported to the simulator thread
+                self._error = exc
+
+    def stop_tracking(self):
+        """Remove the trace buffer's memory hooks (e.g., after `Cpu.detach()`)."""
+        self._buffer.stop_tracking()
+
+    def close(self):
+        """
+        Write everything still buffered or queued, and close the file.
+        """
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._buffer.stop_tracking()
+            self._file.close()
+        if self._error is not None:
+            raise RuntimeError("Trace writer failed.") from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trace(path):
+    """
+    Yield one `{name: array}` dict of columns per block of the trace file
+    at `path`.
+    """
+    with open(path, "rb") as f:
+        magic, version, codec_id = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a trace file.")
+        if version != TRACE_VERSION:
+            raise ValueError(f"Unsupported trace version {version}.")
+        decompress = CODECS[_BY_ID[codec_id]][2]
+        while True:
+            header = f.read(_BLOCK_HEADER.size)
+            if not header:
+                return
+            count, length, cycle, pc = _BLOCK_HEADER.unpack(header)
+            yield _decode(decompress(f.read(length)), count, cycle, pc)
@@ -0,0 +1,50 @@
+"""
+Tests for the streaming compressed trace writer.
+
+CS 2210 Computer Organization
+"""
+
+import pytest
+
+from assembler import assemble
+from cpu import make_cpu
+from exectrace import TraceBuffer
+from tracewriter import TraceWriter, read_trace
+
+PROG = assemble(
+    [
+        "LOADI R1, #20",
+        "LOADI R2, #1",
+        "LOOP:",
+        "STORE R1, [R0]",
+        "LOAD R3, [R0]",
+        "SUB R1, R1, R2",
+        "BNE LOOP",
+        "HALT",
+    ]
+)
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_round_trip_matches_in_memory_trace(tmp_path, codec):
+    path = tmp_path / "run.trace"
+    c = make_cpu(PROG)
+    reference = TraceBuffer(1 << 10)
+    c.attach(reference)
+    with TraceWriter(path, block=16, codec=codec, queue_size=2) as writer:
+        c.attach(writer)
+        c.run()
+    assert writer.blocks == -(-c.cycles // 16)
+    blocks = list(read_trace(path))
+    expected = reference.columns()
+    for name, column in expected.items():
+        assert [v for block in blocks for v in block[name]] == list(column), name
+
+
+def test_bad_codec_and_file(tmp_path):
+    with pytest.raises(ValueError):
+        TraceWriter(tmp_path / "x", codec="zip")
+    bogus = tmp_path / "bogus"
+    bogus.write_bytes(b"NOPE\x01\x01")
+    with pytest.raises(ValueError):
+        list(read_trace(bogus))